@@ -1,11 +1,17 @@
 import pandas as pd
-from station_data import norm_name_capitalize
 
+import perf
+from station_data import STATION_NAMES
 
+# quantile statistics and their q
+QUANTILE_STATS = {"Median": 0.5, "P5": 0.05, "P95": 0.95}
+
+
+@perf.timed("aggregation.filter_data")
 def filter_data(df, station, date_from, date_to):
     # Filter to one station, then clip rows to the selected date range.
     # narrow to selected station (normalize name first)
-    df = df[df["station"] == norm_name_capitalize(station)].copy()
+    df = df[df["station"] == STATION_NAMES.code_of(station)].copy()
 
     # If dates aren't set yet, return an empty frame (keeps downstream code simple).
     if date_from is None or date_to is None:
@@ -32,8 +38,22 @@ def filter_data(df, station, date_from, date_to):
     return out
 
 
-def apply_aggregation(df, target_col, resample_freq, agg_functions):
+def _quantile_bins(quantiles, freq, first, last, f, target_col):
+    # One row per `freq` bin between the first and last timestamp, from merged sketches
+    if pd.isna(first):
+        return pd.DataFrame(columns=["ds", target_col])
+    return quantiles.bin_quantiles(
+        freq, first.value, last.value + 1, QUANTILE_STATS[f]
+    ).rename(columns={"value": target_col})
+
+
+@perf.timed("aggregation.apply_aggregation")
+def apply_aggregation(df, target_col, resample_freq, agg_functions, quantiles=None):
     # Resample target_col and return one row per bin for each requested stat.
+    # `quantiles` (quantile_sketch.SketchSeries of the same station and
+    # target_col) answers Median/P5/P95 by merging the binned sketches instead
+    # of groupby median/quantile; those hold every raw reading, not just the
+    # stored last reading of each bin.
     import pandas as pd
 
     if resample_freq == "None":
@@ -42,14 +62,14 @@ def apply_aggregation(df, target_col, resample_freq, agg_functions):
     # UI labels -> pandas resample codes
     rule_map = {"10min": "10min", "Hour": "h", "Day": "d"}
 
-    valid = {"Min", "Max", "Median"}
+    valid = {"Min", "Max", *QUANTILE_STATS}
     if not set(agg_functions).issubset(valid):
         return df
 
-    dfi = df.copy()
-
-    # Ensure datetime
-    ts = pd.to_datetime(dfi["ds"], errors="coerce")
+    # Ensure datetime (to_datetime walks datetime64 columns in Python; skip it)
+    ts = df["ds"]
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts, errors="coerce")
 
     try:
         if getattr(ts.dt, "tz", None) is not None:
@@ -57,13 +77,29 @@ def apply_aggregation(df, target_col, resample_freq, agg_functions):
     except Exception:
         pass
 
-    dfi["ds"] = ts
-    dfi = dfi.set_index("ds").sort_index()
-
     freq = rule_map.get(resample_freq)
     if freq is None:
         return df
 
+    # Sketches only need the time span: skip copying and sorting the frame
+    if (
+        quantiles is not None
+        and agg_functions
+        and set(agg_functions) <= set(QUANTILE_STATS)
+        and not any(str(c).lower().startswith("predict") for c in df.columns)
+    ):
+        out = [
+            _quantile_bins(quantiles, freq, ts.min(), ts.max(), f, target_col).assign(
+                Aggregation=f
+            )
+            for f in agg_functions
+        ]
+        return pd.concat(out, ignore_index=True)
+
+    dfi = df.copy()
+    dfi["ds"] = ts
+    dfi = dfi.set_index("ds").sort_index()
+
     grouper = pd.Grouper(freq=freq)
 
     s = dfi[target_col]
@@ -78,9 +114,19 @@ def apply_aggregation(df, target_col, resample_freq, agg_functions):
 
     for f in agg_functions:
 
-        if f == "Median":
+        if f in QUANTILE_STATS and quantiles is not None:
+            agg_df = _quantile_bins(quantiles, freq, ts.min(), ts.max(), f, target_col)
+
+        elif f == "Median":
             agg_df = s.groupby(grouper).median().reset_index(name=target_col)
 
+        elif f in QUANTILE_STATS:
+            agg_df = (
+                s.groupby(grouper)
+                .quantile(QUANTILE_STATS[f])
+                .reset_index(name=target_col)
+            )
+
         else:
             idx = (
                 s.groupby(grouper).idxmin()
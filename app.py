@@ -1,17 +1,30 @@
+import hmac
+
 import streamlit as st
 
+import memprof
+import perf
+
 # App texts/config (labels, sidebar text, and available data columns)
-from config import APP_TEXTS, SIDE_TEXTS, COL_NAMES
-from data import combined_data_retrieve
+from config import APP_TEXTS, SIDE_TEXTS, COL_NAMES, WARMUP_ON_START, WARMUP_TOKEN
 
 # UI helpers and page modules
 from ui_components import data_uri, load_styles, render_header, render_footer
-from station_data import BASWAP_STATIONS, OTHER_STATIONS, get_station_lookup
+from station_data import (
+    BASWAP_STATIONS,
+    DEFAULT_STATION,
+    OTHER_STATIONS,
+    get_station_lookup,
+)
 from pages import overview_page, about_page
+from warmup import print_report, run_warmup, start_background_warmup
 
 # Streamlit page metadata
 st.set_page_config(page_title="BASWAP", page_icon="💧", layout="wide")
 
+# Per-rerun timing spans (shown in the `?debug=1` panel)
+perf.start_run()
+
 # Read URL query params (Streamlit API differs across versions)
 try:
     params = st.query_params
@@ -71,6 +84,19 @@ if _as_scalar(params.get("refresh"), "0") == "1":
         pass
     st.rerun()
 
+# Cache warm-up: `?warmup=<WARMUP_TOKEN>` warms synchronously and reports per-stage
+# timings (opened by the scheduled wake job); with WARMUP_ON_START=1 the models
+# are also warmed once per process in the background
+warmup_token = _as_scalar(params.get("warmup"), "")
+if WARMUP_TOKEN and warmup_token and hmac.compare_digest(warmup_token, WARMUP_TOKEN):
+    warm_report = run_warmup()
+    print_report(warm_report)
+    st.markdown("Warm-up finished")
+    st.json(warm_report)
+    st.stop()
+if WARMUP_ON_START:
+    start_background_warmup()
+
 # Only allow known pages/languages
 if page not in ("Overview", "About"):
     page = "Overview"
@@ -91,7 +117,7 @@ for k, v in {
     "date_to": None,
     "agg_stats": ["Median"],
     "table_cols": [COL_NAMES[0]],
-    "selected_station": "Vĩnh Long",
+    "selected_station": DEFAULT_STATION,
 }.items():
     st.session_state.setdefault(k, v)
 
@@ -111,24 +137,33 @@ STATION_LOOKUP = get_station_lookup(texts)
 # Route to the selected page
 if page == "Overview":
     # Fetch the merged dataset once, then pass it to the page renderer
+    # (imported lazily so the About page never loads the DB/HTTP stack)
+    from data import combined_data_retrieve
+
     df = combined_data_retrieve()
 
-    overview_page(
-        texts,
-        side_texts,
-        COL_NAMES,
-        df,
-        dm,
-        STATION_LOOKUP,
-        BASWAP_STATIONS,
-        OTHER_STATIONS,
-        MAP_HEIGHT,
-        TABLE_HEIGHT,
-        lang,
-    )
+    with perf.span("pages.overview_page"):
+        overview_page(
+            texts,
+            side_texts,
+            COL_NAMES,
+            df,
+            dm,
+            STATION_LOOKUP,
+            BASWAP_STATIONS,
+            OTHER_STATIONS,
+            MAP_HEIGHT,
+            TABLE_HEIGHT,
+            lang,
+        )
+    memprof.take_snapshot("overview")
 
 elif page == "About":
     about_page(lang)
 
 # Footer
 render_footer()
+
+# Hidden performance panel
+if _as_scalar(params.get("debug"), "0") == "1":
+    perf.render_debug_panel()
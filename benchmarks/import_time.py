@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Import-time report for the app's modules (parses `python -X importtime`).
+
+Each module is imported in a fresh interpreter so numbers reflect a cold start.
+Heavy packages that should only load on demand (torch, neuralforecast, folium,
+altair, ...) are flagged when they show up in a module's import graph.
+
+Usage:
+    python benchmarks/import_time.py                  # default modules
+    python benchmarks/import_time.py pages data --top 15 --json importtime.json
+    python benchmarks/import_time.py pages --fail-on-heavy
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["pages", "data", "plotting", "map_handler"]
+
+HEAVY_PACKAGES = [
+    "torch",
+    "neuralforecast",
+    "pytorch_lightning",
+    "lightning",
+    "folium",
+    "streamlit_folium",
+    "altair",
+    "sqlalchemy",
+]
+
+# "import time:       123 |       4567 |   package.module"
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return [{'module', 'self_us', 'cumulative_us', 'depth'}] in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        m = LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = m.groups()
+        rows.append(
+            {
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cum_us),
+                "depth": (len(indent) - 1) // 2,
+            }
+        )
+    return rows
+
+
+def measure(module: str, python: str = sys.executable) -> dict:
+    """Import *module* in a fresh interpreter and summarize its import graph."""
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    top_level = next((r for r in reversed(rows) if r["module"] == module), None)
+    loaded = {r["module"].split(".")[0] for r in rows}
+    heavy = {}
+    for pkg in HEAVY_PACKAGES:
+        if pkg in loaded:
+            heavy[pkg] = max(
+                r["cumulative_us"] for r in rows if r["module"].split(".")[0] == pkg
+            )
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "total_us": (
+            top_level["cumulative_us"] if top_level else sum(r["self_us"] for r in rows)
+        ),
+        "n_modules": len(rows),
+        "heavy_us": heavy,
+        "rows": rows,
+    }
+
+
+def print_report(result: dict, top: int) -> None:
+    print(f"\n== import {result['module']} ==")
+    if not result["ok"]:
+        print(f"  FAILED: {result['error']}")
+    print(
+        f"  total: {result['total_us'] / 1000:.1f} ms "
+        f"over {result['n_modules']} modules"
+    )
+    if result["heavy_us"]:
+        for pkg, us in sorted(result["heavy_us"].items(), key=lambda kv: -kv[1]):
+            print(f"  heavy: {pkg:<18} {us / 1000:9.1f} ms")
+    else:
+        print("  heavy: none")
+
+    print(f"  top {top} by cumulative time:")
+    by_cum = sorted(result["rows"], key=lambda r: -r["cumulative_us"])[:top]
+    for r in by_cum:
+        print(f"    {r['cumulative_us'] / 1000:9.1f} ms  {r['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--json", help="write results (without per-module rows) to this file"
+    )
+    parser.add_argument(
+        "--fail-on-heavy",
+        action="store_true",
+        help="exit 1 if any module pulls in a heavy package at import time",
+    )
+    args = parser.parse_args()
+
+    results = [measure(m) for m in args.modules]
+    for r in results:
+        print_report(r, args.top)
+
+    if args.json:
+        summary = [{k: v for k, v in r.items() if k != "rows"} for r in results]
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+
+    if args.fail_on_heavy and any(r["heavy_us"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Concurrent-session load test, fully offline.
+
+Starts two local stand-ins and points the app at them:
+  - DATABASE_URL   -> a SQLite file with `sensor_data` filled with synthetic
+                      readings for the last `--days` days
+  - THINGSPEAK_URL -> a local HTTP server returning ThingSpeak-style feeds
+                      after `--latency-ms` of artificial delay
+
+then drives `--sessions` simulated viewers through app.py with Streamlit's
+AppTest (one thread per session, `--reruns` reruns each) and reports rerun
+latency percentiles, peak RSS and how often each upstream was called.
+
+    python benchmarks/load_test.py --sessions 20 --reruns 5 --latency-ms 300
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from synthetic import make_feeds, make_sensor_frame  # noqa: E402
+
+
+# ------------------------------
+# Local stand-ins
+# ------------------------------
+def make_sqlite_db(path: Path, days: float) -> str:
+    """Create `sensor_data` in a SQLite file, shaped like the Neon table (ds in naive UTC)."""
+    from sqlalchemy import create_engine
+
+    end = pd.Timestamp.now(tz="UTC").floor("10min")
+    df = make_sensor_frame(days=days, freq="10min", end=end)
+    df["ds"] = df["ds"].dt.tz_convert("UTC").dt.tz_localize(None)
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    df.to_sql("sensor_data", engine, index=False, if_exists="replace")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX ix_sensor_data ON sensor_data (station, ds)"
+        )
+    engine.dispose()
+    return url
+
+
+class FakeThingSpeak:
+    """ThingSpeak feed endpoint on localhost with configurable latency."""
+
+    def __init__(self, latency_s: float = 0.2):
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.calls += 1
+                time.sleep(fake.latency_s)
+                qs = parse_qs(urlparse(self.path).query)
+                n = int(qs.get("results", ["200"])[0])
+                after = pd.Timestamp.now(tz="UTC").floor("min") - pd.Timedelta(
+                    minutes=n
+                )
+                body = json.dumps(
+                    {"channel": {"id": 1}, "feeds": make_feeds(n, after=after)}
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/channels/1/feeds.json"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+# ------------------------------
+# Sessions
+# ------------------------------
+def share_runtime() -> None:
+    """
+    Let AppTest instances run concurrently against one runtime.
+
+    AppTest installs a mock Runtime singleton for each run and resets it to
+    None afterwards, which breaks any other session still running. A real
+    server has one runtime shared by every session, so pin one here.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import (
+        MemoryCacheStorageManager,
+    )
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+def run_session(session_id: int, reruns: int, timeout: float) -> dict:
+    """One simulated viewer: first load + `reruns` reruns; returns latencies in seconds."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+    latencies = []
+    errors = []
+    for i in range(reruns + 1):
+        start = time.perf_counter()
+        try:
+            at.run()
+            if at.exception:
+                errors.append(str(at.exception[0].value))
+        except Exception as exc:
+            errors.append(f"{type(exc).__name__}: {exc}")
+        latencies.append(time.perf_counter() - start)
+    return {"session": session_id, "latencies": latencies, "errors": errors}
+
+
+def _pct(values, q) -> float:
+    return round(float(np.percentile(values, q)) * 1000.0, 1) if len(values) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline concurrent-session load test."
+    )
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--reruns", type=int, default=3)
+    parser.add_argument("--days", type=float, default=14)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="per-run AppTest timeout (s)"
+    )
+    parser.add_argument("--json", help="write the report here")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="baswap-load-")
+    db_url = make_sqlite_db(Path(tmp) / "sensor_data.sqlite", args.days)
+
+    with FakeThingSpeak(args.latency_ms / 1000.0) as thingspeak:
+        # config reads these at import, which happens inside the first AppTest run
+        os.environ["DATABASE_URL"] = db_url
+        os.environ["THINGSPEAK_URL"] = thingspeak.url
+        os.chdir(ROOT)
+
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        db_queries = {"n": 0}
+
+        @event.listens_for(Engine, "before_cursor_execute")
+        def _count(*_):
+            db_queries["n"] += 1
+
+        share_runtime()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            sessions = list(
+                pool.map(
+                    lambda i: run_session(i, args.reruns, args.timeout),
+                    range(args.sessions),
+                )
+            )
+        wall = time.perf_counter() - start
+        ts_calls = thingspeak.calls
+
+    first = [s["latencies"][0] for s in sessions]
+    reruns = [t for s in sessions for t in s["latencies"][1:]]
+    errors = [e for s in sessions for e in s["errors"]]
+    report = {
+        "sessions": args.sessions,
+        "reruns_per_session": args.reruns,
+        "thingspeak_latency_ms": args.latency_ms,
+        "wall_s": round(wall, 2),
+        "first_load_ms": {
+            "p50": _pct(first, 50),
+            "p95": _pct(first, 95),
+            "max": _pct(first, 100),
+        },
+        "rerun_ms": {
+            "p50": _pct(reruns, 50),
+            "p95": _pct(reruns, 95),
+            "p99": _pct(reruns, 99),
+            "max": _pct(reruns, 100),
+        },
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mib": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "upstream_calls": {"thingspeak": ts_calls, "database_queries": db_queries["n"]},
+        "errors": len(errors),
+    }
+    print(json.dumps(report, indent=2))
+    for e in sorted(set(errors))[:5]:
+        print("error:", e)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compare the two Neon readers in data.py on a year of synthetic rows:
+  - sql:  pd.read_sql + ds parsing (the portable path)
+  - copy: COPY (SELECT ...) TO STDOUT parsed by pyarrow, ds as int64 µs
+
+Needs a Postgres URL (a scratch branch, not production). The rows go into a
+throwaway table that is dropped afterwards.
+
+    python benchmarks/neon_read.py --url postgresql://... --days 365 --repeats 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from synthetic import make_sensor_frame  # noqa: E402
+
+
+def _median_time(fn, repeats: int) -> tuple:
+    fn()  # warm-up (connection, plan cache)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark read_sql vs COPY for load_data_neon."
+    )
+    parser.add_argument(
+        "--url", default=os.getenv("BENCH_DATABASE_URL"), help="Postgres URL"
+    )
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--freq", default="10min")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="write the report here")
+    args = parser.parse_args()
+    if not args.url or not args.url.startswith("postgres"):
+        parser.error("--url (or BENCH_DATABASE_URL) must point at a Postgres database")
+
+    # data.py reads DATABASE_URL at import; the readers themselves take the engine
+    os.environ.setdefault("DATABASE_URL", args.url)
+    import logging
+
+    from sqlalchemy import create_engine
+
+    from data import _read_neon_copy, _read_neon_sql
+
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    table = f"sensor_data_bench_{os.getpid()}"
+    engine = create_engine(args.url)
+    df = make_sensor_frame(days=args.days, freq=args.freq)
+    df["ds"] = df["ds"].dt.tz_convert("UTC")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"CREATE TABLE {table} (ds timestamptz, station text, "
+            "ec_us_cm double precision, temperature double precision, "
+            "ec_gl double precision, PRIMARY KEY (station, ds))"
+        )
+    df.to_sql(
+        table, engine, index=False, if_exists="append", method="multi", chunksize=5000
+    )
+
+    # window covering every row, for both stations
+    since = (df["ds"].min() - pd.Timedelta(minutes=1)).to_pydatetime()
+    params = {"main_station": "VinhLong", "main_since": since, "other_since": since}
+
+    try:
+        t_sql, out_sql = _median_time(
+            lambda: _read_neon_sql(engine, params, table), args.repeats
+        )
+        t_copy, out_copy = _median_time(
+            lambda: _read_neon_copy(engine, params, table), args.repeats
+        )
+    finally:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+        engine.dispose()
+
+    # rows sharing a ds may come back in either station order
+    key = ["ds", "station"]
+    pd.testing.assert_frame_equal(
+        out_sql.sort_values(key).reset_index(drop=True),
+        out_copy.sort_values(key).reset_index(drop=True),
+        check_dtype=False,
+    )
+    nbytes = int(out_copy.memory_usage(deep=True).sum())
+    report = {
+        "rows": len(out_sql),
+        "frame_mib": round(nbytes / 2**20, 2),
+        "read_sql_s": round(t_sql, 4),
+        "copy_s": round(t_copy, 4),
+        "speedup": round(t_sql / t_copy, 2) if t_copy else None,
+        "read_sql_rows_per_s": round(len(out_sql) / t_sql),
+        "copy_rows_per_s": round(len(out_copy) / t_copy),
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the data, aggregation and plotting hot paths.
+
+Times each function on synthetic multi-station data (see synthetic.py) and
+writes a JSON file that later runs can be compared against:
+
+    python benchmarks/run_benchmarks.py --out bench.json
+    python benchmarks/run_benchmarks.py --sizes 14d-10min 1y-1min --repeats 7
+    python benchmarks/run_benchmarks.py --compare bench.json --threshold 0.25
+
+With --compare, exits 1 when any case's median is more than `threshold`
+(relative) slower than in the baseline file.
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from synthetic import make_feeds, make_sensor_frame  # noqa: E402
+
+# name -> (days, cadence)
+SIZES = {
+    "14d-10min": (14, "10min"),
+    "90d-10min": (90, "10min"),
+    "1y-10min": (365, "10min"),
+    "3y-10min": (3 * 365, "10min"),
+    "14d-1min": (14, "1min"),
+    "1y-1min": (365, "1min"),
+}
+DEFAULT_SIZES = ["14d-10min", "1y-10min", "14d-1min"]
+
+FREQS = ("10min", "Hour", "Day")
+STAT_SETS = {"median": ["Median"], "all": ["Min", "Max", "Median"]}
+STATION = "Vĩnh Long"
+TARGET_COL = "ec_gl"
+
+
+def _raw(fn):
+    """Bypass the Streamlit cache so the function body itself is timed."""
+    return getattr(fn, "__wrapped__", fn)
+
+
+def build_cases(df: pd.DataFrame) -> dict:
+    """name -> zero-arg callable, all operating on the same synthetic frame."""
+    from aggregation import apply_aggregation, filter_data
+    from data import append_new_data
+    from plotting import _inject_nans_for_gaps, display_statistics, prepare_chart_frame
+    from quantile_sketch import SketchIndex
+    from stats_index import StatsIndex
+    from station_data import STATION_NAMES
+
+    date_from = df["ds"].min().date()
+    date_to = df["ds"].max().date()
+    filtered = filter_data(df, STATION, date_from, date_to)
+    index = StatsIndex(df, TARGET_COL)
+    sketches = SketchIndex(df, TARGET_COL).series[STATION_NAMES.code_of(STATION)]
+
+    neon_like = df.copy()
+    neon_like["ds"] = neon_like["ds"].dt.tz_convert("UTC")
+    feeds = make_feeds(200, after=neon_like["ds"].max())
+
+    cases = {
+        "append_new_data": lambda: _raw(append_new_data)(neon_like, feeds),
+        "filter_data": lambda: filter_data(df, STATION, date_from, date_to),
+        "stats_index.build": lambda: StatsIndex(df, TARGET_COL),
+        "sketch_index.build": lambda: SketchIndex(df, TARGET_COL),
+        "display_statistics": lambda: display_statistics(
+            index.stats(STATION_NAMES.code_of(STATION), date_from, date_to)
+        ),
+    }
+    for freq in FREQS:
+        for label, stats in STAT_SETS.items():
+            cases[f"apply_aggregation[{freq},{label}]"] = (
+                lambda f=freq, s=stats: apply_aggregation(filtered, TARGET_COL, f, s)
+            )
+        cases[f"apply_aggregation_sketched[{freq},P5/Median/P95]"] = (
+            lambda f=freq: apply_aggregation(
+                filtered, TARGET_COL, f, ["P5", "Median", "P95"], quantiles=sketches
+            )
+        )
+
+    for freq in FREQS:
+        agg = apply_aggregation(filtered, TARGET_COL, freq, ["Median"])
+        prepared, gap, disp_fmt = prepare_chart_frame(agg, freq)
+        cases[f"_inject_nans_for_gaps[{freq}]"] = (
+            lambda p=prepared, g=gap, d=disp_fmt: _inject_nans_for_gaps(
+                p,
+                time_col="Timestamp (Rounded)",
+                value_col=TARGET_COL,
+                cat_col="Aggregation",
+                max_gap=g,
+                display_col="Timestamp (Rounded Display)",
+                display_fmt=d,
+            )
+        )
+        if freq in ("Hour", "Day"):
+            cases[f"render_predictions[{freq}]"] = (
+                lambda p=prepared, f=freq: _uncached_forecast(p, f)
+            )
+    return cases
+
+
+def _uncached_forecast(prepared: pd.DataFrame, freq: str):
+    """render_predictions with the forecast cache cleared, so inference is timed too."""
+    from models.neuroforecast_model import make_predictions
+    from plotting import render_predictions
+
+    make_predictions.clear()
+    return render_predictions(prepared, TARGET_COL, freq)
+
+
+def _quiet_streamlit() -> None:
+    # bare-mode st.* calls warn about the missing ScriptRunContext on every call
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def time_case(fn, repeats: int) -> dict:
+    fn()  # warm-up (imports, model load, caches)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "median_s": float(np.median(times)),
+        "min_s": float(np.min(times)),
+        "max_s": float(np.max(times)),
+        "repeats": repeats,
+    }
+
+
+def run(sizes, repeats: int, only: str | None = None) -> dict:
+    results = {}
+    for size in sizes:
+        days, cadence = SIZES[size]
+        df = make_sensor_frame(days=days, freq=cadence)
+        cases = build_cases(df)
+        _quiet_streamlit()
+        for name, fn in cases.items():
+            if only and only not in name:
+                continue
+            key = f"{size}/{name}"
+            try:
+                res = time_case(fn, repeats)
+            except ImportError as exc:  # e.g. forecasting stack not installed
+                res = {"skipped": f"{type(exc).__name__}: {exc}"}
+            res["rows"] = len(df)
+            results[key] = res
+            shown = (
+                f"{res['median_s'] * 1000:10.2f} ms"
+                if "median_s" in res
+                else "   skipped"
+            )
+            print(f"{shown}  {key}")
+    return results
+
+
+def _git_sha() -> str | None:
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+            or None
+        )
+    except OSError:
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Return [(case, baseline_s, current_s, ratio)] for cases slower than threshold."""
+    regressions = []
+    for key, cur in current.items():
+        base = baseline.get(key)
+        if not base or "median_s" not in base or "median_s" not in cur:
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        if ratio > 1.0 + threshold:
+            regressions.append((key, base["median_s"], cur["median_s"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark data/aggregation/plotting hot paths."
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", default=DEFAULT_SIZES, choices=list(SIZES)
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--only", help="run only cases whose name contains this string")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed relative slowdown"
+    )
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeats, args.only)
+    payload = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_sha": _git_sha(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(payload, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, b, c, ratio in regressions:
+            print(
+                f"REGRESSION {key}: {b * 1000:.2f} ms -> {c * 1000:.2f} ms "
+                f"({ratio:.2f}x)"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Synthetic multi-station sensor data shaped like the app's datasets.
+
+`make_sensor_frame` returns the merged dataset as `combined_data_retrieve`
+produces it (tz-aware GMT+7 `ds`, one row per station per reading);
+`make_feeds` returns ThingSpeak-style feed dicts for `append_new_data`.
+"""
+
+import numpy as np
+import pandas as pd
+
+STATIONS = ("VinhLong", "CanGio")
+
+
+def make_sensor_frame(
+    days: float = 14,
+    freq: str = "10min",
+    stations=STATIONS,
+    gap_fraction: float = 0.01,
+    seed: int = 0,
+    tz: str = "Asia/Bangkok",
+    end: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    """
+    Tidal-looking EC/temperature series for each station.
+
+    About `gap_fraction` of readings are dropped in runs so the charts see
+    realistic sensor outages.
+    """
+    rng = np.random.default_rng(seed)
+    end = (
+        pd.Timestamp("2026-01-01", tz="UTC")
+        if end is None
+        else pd.Timestamp(end).tz_convert("UTC")
+    )
+    ds = pd.date_range(
+        end=end, periods=int(pd.Timedelta(days=days) / pd.Timedelta(freq)), freq=freq
+    )
+    hours = (ds - ds[0]).total_seconds().to_numpy() / 3600.0
+
+    frames = []
+    for i, station in enumerate(stations):
+        # semi-diurnal tide + spring/neap cycle + seasonal drift + noise
+        tide = np.sin(2 * np.pi * hours / 12.42 + i) * (
+            1 + 0.5 * np.sin(2 * np.pi * hours / (24 * 14.77))
+        )
+        season = 0.5 * np.sin(2 * np.pi * hours / (24 * 365))
+        ec_gl = np.clip(
+            1.2 + 0.8 * tide + season + rng.normal(0, 0.05, len(ds)), 0.05, None
+        )
+        frame = pd.DataFrame(
+            {
+                "ds": ds,
+                "station": station,
+                "ec_us_cm": ec_gl * 2000.0,
+                "temperature": 28
+                + 2 * np.sin(2 * np.pi * hours / 24)
+                + rng.normal(0, 0.2, len(ds)),
+                "ec_gl": ec_gl,
+            }
+        )
+        if gap_fraction > 0:
+            n_gaps = max(1, int(len(frame) * gap_fraction / 20))
+            starts = rng.integers(0, len(frame), n_gaps)
+            drop = np.unique(
+                np.concatenate([np.arange(s, min(s + 20, len(frame))) for s in starts])
+            )
+            frame = frame.drop(index=drop)
+        frames.append(frame)
+
+    df = pd.concat(frames, ignore_index=True).sort_values("ds").reset_index(drop=True)
+    df["ds"] = df["ds"].dt.tz_convert(tz)
+    return df
+
+
+def make_feeds(
+    n: int = 200, after: pd.Timestamp | None = None, freq: str = "1min", seed: int = 1
+) -> list:
+    """ThingSpeak feed dicts (field1=EC µS/cm, field2=temperature, field3=EC mg/L)."""
+    rng = np.random.default_rng(seed)
+    start = (after or pd.Timestamp("2026-01-01", tz="UTC")).tz_convert(
+        "UTC"
+    ) + pd.Timedelta(freq)
+    ds = pd.date_range(start=start, periods=n, freq=freq)
+    ec_mgl = np.clip(1200 + rng.normal(0, 50, n), 0, None)
+    return [
+        {
+            "created_at": t.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "entry_id": i + 1,
+            "field1": f"{v * 2:.2f}",
+            "field2": f"{28 + rng.normal(0, 0.2):.2f}",
+            "field3": f"{v:.2f}",
+        }
+        for i, (t, v) in enumerate(zip(ds, ec_mgl))
+    ]
@@ -22,9 +22,60 @@ UTC = pytz.utc
 THINGSPEAK_URL = get_secret("THINGSPEAK_URL")
 DATABASE_URL = get_secret("DATABASE_URL")
 
+# Set LIVE_THINGSPEAK=0 when the ingestion daemon keeps Neon near-real-time;
+# sessions then read Neon only instead of topping up from ThingSpeak.
+LIVE_THINGSPEAK = (get_secret("LIVE_THINGSPEAK") or "1") != "0"
+
+# How load_data_neon reads Postgres: "copy" streams COPY ... TO STDOUT into
+# pyarrow's CSV parser, "sql" uses pd.read_sql. SQLite always uses read_sql.
+NEON_READER = get_secret("NEON_READER") or "copy"
+
+# Station layer on the overview map: "markers" (one BeautifyIcon pin per
+# station) or "geojson" (one FeatureCollection of canvas circle markers,
+# styled in the browser; for networks with thousands of stations).
+MAP_MODE = get_secret("MAP_MODE") or "markers"
+
+# Median/P5/P95 of the charts. The two modes summarize different readings:
+# "approx" merges the KLL sketches kept per station and 10-minute bin
+# (`sensor_sketches`, filled at ingest from every raw reading; bins without one
+# use the loaded rows), "exact" computes them from the `sensor_data` rows, which
+# keep only the last reading of each 10-minute bin. So "approx" is not an
+# approximation of "exact"; the charts say which one they show.
+QUANTILE_MODE = get_secret("QUANTILE_MODE") or "approx"
+
+# `?warmup=<token>` runs the cache warm-up synchronously (scheduled wake job);
+# disabled unless WARMUP_TOKEN is set.
+WARMUP_TOKEN = get_secret("WARMUP_TOKEN")
+# WARMUP_ON_START=1 also loads the forecast models in the background when the
+# server process starts; off by default so cold starts stay lazy (torch and
+# neuralforecast are only imported once a forecast is drawn or warmed).
+WARMUP_ON_START = (get_secret("WARMUP_ON_START") or "0") == "1"
+
 COMBINED_ID = get_secret("FILE_ID")
 SECRET_ACC = get_secret("SERVICE_ACCOUNT")
 
+# Forecast models. `quantize` runs the model with dynamic int8 weights on CPU;
+# set QUANTIZE_MODELS to a comma-separated list of model ids (e.g. "Hour") to opt in.
+QUANTIZED_MODELS = {
+    m.strip() for m in (get_secret("QUANTIZE_MODELS") or "").split(",") if m.strip()
+}
+
+MODEL_CONFIG = {
+    "Hour": {
+        "path": "models/weights/nbeats_1h_24_7",
+        "quantize": "Hour" in QUANTIZED_MODELS,
+    },
+    "Day": {
+        "path": "models/weights/nhbeats_1d_30_7",
+        "quantize": "Day" in QUANTIZED_MODELS,
+    },
+    "LSTM-Max": {
+        "path": "weights/hourly_max.ckpt",
+        "scaler": "scalers/scaler_vinhlong.pkl",
+        "quantize": "LSTM-Max" in QUANTIZED_MODELS,
+    },
+}
+
 METRIC_CONFIG = {
     "ec_gl": {
         "en": {
@@ -115,6 +166,9 @@ APP_TEXTS = {
         "legend_pi90": "90% prediction interval",
         "legend_pi50": "50% prediction interval",
         "legend_title": "EC warning levels",
+        "time_in_level": "Time in warning level",
+        "quantiles_approx": "Medians of every raw reading (sketches, ~1% rank error).",
+        "quantiles_exact": "Medians of the last reading of each 10-minute interval.",
     },
     "vi": {
         "app_title": " ",
@@ -157,6 +211,9 @@ APP_TEXTS = {
         "legend_pi90": "Khoảng dự báo 90%",
         "legend_pi50": "Khoảng dự báo 50%",
         "legend_title": "Mức cảnh báo EC",
+        "time_in_level": "Thời gian theo mức cảnh báo",
+        "quantiles_approx": "Trung vị của mọi số đo gốc (ước lượng, sai số hạng ~1%).",
+        "quantiles_exact": "Trung vị của số đo cuối cùng trong mỗi khoảng 10 phút.",
     },
 }
 
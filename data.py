@@ -1,16 +1,24 @@
 import os
 import sys
-import json
 from datetime import datetime
 from typing import List, Dict
 
-from sqlalchemy import create_engine
-
 import pandas as pd
 import requests
 import streamlit as st
 
-from config import GMT7, UTC, THINGSPEAK_URL, DATABASE_URL
+import perf
+import thingspeak_client
+from config import (
+    GMT7,
+    UTC,
+    THINGSPEAK_URL,
+    DATABASE_URL,
+    LIVE_THINGSPEAK,
+    NEON_READER,
+    get_secret,
+)
+from station_data import DEFAULT_FIELDS, STATION_NAMES, configured_channels
 
 # local utils live one level up (keeps imports working when run from /data)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "utils")))
@@ -46,81 +54,90 @@ def _to_bangkok(series: pd.Series) -> pd.Series:
 # ------------------------------
 # ThingSpeak fetch + merge
 # ------------------------------
-@st.cache_data(ttl=600)
-def fetch_thingspeak_data(results: int) -> List[Dict]:
-    """Pull the latest <results> rows from ThingSpeak."""
-    url = f"{THINGSPEAK_URL}?results={results}"
+@perf.cached(st.cache_data(ttl=600), "data.fetch_thingspeak_data")
+def fetch_thingspeak_data(results: int, channel_url: str | None = None) -> List[Dict]:
+    """Pull the latest <results> rows from a ThingSpeak channel (THINGSPEAK_URL by default)."""
     try:
-        r = requests.get(url, timeout=10)
+        payload = thingspeak_client.fetch_feeds(
+            channel_url or THINGSPEAK_URL, {"results": results}
+        )
+    except requests.HTTPError as exc:
+        st.error(
+            "Failed to fetch data from ThingSpeak API "
+            f"(status {exc.response.status_code})"
+        )
+        return []
     except Exception as exc:
         st.error(f"Failed to fetch data from ThingSpeak API: {exc}")
         return []
+    return payload.get("feeds", [])
+
+
+def _parse_feed(feed: Dict, station: str, fields: Dict) -> Dict | None:
+    """One ThingSpeak feed entry as a Neon-schema row (ds tz-aware UTC), or None if unusable."""
+    created = feed.get("created_at")
+    if not created:
+        return None
 
-    if r.status_code == 200:
-        return json.loads(r.text).get("feeds", [])
-    st.error(f"Failed to fetch data from ThingSpeak API (status {r.status_code})")
-    return []
+    # parse ThingSpeak UTC timestamp into tz-aware UTC
+    # expected format: "2026-03-09T12:34:56Z"
+    try:
+        created_ts_utc = pd.to_datetime(created, format="%Y-%m-%dT%H:%M:%SZ", utc=True)
+    except Exception:
+        created_ts_utc = pd.to_datetime(created, utc=True, errors="coerce")
 
+    if pd.isna(created_ts_utc):
+        return None
 
-@st.cache_data(ttl=600)
-def append_new_data(df: pd.DataFrame, feeds: List[Dict]) -> pd.DataFrame:
-    """Append any newer rows from ThingSpeak to df using Neon schema.
+    def to_float(x):
+        try:
+            return float(x)
+        except (TypeError, ValueError):
+            return None
+
+    ec_mgl = to_float(feed.get(fields["ec_mgl"]))
+    return {
+        "ds": created_ts_utc,  # tz-aware UTC
+        "station": station,
+        "ec_us_cm": to_float(feed.get(fields["ec_us_cm"])),
+        "temperature": to_float(feed.get(fields["temperature"])),
+        "ec_gl": ec_mgl / 1000 if ec_mgl is not None else None,
+    }
+
+
+@perf.cached(st.cache_data(ttl=600), "data.append_new_data")
+def append_new_data(
+    df: pd.DataFrame,
+    feeds: List[Dict],
+    station: str = "VinhLong",
+    fields: Dict | None = None,
+) -> pd.DataFrame:
+    """Append any newer rows of one station's ThingSpeak channel to df using Neon schema.
 
     Notes:
+    - `fields` maps ec_us_cm/temperature/ec_mgl to the channel's ThingSpeak fields.
+    - Only rows newer than the station's own latest timestamp are added.
     - All comparisons are done in UTC (tz-aware).
     - Rows from ThingSpeak are parsed as UTC and kept as tz-aware UTC while merging.
     - Dedupe/sort applied after concat.
     """
-    # determine last timestamp in df (as tz-aware UTC) or None
+    fields = fields or DEFAULT_FIELDS
+
+    # determine the station's last timestamp in df (as tz-aware UTC) or None
     if df.empty:
         last_ts_utc = None
     else:
-        last_ts_utc = _ensure_utc_series(df["ds"]).max()
+        last_ts_utc = _ensure_utc_series(df.loc[df["station"] == station, "ds"]).max()
         if pd.isna(last_ts_utc):
             last_ts_utc = None
 
     rows = []
     for feed in feeds:
-        created = feed.get("created_at")
-        if not created:
-            continue
-
-        # parse ThingSpeak UTC timestamp into tz-aware UTC
-        # expected format: "2026-03-09T12:34:56Z"
-        try:
-            created_ts_utc = pd.to_datetime(
-                created, format="%Y-%m-%dT%H:%M:%SZ", utc=True
-            )
-        except Exception:
-            created_ts_utc = pd.to_datetime(created, utc=True, errors="coerce")
-
-        if pd.isna(created_ts_utc):
+        row = _parse_feed(feed, station, fields)
+        # skip unparseable and older/equal rows
+        if row is None or (last_ts_utc is not None and row["ds"] <= last_ts_utc):
             continue
-
-        # skip older/equal rows
-        if last_ts_utc is not None and created_ts_utc <= last_ts_utc:
-            continue
-
-        def to_float(x):
-            try:
-                return float(x)
-            except (TypeError, ValueError):
-                return None
-
-        ec_us_cm = to_float(feed.get("field1"))
-        temperature = to_float(feed.get("field2"))
-        ec_mgl = to_float(feed.get("field3"))
-        ec_gl = ec_mgl / 1000 if ec_mgl is not None else None
-
-        rows.append(
-            {
-                "ds": created_ts_utc,  # tz-aware UTC
-                "station": "VinhLong",
-                "ec_us_cm": ec_us_cm,
-                "temperature": temperature,
-                "ec_gl": ec_gl,
-            }
-        )
+        rows.append(row)
 
     if not rows:
         return df
@@ -142,59 +159,333 @@ def append_new_data(df: pd.DataFrame, feeds: List[Dict]) -> pd.DataFrame:
     return df
 
 
-@st.cache_data(ttl=600)
+@perf.cached(st.cache_data(ttl=600), "data.thingspeak_retrieve")
 def thingspeak_retrieve(df: pd.DataFrame) -> pd.DataFrame:
-    """Top-up *df* with fresh ThingSpeak rows."""
+    """Top-up *df* with fresh rows from every configured ThingSpeak channel."""
     results = 200  # fixed pull size (adjust if needed)
-    feeds = fetch_thingspeak_data(results)
-    return append_new_data(df, feeds)
+    for ch in configured_channels(get_secret):
+        feeds = fetch_thingspeak_data(results, ch["url"])
+        df = append_new_data(df, feeds, ch["station"], ch["fields"])
+    return df
 
 
 # ------------------------------
 # Neon database
 # ------------------------------
-@st.cache_data(ttl=3 * 3600 + 300)  # cache for 3 hours (data updates every ~3h)
+@st.cache_resource
+def get_engine():
+    """One pooled SQLAlchemy engine per process (DATABASE_URL may be Postgres or SQLite)."""
+    from sqlalchemy import create_engine
+
+    return create_engine(DATABASE_URL, pool_pre_ping=True)
+
+
+def _since_params(engine) -> dict:
+    """Window start times for the Neon query, bound as parameters (portable SQL)."""
+    now = pd.Timestamp.now(tz=UTC)
+    params = {
+        "main_station": "VinhLong",
+        "main_since": now - pd.Timedelta(days=14),
+        "other_since": now - pd.Timedelta(hours=12),
+    }
+    for k in ("main_since", "other_since"):
+        ts = params[k]
+        # SQLite stores naive UTC strings; Postgres compares timestamptz
+        params[k] = (
+            ts.tz_localize(None) if engine.dialect.name == "sqlite" else ts
+        ).to_pydatetime()
+    return params
+
+
+NEON_COLUMNS = ["ds", "station", "ec_us_cm", "temperature", "ec_gl"]
+
+# shared by both readers; placeholders are filled with the driver's param style
+_NEON_WHERE = """
+    WHERE
+        (
+            station = {main_station}
+            AND ds >= {main_since}
+        )
+        OR
+        (
+            station <> {main_station}
+            AND ds >= {other_since}
+        )
+"""
+_PARAM_NAMES = ("main_station", "main_since", "other_since")
+
+
+def _read_neon_sql(engine, params: dict, table: str = "sensor_data") -> pd.DataFrame:
+    """Portable path: pd.read_sql, then parse `ds` as UTC."""
+    from sqlalchemy import text
+
+    where = _NEON_WHERE.format(**{k: f":{k}" for k in _PARAM_NAMES})
+    query = text(
+        f"SELECT ds, station, ec_us_cm, temperature, ec_gl FROM {table} {where} "
+        "ORDER BY ds DESC"
+    )
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params=params)
+
+    # normalize to tz-aware UTC (handles strings, naive, or tz-aware inputs)
+    df["ds"] = _ensure_utc_series(df["ds"])
+    return df
+
+
+def _read_neon_copy(engine, params: dict, table: str = "sensor_data") -> pd.DataFrame:
+    """
+    Postgres path: COPY (SELECT ...) TO STDOUT as CSV, parsed by pyarrow into
+    typed columns. `ds` travels as int64 epoch microseconds, so no per-row
+    Python objects or datetime string parsing are involved.
+    """
+    import io
+
+    where = _NEON_WHERE.format(**{k: f"%({k})s" for k in _PARAM_NAMES})
+    select = (
+        "SELECT (extract(epoch FROM ds) * 1000000)::bigint AS ds_us, "
+        f"station, ec_us_cm, temperature, ec_gl FROM {table} {where} ORDER BY ds DESC"
+    )
+    buf = io.BytesIO()
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            # COPY takes no bind parameters; mogrify quotes them client-side
+            sql = cur.mogrify(select, params).decode()
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", buf)
+    finally:
+        raw.close()
+
+    if not buf.getbuffer().nbytes:
+        df = pd.DataFrame(columns=NEON_COLUMNS)
+        df["ds"] = pd.to_datetime(df["ds"], utc=True)
+        return df
+    buf.seek(0)
+    df = pd.read_csv(
+        buf,
+        names=["ds_us", "station", "ec_us_cm", "temperature", "ec_gl"],
+        header=None,
+        engine="pyarrow",
+        dtype={
+            "ds_us": "int64",
+            "ec_us_cm": "float64",
+            "temperature": "float64",
+            "ec_gl": "float64",
+        },
+    )
+    df.insert(0, "ds", pd.to_datetime(df.pop("ds_us"), unit="us", utc=True))
+    return df
+
+
+# cache for 3 hours when Neon is fed by the 3-hourly batch; with the ingestion
+# daemon (LIVE_THINGSPEAK=0) Neon is fresh, so re-read it every couple of minutes
+NEON_TTL = 3 * 3600 + 300 if LIVE_THINGSPEAK else 120
+
+
+@perf.cached(st.cache_data(ttl=NEON_TTL), "data.load_data_neon")
 def load_data_neon() -> pd.DataFrame:
     """
     Load recent data from Neon database:
     - VinhLong: last 14 days
     - all other stations: last 12 hours
 
-    Assumes Neon `ds` is stored in UTC (or as UTC strings). We parse as UTC to get
-    tz-aware timestamps and keep them as UTC until final conversion.
+    Assumes Neon `ds` is stored in UTC (or as UTC strings). Both readers return
+    tz-aware UTC timestamps, kept as UTC until final conversion.
     """
-    engine = create_engine(DATABASE_URL)
+    engine = get_engine()
+    params = _since_params(engine)
+    # COPY needs psycopg2's copy_expert; other drivers/dialects use read_sql
+    if NEON_READER == "copy" and engine.dialect.driver == "psycopg2":
+        return _read_neon_copy(engine, params)
+    return _read_neon_sql(engine, params)
+
+
+# ------------------------------
+# Quantile sketches per station and 10-minute bin
+# ------------------------------
+SKETCH_COLUMNS = ("ec_us_cm", "temperature", "ec_gl")
+
+
+def _sketch_query(value_col: str, columns: str, since=None):
+    """(engine, query, params) over the stored sketches in the load_data_neon window, or None."""
+    from sqlalchemy import text
+
+    engine = get_engine()
+    if value_col not in SKETCH_COLUMNS or engine.dialect.name != "postgresql":
+        return None
+    params = _since_params(engine)
+    where = _NEON_WHERE.format(**{k: f":{k}" for k in _PARAM_NAMES})
+    query = f"SELECT {columns} FROM sensor_sketches {where}"
+    if since is not None:
+        query = f"SELECT * FROM ({query}) AS s WHERE ds >= :since"
+        params["since"] = pd.Timestamp(since).to_pydatetime()
+    return engine, text(query), params
+
+
+@perf.cached(st.cache_data(ttl=NEON_TTL), "data.sketch_watermark")
+def sketch_watermark(value_col: str) -> tuple:
+    """
+    (bins, newest bin, readings) of the stored `value_col` sketches in the
+    load_data_neon window: changes whenever a bin is added, merged into or
+    leaves the window. (0, None, 0) without a `sensor_sketches` table.
+    """
+    from sqlalchemy.exc import DBAPIError
+
+    q = _sketch_query(value_col, f"count({value_col}), max(ds), sum(n)")
+    if q is None:
+        return 0, None, 0
+    engine, query, params = q
     with engine.connect() as conn:
-        query = """
-            SELECT ds, station, ec_us_cm, temperature, ec_gl
-            FROM sensor_data
-            WHERE
-                (
-                    station = 'VinhLong'
-                    AND ds >= NOW() - INTERVAL '14 days'
-                )
-                OR
-                (
-                    station <> 'VinhLong'
-                    AND ds >= NOW() - INTERVAL '12 hours'
-                )
-            ORDER BY ds DESC
-        """
-        df = pd.read_sql(query, conn)
+        try:
+            count, newest, total = conn.execute(query, params).one()
+        except DBAPIError:  # not migrated yet
+            return 0, None, 0
+    return int(count), None if newest is None else str(newest), int(total or 0)
 
-    # normalize to tz-aware UTC (handles strings, naive, or tz-aware inputs)
+
+@perf.timed("data.load_sketch_bins")
+def load_sketch_bins(value_col: str) -> pd.DataFrame:
+    """ds [UTC], station and n of every stored `value_col` sketch in the load_data_neon window (no bytes)."""
+    from sqlalchemy.exc import DBAPIError
+
+    empty = pd.DataFrame({"ds": pd.to_datetime([], utc=True), "station": [], "n": []})
+    q = _sketch_query(
+        value_col, f"ds, station, n, {value_col} IS NOT NULL AS has_sketch"
+    )
+    if q is None:
+        return empty
+    engine, query, params = q
+    with engine.connect() as conn:
+        try:
+            df = pd.read_sql(query, conn, params=params)
+        except DBAPIError:
+            return empty
+    df = df.loc[df["has_sketch"].astype(bool), ["ds", "station", "n"]]
     df["ds"] = _ensure_utc_series(df["ds"])
     return df
 
 
+@perf.timed("data.load_sketches_neon")
+def load_sketches_neon(value_col: str, since=None) -> pd.DataFrame:
+    """
+    Stored sketches of `value_col` (columns ds [UTC], station, <value_col> as
+    bytes) over the same window as load_data_neon, only bins from `since` on
+    if given. Empty when the database has no `sensor_sketches` table (SQLite,
+    or not migrated yet).
+    """
+    from sqlalchemy.exc import DBAPIError
+
+    empty = pd.DataFrame(
+        {"ds": pd.to_datetime([], utc=True), "station": [], value_col: []}
+    )
+    q = _sketch_query(value_col, f"ds, station, {value_col}", since=since)
+    if q is None:
+        return empty
+    engine, query, params = q
+    with engine.connect() as conn:
+        try:
+            df = pd.read_sql(query, conn, params=params)
+        except DBAPIError:  # not migrated yet
+            return empty
+    df = df.dropna(subset=[value_col])
+    df["ds"] = _ensure_utc_series(df["ds"])
+    df[value_col] = df[value_col].map(bytes)
+    return df
+
+
+# ------------------------------
+# Latest reading per station (map colours + station table)
+# ------------------------------
+LATEST_WINDOW_DAYS = 30  # stations silent for longer show no current value
+
+
+def _read_latest(engine) -> pd.DataFrame:
+    """
+    One row per station from Neon: the `latest_readings` table maintained at
+    ingest, else a single DISTINCT ON (Postgres) / max-join (portable) query.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    cols = "station, ds, ec_us_cm, temperature, ec_gl"
+    since = pd.Timestamp.now(tz=UTC) - pd.Timedelta(days=LATEST_WINDOW_DAYS)
+    since = (
+        since.tz_localize(None) if engine.dialect.name == "sqlite" else since
+    ).to_pydatetime()
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            try:
+                return pd.read_sql(text(f"SELECT {cols} FROM latest_readings"), conn)
+            except DBAPIError:  # not migrated yet
+                conn.rollback()
+            query = f"""
+                SELECT DISTINCT ON (station) {cols}
+                FROM sensor_data
+                WHERE ds >= :since
+                ORDER BY station, ds DESC
+            """
+        else:
+            query = """
+                SELECT s.station, s.ds, s.ec_us_cm, s.temperature, s.ec_gl
+                FROM sensor_data s
+                JOIN (
+                    SELECT station, max(ds) AS ds FROM sensor_data WHERE ds >= :since GROUP BY station
+                ) m ON s.station = m.station AND s.ds = m.ds
+            """
+        return pd.read_sql(text(query), conn, params={"since": since})
+
+
+def latest_from_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Last resort: newest row per station of an already loaded dataset."""
+    d = df.dropna(subset=["ds"])
+    return d.loc[d.groupby("station", observed=True)["ds"].idxmax()].reset_index(
+        drop=True
+    )
+
+
+@perf.cached(st.cache_data(ttl=min(NEON_TTL, 600)), "data.latest_readings")
+def latest_readings() -> pd.DataFrame:
+    """
+    Newest reading per station (columns station, ds [UTC], ec_us_cm, temperature,
+    ec_gl), O(stations) rows. With LIVE_THINGSPEAK, each channel's newest feed
+    entry replaces the Neon row when it is more recent.
+    """
+    df = _read_latest(get_engine())
+    df["ds"] = _ensure_utc_series(df["ds"])
+    if not LIVE_THINGSPEAK:
+        return df
+
+    latest = {row["station"]: row for row in df.to_dict("records")}
+    for ch in configured_channels(get_secret):
+        # same call as thingspeak_retrieve, so normally a cache hit
+        feeds = fetch_thingspeak_data(200, ch["url"])
+        for feed in reversed(feeds):
+            row = _parse_feed(feed, ch["station"], ch["fields"])
+            if row is None:
+                continue
+            current = latest.get(ch["station"])
+            if current is None or row["ds"] > current["ds"]:
+                latest[ch["station"]] = row
+            break
+    out = pd.DataFrame(list(latest.values()), columns=NEON_COLUMNS)
+    out["ds"] = _ensure_utc_series(out["ds"])
+    return out
+
+
+def station_categorical(station: pd.Series) -> pd.Categorical:
+    """`station` as a categorical over the registry's DB codes (plus any others present)."""
+    extra = sorted(set(station.dropna().unique()) - set(STATION_NAMES.codes))
+    return pd.Categorical(station, categories=STATION_NAMES.codes + extra)
+
+
 # ------------------------------
 # Load merged dataset (cached) — final conversion to GMT+7
 # ------------------------------
-@st.cache_data(ttl=600)
+@perf.cached(st.cache_data(ttl=600), "data.combined_data_retrieve")
 def combined_data_retrieve() -> pd.DataFrame:
     """Load Neon + ThingSpeak merged; convert final `ds` to GMT+7 naive timestamps."""
     df = load_data_neon()
-    df = thingspeak_retrieve(df)
+    if LIVE_THINGSPEAK:
+        df = thingspeak_retrieve(df)
 
     # At this point df["ds"] should be tz-aware UTC. Convert to GMT+7 then drop tzinfo if you want naive local times.
     df["ds"] = _ensure_utc_series(df["ds"]).dt.tz_convert(GMT7)
@@ -202,4 +493,7 @@ def combined_data_retrieve() -> pd.DataFrame:
     # keep deterministic ordering
     df = df.sort_values("ds").reset_index(drop=True)
 
+    # station filters compare integer codes instead of strings
+    df["station"] = station_categorical(df["station"])
+
     return df
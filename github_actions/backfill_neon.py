@@ -0,0 +1,273 @@
+# backfill_neon.py
+"""
+Backfill Neon from ThingSpeak history for a date range.
+
+    python github_actions/backfill_neon.py --start 2025-10-01 --end 2025-11-01
+    python github_actions/backfill_neon.py --start 2025-10-01 --workers 4 --rate 2
+    python github_actions/backfill_neon.py --start 2025-10-01 --station CanGio
+
+The range is cut into windows expected to hold fewer than 8000 entries (the
+ThingSpeak per-request cap). Windows are fetched concurrently, rate limited,
+and a window that comes back full is split in half and fetched again. Each
+window is resampled and bulk-upserted (COPY), with the quantile sketches of
+its bins, as soon as it arrives, and its key is written to the checkpoint
+file, so a rerun resumes where it stopped. The monthly partitions of the
+range are created first.
+All configured channels are backfilled unless --station picks some.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+import requests
+
+from migrate_neon import ensure_partitions
+from update_neon import (
+    CHANNELS,
+    DATABASE_URL,
+    THINGSPEAK_MAX_RESULTS,
+    feeds_to_resampled_df,
+    fetch_thingspeak_data,
+    update_latest_readings,
+    upsert_df_to_postgres,
+    upsert_feed_sketches,
+)
+import thingspeak_client  # repo root, put on sys.path by update_neon
+
+
+# ---------- rate limiting ----------
+class TokenBucket:
+    """Allow `rate` requests per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ---------- windows ----------
+def plan_windows(
+    start: datetime, end: datetime, entries_per_hour: float, sample_minutes: int
+) -> list:
+    """
+    [(start, end)] covering [start, end), each expected to stay under the
+    ThingSpeak cap. Boundaries are aligned to the resample bins so no bin is
+    split across two windows.
+    """
+    hours = 0.8 * THINGSPEAK_MAX_RESULTS / max(entries_per_hour, 1e-9)
+    step = max(sample_minutes, int(hours * 60) // sample_minutes * sample_minutes)
+    step = timedelta(minutes=step)
+    bin_s = sample_minutes * 60
+    cur = datetime.fromtimestamp(start.timestamp() // bin_s * bin_s, tz=timezone.utc)
+
+    windows = []
+    while cur < end:
+        windows.append((cur, min(cur + step, end)))
+        cur += step
+    return windows
+
+
+def window_key(window, station: str) -> str:
+    return f"{station}:{window[0].isoformat()}/{window[1].isoformat()}"
+
+
+def fetch_window(
+    window,
+    channel: dict,
+    bucket: TokenBucket,
+    session: requests.Session,
+    sample_minutes: int,
+    retries: int = 3,
+) -> list:
+    """Feeds of `channel` in [start, end); splits the window while ThingSpeak truncates it."""
+    start, end = window
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            # ThingSpeak's end is inclusive; stop one second short of the next window
+            feeds = fetch_thingspeak_data(
+                results=THINGSPEAK_MAX_RESULTS,
+                start=start,
+                end=end - timedelta(seconds=1),
+                session=session,
+                url=channel["url"],
+            )
+            break
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(2**attempt)
+
+    if len(feeds) < THINGSPEAK_MAX_RESULTS:
+        return feeds
+    if end - start <= timedelta(minutes=sample_minutes):
+        print(
+            f"Window {window_key(window, channel['station'])} still truncated at "
+            "one bin; keeping the latest entries."
+        )
+        return feeds
+
+    half = (end - start) / 2
+    bin_s = sample_minutes * 60
+    mid = datetime.fromtimestamp(
+        (start + half).timestamp() // bin_s * bin_s, tz=timezone.utc
+    )
+    if mid <= start:
+        mid = start + timedelta(minutes=sample_minutes)
+    return fetch_window(
+        (start, mid), channel, bucket, session, sample_minutes, retries
+    ) + fetch_window((mid, end), channel, bucket, session, sample_minutes, retries)
+
+
+# ---------- checkpoint ----------
+def load_checkpoint(path: Path) -> set:
+    if not path.exists():
+        return set()
+    return set(json.loads(path.read_text()).get("done", []))
+
+
+def save_checkpoint(path: Path, done: set) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({"done": sorted(done)}, indent=1))
+    tmp.replace(path)
+
+
+# ---------- main ----------
+def _parse_date(value: str) -> datetime:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return ts.tz_convert("UTC").to_pydatetime()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Backfill Neon from ThingSpeak history."
+    )
+    parser.add_argument(
+        "--start",
+        required=True,
+        help="inclusive, e.g. 2025-10-01 (UTC unless an offset is given)",
+    )
+    parser.add_argument("--end", help="exclusive, defaults to now")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--rate", type=float, default=2.0, help="ThingSpeak requests per second"
+    )
+    parser.add_argument(
+        "--entries-per-hour",
+        type=float,
+        default=float(os.environ.get("THINGSPEAK_ENTRIES_PER_HOUR", "60")),
+        help="expected sensor cadence, used to size windows",
+    )
+    parser.add_argument(
+        "--sample-minutes",
+        type=int,
+        default=int(os.environ.get("SAMPLE_MINUTES", "10")),
+    )
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json")
+    parser.add_argument("--table", default="sensor_data")
+    parser.add_argument(
+        "--station",
+        nargs="+",
+        help="station codes to backfill (default: all configured)",
+    )
+    args = parser.parse_args()
+
+    channels = [c for c in CHANNELS if not args.station or c["station"] in args.station]
+    if not channels:
+        parser.error("no configured ThingSpeak channel matches --station")
+
+    start = _parse_date(args.start)
+    end = _parse_date(args.end) if args.end else datetime.now(timezone.utc)
+    checkpoint = Path(args.checkpoint)
+    done = load_checkpoint(checkpoint)
+
+    windows = plan_windows(start, end, args.entries_per_hour, args.sample_minutes)
+    jobs = [(w, ch) for ch in channels for w in windows]
+    todo = [(w, ch) for w, ch in jobs if window_key(w, ch["station"]) not in done]
+    n_skipped = len(jobs) - len(todo)
+    print(f"{len(jobs)} windows, {n_skipped} already done, {len(todo)} to fetch.")
+    if not todo:
+        return
+
+    bucket = TokenBucket(args.rate, burst=args.workers)
+    session = thingspeak_client.make_session(pool_maxsize=args.workers)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    # sensor_data has no DEFAULT partition: every backfilled month needs its own
+    ensure_partitions(conn, since=start)
+    t0 = time.perf_counter()
+    n_feeds = n_rows = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = {
+                pool.submit(
+                    fetch_window, w, ch, bucket, session, args.sample_minutes
+                ): (w, ch)
+                for w, ch in todo
+            }
+            for i, fut in enumerate(as_completed(futures), 1):
+                window, ch = futures[fut]
+                key = window_key(window, ch["station"])
+                feeds = fut.result()
+                df = feeds_to_resampled_df(
+                    feeds,
+                    station=ch["station"],
+                    sample_minutes=args.sample_minutes,
+                    fields=ch["fields"],
+                )
+                n_rows += upsert_df_to_postgres(
+                    conn, df, table_name=args.table, commit=False
+                )
+                with conn.cursor() as cur:
+                    update_latest_readings(cur, df)
+                    # entries already in a bin's sketch (ingested earlier) are skipped
+                    upsert_feed_sketches(
+                        cur,
+                        feeds,
+                        station=ch["station"],
+                        sample_minutes=args.sample_minutes,
+                        fields=ch["fields"],
+                    )
+                conn.commit()
+                n_feeds += len(feeds)
+                done.add(key)
+                save_checkpoint(checkpoint, done)
+                print(f"[{i}/{len(todo)}] {key}: {len(feeds)} feeds -> {len(df)} rows")
+    finally:
+        conn.close()
+        session.close()
+
+    elapsed = time.perf_counter() - t0
+    print(
+        f"Backfill finished: {n_feeds} feeds, {n_rows} rows in {elapsed:.1f}s "
+        f"({n_rows / elapsed if elapsed else 0:,.0f} rows/s)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 import logging
 import logging.handlers
-import requests
-import json
 import pytz
 from datetime import datetime
 import sys
 import os
 
+# shared ThingSpeak client lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import thingspeak_client  # noqa: E402
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -23,10 +25,7 @@ logger.addHandler(logger_file_handler)
 if __name__ == "__main__":
 
     # approximately 150 measurements a day
-    url = os.environ["THINGSPEAK_URL"] + "?results=1"
-
-    response = requests.get(url)
-    data = json.loads(response.text)
+    data = thingspeak_client.get_json(os.environ["THINGSPEAK_URL"], {"results": 1})
 
     # Timezone
     utc_tz = pytz.timezone("UTC")
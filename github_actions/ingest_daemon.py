@@ -0,0 +1,416 @@
+# ingest_daemon.py
+"""
+Continuous ThingSpeak -> Neon ingestion (replaces the 3-hourly batch for a
+near-real-time Neon).
+
+    python github_actions/ingest_daemon.py
+    INGEST_POLL_SECONDS=30 METRICS_PORT=9108 python github_actions/ingest_daemon.py
+
+Every poll fetches all configured channels concurrently, each from its own
+cursor (last entry_id and timestamp, kept per station in `ingest_state`), and
+buffers the new entries. A micro-batch is flushed when the buffer is large or
+old enough: resample, COPY-upsert into `sensor_data`, refresh the touched
+hours of `sensor_data_hourly`, merge the entries into the per-bin quantile
+sketches (`sensor_sketches`), and advance the cursors, all channels in one
+transaction. The monthly partitions of `sensor_data` (it has no DEFAULT one)
+are created at startup and again whenever a flush finds a new month.
+
+Metrics are served in Prometheus text format on http://0.0.0.0:METRICS_PORT/metrics
+(lag, rows, batches, errors, throughput) and logged after each flush.
+With this running, set LIVE_THINGSPEAK=0 for the app so sessions read Neon only.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2
+import requests
+
+import pandas as pd
+
+from migrate_neon import ensure_partitions
+from update_neon import (
+    CHANNELS,
+    DATABASE_URL,
+    THINGSPEAK_MAX_RESULTS,
+    SKETCH_SCHEMA_SQL,
+    feeds_to_resampled_df,
+    fetch_channels,
+    parse_thingspeak_ts,
+    update_latest_readings,
+    upsert_df_to_postgres,
+    upsert_feed_sketches,
+)
+import thingspeak_client  # repo root, put on sys.path by update_neon
+
+POLL_SECONDS = float(os.environ.get("INGEST_POLL_SECONDS", "60"))
+FLUSH_ROWS = int(os.environ.get("INGEST_FLUSH_ROWS", "500"))
+FLUSH_SECONDS = float(os.environ.get("INGEST_FLUSH_SECONDS", "60"))
+SAMPLE_MINUTES = int(os.environ.get("SAMPLE_MINUTES", "10"))
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+TABLE = "sensor_data"
+ROLLUP_TABLE = "sensor_data_hourly"
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("ingest")
+
+
+# ---------- schema ----------
+SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source text PRIMARY KEY,
+    last_entry_id bigint,
+    last_ds timestamptz,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    station text NOT NULL,
+    hour timestamptz NOT NULL,
+    n integer NOT NULL,
+    ec_us_cm_mean double precision,
+    temperature_mean double precision,
+    ec_gl_mean double precision,
+    ec_gl_min double precision,
+    ec_gl_max double precision,
+    PRIMARY KEY (station, hour)
+);
+"""
+
+ROLLUP_SQL = f"""
+INSERT INTO {ROLLUP_TABLE}
+    (station, hour, n, ec_us_cm_mean, temperature_mean, ec_gl_mean, ec_gl_min, ec_gl_max)
+SELECT station, date_trunc('hour', ds), count(*),
+       avg(ec_us_cm), avg(temperature), avg(ec_gl), min(ec_gl), max(ec_gl)
+FROM {TABLE}
+WHERE station = ANY(%(stations)s) AND ds >= %(since)s AND ds < %(until)s
+GROUP BY 1, 2
+ON CONFLICT (station, hour) DO UPDATE
+  SET n = EXCLUDED.n,
+      ec_us_cm_mean = EXCLUDED.ec_us_cm_mean,
+      temperature_mean = EXCLUDED.temperature_mean,
+      ec_gl_mean = EXCLUDED.ec_gl_mean,
+      ec_gl_min = EXCLUDED.ec_gl_min,
+      ec_gl_max = EXCLUDED.ec_gl_max;
+"""
+
+
+def ensure_schema(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+        cur.execute(SKETCH_SCHEMA_SQL)
+    conn.commit()
+
+
+def _source(station: str) -> str:
+    return f"thingspeak:{station}"
+
+
+def load_cursor(conn, station: str) -> tuple:
+    """
+    (last_entry_id, last_ds); falls back to the station's newest sensor_data
+    row and the newest entry its stored sketches hold (written by update_neon
+    or the backfill), so the first poll doesn't re-add entries already in.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT last_entry_id, last_ds FROM ingest_state WHERE source = %s",
+            (_source(station),),
+        )
+        row = cur.fetchone()
+        if row:
+            return row
+        cur.execute(f"SELECT max(ds) FROM {TABLE} WHERE station = %s", (station,))
+        (last_ds,) = cur.fetchone()
+        cur.execute(
+            "SELECT max(last_entry_id) FROM sensor_sketches WHERE station = %s",
+            (station,),
+        )
+        (last_entry_id,) = cur.fetchone()
+    return last_entry_id, last_ds
+
+
+def save_cursor(cur, station: str, entry_id, last_ds) -> None:
+    cur.execute(
+        """
+        INSERT INTO ingest_state (source, last_entry_id, last_ds, updated_at)
+        VALUES (%s, %s, %s, now())
+        ON CONFLICT (source) DO UPDATE
+          SET last_entry_id = EXCLUDED.last_entry_id,
+              last_ds = EXCLUDED.last_ds,
+              updated_at = now();
+        """,
+        (_source(station), entry_id, last_ds),
+    )
+
+
+# ---------- metrics ----------
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {
+            "ingest_rows_total": 0,
+            "ingest_feeds_total": 0,
+            "ingest_batches_total": 0,
+            "ingest_errors_total": 0,
+            "ingest_buffered_feeds": 0,
+            "ingest_last_batch_rows_per_second": 0.0,
+            "ingest_last_poll_seconds": 0.0,
+            "ingest_last_success_timestamp": 0.0,
+        }
+        self.last_ds = {}  # station -> newest ingested timestamp
+
+    def inc(self, name: str, by=1) -> None:
+        with self._lock:
+            self.values[name] += by
+
+    def set(self, name: str, value) -> None:
+        with self._lock:
+            self.values[name] = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = dict(self.values)
+            last_ds = dict(self.last_ds)
+        # lag = how far Neon is behind the wall clock, per station
+        now = datetime.now(timezone.utc)
+        for station, ds in sorted(last_ds.items()):
+            lag = (now - ds).total_seconds() if ds else float("nan")
+            out[f'ingest_lag_seconds{{station="{station}"}}'] = round(lag, 1)
+        return out
+
+    def render(self) -> str:
+        return "".join(f"{k} {v}\n" for k, v in sorted(self.snapshot().items()))
+
+
+def serve_metrics(metrics: Metrics, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------- ingestion ----------
+class Ingestor:
+    def __init__(self, conn, metrics: Metrics, channels=CHANNELS):
+        self.conn = conn
+        self.metrics = metrics
+        self.channels = channels
+        self.session = thingspeak_client.make_session(
+            pool_maxsize=max(1, len(channels))
+        )
+        self.buffers = {ch["station"]: [] for ch in channels}
+        self.buffer_since = None
+        self.cursors = {
+            ch["station"]: load_cursor(conn, ch["station"]) for ch in channels
+        }
+        metrics.last_ds.update({st: ds for st, (_, ds) in self.cursors.items()})
+        self.partition_month = None
+        self._ensure_partitions(
+            since=min((ds for _, ds in self.cursors.values() if ds), default=None)
+        )
+
+    def _ensure_partitions(self, since=None) -> None:
+        """
+        sensor_data has no DEFAULT partition: create the months ahead at
+        startup (from the oldest cursor on) and again once a new month starts.
+        """
+        now = datetime.now(timezone.utc)
+        month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+        if month == self.partition_month:
+            return
+        created = ensure_partitions(self.conn, since=since)
+        self.partition_month = month
+        if created:
+            logger.info("ensured partitions %s", ", ".join(created))
+
+    def buffered(self) -> int:
+        return sum(len(b) for b in self.buffers.values())
+
+    def poll(self) -> int:
+        """Fetch every channel's entries after its cursor into its buffer; returns how many were new."""
+        since = {
+            st: ds - timedelta(seconds=1)
+            for st, (_, ds) in self.cursors.items()
+            if ds is not None
+        }
+        feeds_by_station = fetch_channels(
+            self.channels, self.session, THINGSPEAK_MAX_RESULTS, since
+        )
+
+        n_new = 0
+        for station, feeds in feeds_by_station.items():
+            if len(feeds) >= THINGSPEAK_MAX_RESULTS:
+                logger.warning(
+                    "%s: poll hit the ThingSpeak cap; "
+                    "run backfill_neon.py for older entries.",
+                    station,
+                )
+            buffer = self.buffers[station]
+            seen = max(
+                (f.get("entry_id") or 0 for f in buffer),
+                default=self.cursors[station][0] or 0,
+            )
+            new = [f for f in feeds if (f.get("entry_id") or 0) > seen]
+            buffer.extend(new)
+            n_new += len(new)
+
+        if n_new and self.buffer_since is None:
+            self.buffer_since = time.monotonic()
+        self.metrics.inc("ingest_feeds_total", n_new)
+        self.metrics.set("ingest_buffered_feeds", self.buffered())
+        return n_new
+
+    def should_flush(self) -> bool:
+        if not self.buffered():
+            return False
+        return (
+            self.buffered() >= FLUSH_ROWS
+            or time.monotonic() - self.buffer_since >= FLUSH_SECONDS
+        )
+
+    def flush(self) -> int:
+        frames, cursors = [], {}
+        for ch in self.channels:
+            feeds = self.buffers[ch["station"]]
+            if not feeds:
+                continue
+            frames.append(
+                feeds_to_resampled_df(
+                    feeds,
+                    station=ch["station"],
+                    sample_minutes=SAMPLE_MINUTES,
+                    fields=ch["fields"],
+                )
+            )
+            last = max(feeds, key=lambda f: f.get("entry_id") or 0)
+            cursors[ch["station"]] = (
+                last.get("entry_id"),
+                parse_thingspeak_ts(last["created_at"]).astimezone(timezone.utc),
+            )
+        df = pd.concat(frames, ignore_index=True)
+        n_feeds = self.buffered()
+        self._ensure_partitions(since=df["ds"].min().to_pydatetime())
+
+        start = time.perf_counter()
+        try:
+            rows = upsert_df_to_postgres(self.conn, df, table_name=TABLE, commit=False)
+            with self.conn.cursor() as cur:
+                if rows:
+                    cur.execute(
+                        ROLLUP_SQL,
+                        {
+                            "stations": list(df["station"].unique()),
+                            "since": df["ds"].min().floor("h").to_pydatetime(),
+                            "until": (
+                                df["ds"].max().floor("h") + timedelta(hours=1)
+                            ).to_pydatetime(),
+                        },
+                    )
+                update_latest_readings(cur, df)
+                # add the entries to the open bins; ones a bin already holds are skipped
+                for ch in self.channels:
+                    upsert_feed_sketches(
+                        cur,
+                        self.buffers[ch["station"]],
+                        station=ch["station"],
+                        sample_minutes=SAMPLE_MINUTES,
+                        fields=ch["fields"],
+                    )
+                for station, (entry_id, last_ds) in cursors.items():
+                    save_cursor(cur, station, entry_id, last_ds)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        elapsed = time.perf_counter() - start
+
+        self.buffers = {ch["station"]: [] for ch in self.channels}
+        self.buffer_since = None
+        self.cursors.update(cursors)
+        m = self.metrics
+        m.last_ds.update({st: ds for st, (_, ds) in cursors.items()})
+        m.inc("ingest_rows_total", rows)
+        m.inc("ingest_batches_total")
+        m.set("ingest_buffered_feeds", 0)
+        m.set(
+            "ingest_last_batch_rows_per_second",
+            round(rows / elapsed, 1) if elapsed else 0.0,
+        )
+        m.set("ingest_last_success_timestamp", time.time())
+        logger.info(
+            "flushed %d feeds -> %d rows from %s in %.2fs",
+            n_feeds,
+            rows,
+            ", ".join(sorted(cursors)),
+            elapsed,
+        )
+        return rows
+
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    metrics = Metrics()
+    server = serve_metrics(metrics, METRICS_PORT)
+    logger.info(
+        "ingesting %s; metrics on :%d/metrics, polling every %.0fs",
+        ", ".join(ch["station"] for ch in CHANNELS),
+        METRICS_PORT,
+        POLL_SECONDS,
+    )
+
+    conn = psycopg2.connect(DATABASE_URL)
+    ensure_schema(conn)
+    ingestor = Ingestor(conn, metrics)
+    failures = 0
+    try:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                ingestor.poll()
+                if ingestor.should_flush():
+                    ingestor.flush()
+                failures = 0
+            except (requests.RequestException, psycopg2.Error) as exc:
+                failures += 1
+                metrics.inc("ingest_errors_total")
+                logger.error("ingest error (%d in a row): %s", failures, exc)
+                if isinstance(exc, psycopg2.OperationalError) or conn.closed:
+                    conn.close()
+                    try:
+                        conn = psycopg2.connect(DATABASE_URL)
+                        ingestor.conn = conn
+                    except psycopg2.Error:
+                        pass  # retried after the next failure
+            metrics.set("ingest_last_poll_seconds", round(time.perf_counter() - t0, 3))
+            # back off up to 10 polls while ThingSpeak/Neon keep failing
+            stop.wait(POLL_SECONDS * min(2**failures, 10) if failures else POLL_SECONDS)
+        if ingestor.buffered():
+            ingestor.flush()
+    finally:
+        conn.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+# migrate_neon.py
+"""
+Schema migrations and maintenance for the Neon `sensor_data` table.
+
+    python github_actions/migrate_neon.py migrate            # apply pending migrations
+    python github_actions/migrate_neon.py migrate --keep-unpartitioned
+    python github_actions/migrate_neon.py status
+    python github_actions/migrate_neon.py partitions --ahead 3
+    python github_actions/migrate_neon.py retention --keep-months 24 --archive-dir archive/
+    python github_actions/migrate_neon.py explain             # exit 1 if indexes/pruning unused
+
+Migrations are numbered and recorded in `schema_migrations`; each runs in its
+own transaction. After 0004 `sensor_data` is partitioned by month on `ds`
+(primary key (station, ds), BRIN on ds), so the app's station + ds-range
+query only touches the recent partitions, and old months can be archived
+and dropped without touching the rest of the table. There is no DEFAULT
+partition: run `partitions` (or `partitions --since <date>` before loading
+older months) so every month written to has its own partition.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import psycopg2
+
+import dotenv
+
+dotenv.load_dotenv()
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+TABLE = "sensor_data"
+# keep the pre-0004 table as sensor_data_unpartitioned instead of dropping it
+# once its rows are verified in the partitioned table
+KEEP_UNPARTITIONED = os.environ.get("KEEP_UNPARTITIONED", "0") == "1"
+
+
+# ---------- partitions ----------
+def _month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def _add_months(dt: datetime, n: int) -> datetime:
+    y, m = divmod(dt.month - 1 + n, 12)
+    return datetime(dt.year + y, m + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def create_month_partition(cur, month: datetime, parent: str = TABLE) -> str:
+    name = partition_name(month)
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} "
+        "FOR VALUES FROM (%s) TO (%s)",
+        (month, _add_months(month, 1)),
+    )
+    return name
+
+
+def _month_range(first: datetime, last: datetime) -> list:
+    """Month starts from `first`'s month through `last`'s month, inclusive."""
+    month, months = _month_start(first), []
+    while month <= last:
+        months.append(month)
+        month = _add_months(month, 1)
+    return months
+
+
+def ensure_partitions(
+    conn, months_ahead: int = 3, since: datetime | None = None
+) -> list:
+    """
+    Create this month's and the next `months_ahead` monthly partitions, plus
+    every month from `since` onwards (for backfills of older data).
+    sensor_data has no DEFAULT partition (see m0004): writers call this before
+    inserting.
+    """
+    this_month = _month_start(datetime.now(timezone.utc))
+    first = min(since, this_month) if since is not None else this_month
+    with conn.cursor() as cur:
+        if not _is_partitioned(cur):
+            return []
+        created = [
+            create_month_partition(cur, month)
+            for month in _month_range(first, _add_months(this_month, months_ahead))
+        ]
+    conn.commit()
+    return created
+
+
+def _missing_rows(cur, source: str, target: str = TABLE) -> int:
+    """Rows of `source` with no (station, ds) match in `target`."""
+    cur.execute(
+        f"""
+        SELECT count(*) FROM {source} s
+        WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.station = s.station AND t.ds = s.ds)
+        """
+    )
+    return cur.fetchone()[0]
+
+
+def _is_partitioned(cur, table: str = TABLE) -> bool:
+    cur.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,)
+    )
+    return cur.fetchone() is not None
+
+
+def list_partitions(cur, table: str = TABLE) -> list:
+    """[(name, lower_bound, upper_bound)] of the monthly partitions, oldest first."""
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+        """,
+        (table,),
+    )
+    out = []
+    for (name,) in cur.fetchall():
+        month = datetime(int(name[-7:-3]), int(name[-2:]), 1, tzinfo=timezone.utc)
+        out.append((name, month, _add_months(month, 1)))
+    return out
+
+
+# ---------- migrations ----------
+def m0001_baseline(cur):
+    """sensor_data as the ingestion scripts expect it (no-op on the existing table)."""
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            ds timestamptz NOT NULL,
+            station text NOT NULL,
+            ec_us_cm double precision,
+            temperature double precision,
+            ec_gl double precision,
+            UNIQUE (ds, station)
+        )
+        """
+    )
+
+
+def m0002_station_ds_index(cur):
+    """Composite index for `station = ? AND ds >= ? ORDER BY ds`."""
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_station_ds "
+        f"ON {TABLE} (station, ds DESC)"
+    )
+
+
+def m0003_brin_ds(cur):
+    """Tiny BRIN index for ds-range scans over append-mostly data."""
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_ds_brin ON {TABLE} USING brin (ds)"
+    )
+
+
+def m0004_monthly_partitions(cur):
+    """
+    Rebuild sensor_data as a table partitioned by month on ds.
+
+    Rows are copied under an exclusive lock (readers keep working) into one
+    partition per month from the oldest row to three months ahead. The old
+    table is dropped once every row is found in the new one, or kept as
+    sensor_data_unpartitioned with KEEP_UNPARTITIONED=1.
+
+    There is deliberately no DEFAULT partition (it would have to be emptied
+    before any month it holds rows of could get its own partition), so an
+    insert into a month without a partition fails. Every writer must call
+    ensure_partitions() before writing: update_neon.yml runs `partitions`
+    each time, and backfill_neon.py and ingest_daemon.py call it themselves.
+    """
+    if _is_partitioned(cur):
+        return
+    cur.execute(f"LOCK TABLE {TABLE} IN EXCLUSIVE MODE")
+    cur.execute(
+        f"""
+        CREATE TABLE {TABLE}_new (
+            ds timestamptz NOT NULL,
+            station text NOT NULL,
+            ec_us_cm double precision,
+            temperature double precision,
+            ec_gl double precision,
+            PRIMARY KEY (station, ds)
+        ) PARTITION BY RANGE (ds)
+        """
+    )
+    cur.execute(f"SELECT min(ds), max(ds) FROM {TABLE}")
+    lo, hi = (
+        ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+        for ts in cur.fetchone()
+    )
+    now = datetime.now(timezone.utc)
+    for month in _month_range(
+        lo or now, _add_months(_month_start(max(hi or now, now)), 3)
+    ):
+        create_month_partition(cur, month, parent=f"{TABLE}_new")
+
+    cur.execute(
+        f"""
+        INSERT INTO {TABLE}_new (ds, station, ec_us_cm, temperature, ec_gl)
+        SELECT ds, station, ec_us_cm, temperature, ec_gl FROM {TABLE}
+        ON CONFLICT DO NOTHING
+        """
+    )
+    missing = _missing_rows(cur, TABLE, target=f"{TABLE}_new")
+    if missing:
+        raise RuntimeError(f"{missing} rows of {TABLE} were not copied; aborting")
+    if KEEP_UNPARTITIONED:
+        cur.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned")
+        # index names are schema-wide; free them for the partitioned table
+        cur.execute(
+            f"ALTER INDEX IF EXISTS ix_{TABLE}_station_ds "
+            f"RENAME TO ix_{TABLE}_unpartitioned_station_ds"
+        )
+        cur.execute(
+            f"ALTER INDEX IF EXISTS ix_{TABLE}_ds_brin "
+            f"RENAME TO ix_{TABLE}_unpartitioned_ds_brin"
+        )
+    else:
+        cur.execute(f"DROP TABLE {TABLE}")
+    cur.execute(f"ALTER TABLE {TABLE}_new RENAME TO {TABLE}")
+    # the primary key already serves (station, ds); BRIN helps ds-only scans
+    cur.execute(f"CREATE INDEX ix_{TABLE}_ds_brin ON {TABLE} USING brin (ds)")
+
+
+def m0005_latest_readings(cur):
+    """One row per station for the app's map/table, seeded from sensor_data."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS latest_readings (
+            station text PRIMARY KEY,
+            ds timestamptz NOT NULL,
+            ec_us_cm double precision,
+            temperature double precision,
+            ec_gl double precision,
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        INSERT INTO latest_readings (station, ds, ec_us_cm, temperature, ec_gl)
+        SELECT DISTINCT ON (station) station, ds, ec_us_cm, temperature, ec_gl
+        FROM {TABLE}
+        ORDER BY station, ds DESC
+        ON CONFLICT (station) DO NOTHING
+        """
+    )
+
+
+def m0006_sensor_sketches(cur):
+    """
+    Per station and 10-minute bin, a KLL quantile sketch of every raw reading
+    of each metric (quantile_sketch.KLLSketch bytes). Filled at ingest; run
+    backfill_neon.py to build them for earlier months.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sensor_sketches (
+            station text NOT NULL,
+            ds timestamptz NOT NULL,
+            n integer NOT NULL,
+            ec_us_cm bytea,
+            temperature bytea,
+            ec_gl bytea,
+            PRIMARY KEY (station, ds)
+        )
+        """
+    )
+
+
+def m0007_sketch_entry_ids(cur):
+    """
+    The ThingSpeak entry_id range each bin's sketch holds, so re-read entries
+    are not merged twice (update_neon.upsert_feed_sketches).
+    """
+    cur.execute(
+        """
+        ALTER TABLE sensor_sketches
+            ADD COLUMN IF NOT EXISTS first_entry_id bigint,
+            ADD COLUMN IF NOT EXISTS last_entry_id bigint
+        """
+    )
+
+
+MIGRATIONS = [
+    (1, "baseline", m0001_baseline),
+    (2, "station_ds_index", m0002_station_ds_index),
+    (3, "brin_ds", m0003_brin_ds),
+    (4, "monthly_partitions", m0004_monthly_partitions),
+    (5, "latest_readings", m0005_latest_readings),
+    (6, "sensor_sketches", m0006_sensor_sketches),
+    (7, "sketch_entry_ids", m0007_sketch_entry_ids),
+]
+
+
+def _ensure_migrations_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version integer PRIMARY KEY,
+                name text NOT NULL,
+                applied_at timestamptz NOT NULL DEFAULT now()
+            )
+            """
+        )
+    conn.commit()
+
+
+def applied_versions(conn) -> set:
+    _ensure_migrations_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_migrations")
+        return {v for (v,) in cur.fetchall()}
+
+
+def migrate(conn, target: int | None = None) -> list:
+    """Apply pending migrations in order (up to `target`); returns the versions applied."""
+    done = applied_versions(conn)
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        print(f"Applying {version:04d}_{name} ...")
+        try:
+            with conn.cursor() as cur:
+                fn(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# ---------- retention ----------
+def apply_retention(
+    conn, keep_months: int, archive_dir: Path | None, dry_run: bool = False
+) -> list:
+    """
+    Detach and drop monthly partitions older than `keep_months`, after writing
+    each one to <archive_dir>/<partition>.csv.gz. Hourly rollups and quantile
+    sketches are kept.
+    """
+    cutoff = _add_months(_month_start(datetime.now(timezone.utc)), -keep_months)
+    with conn.cursor() as cur:
+        if not _is_partitioned(cur):
+            raise SystemExit("sensor_data is not partitioned yet; run `migrate` first.")
+        old = [p for p in list_partitions(cur) if p[2] <= cutoff]
+    if dry_run:
+        return [name for name, _, _ in old]
+
+    dropped = []
+    for name, _, _ in old:
+        with conn.cursor() as cur:
+            if archive_dir is not None:
+                archive_dir.mkdir(parents=True, exist_ok=True)
+                path = archive_dir / f"{name}.csv.gz"
+                with gzip.open(path, "wb") as fh:
+                    cur.copy_expert(
+                        f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", fh
+                    )
+                print(f"Archived {name} -> {path}")
+            cur.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+        dropped.append(name)
+    return dropped
+
+
+# ---------- EXPLAIN check ----------
+# mirrors data._NEON_WHERE (the app's load_data_neon query)
+NEON_QUERY = f"""
+SELECT ds, station, ec_us_cm, temperature, ec_gl
+FROM {TABLE}
+WHERE
+    (station = %(main_station)s AND ds >= %(main_since)s)
+    OR
+    (station <> %(main_station)s AND ds >= %(other_since)s)
+ORDER BY ds DESC
+"""
+
+# the read side of ingest_daemon.ROLLUP_SQL
+ROLLUP_QUERY = f"""
+SELECT station, date_trunc('hour', ds), count(*),
+       avg(ec_us_cm), avg(temperature), avg(ec_gl), min(ec_gl), max(ec_gl)
+FROM {TABLE}
+WHERE station = ANY(%(stations)s) AND ds >= %(since)s AND ds < %(until)s
+GROUP BY 1, 2
+"""
+
+
+def _walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+def explain(cur, sql: str, params: dict) -> dict:
+    """EXPLAIN (ANALYZE, FORMAT JSON) summary: scan nodes, indexes, partitions touched."""
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    raw = cur.fetchone()[0]
+    root = (raw if isinstance(raw, list) else json.loads(raw))[0]
+    nodes = list(_walk(root["Plan"]))
+    scans = [n for n in nodes if "Scan" in n["Node Type"]]
+    return {
+        "execution_ms": root.get("Execution Time"),
+        "index_scans": sorted(
+            {n.get("Index Name") for n in scans if n.get("Index Name")}
+        ),
+        "seq_scans": sorted(
+            {n.get("Relation Name") for n in scans if n["Node Type"] == "Seq Scan"}
+        ),
+        "relations": sorted(
+            {n.get("Relation Name") for n in scans if n.get("Relation Name")}
+        ),
+    }
+
+
+def explain_check(conn) -> dict:
+    """Run both app queries and report whether they use the indexes and prune partitions."""
+    now = datetime.now(timezone.utc)
+    checks = {
+        "load_data_neon": (
+            NEON_QUERY,
+            {
+                "main_station": "VinhLong",
+                "main_since": now - timedelta(days=14),
+                "other_since": now - timedelta(hours=12),
+            },
+        ),
+        "rollup": (
+            ROLLUP_QUERY,
+            {"stations": ["VinhLong"], "since": now - timedelta(hours=2), "until": now},
+        ),
+    }
+    report = {}
+    with conn.cursor() as cur:
+        partitioned = _is_partitioned(cur)
+        n_parts = len(list_partitions(cur)) if partitioned else 0
+        for name, (sql, params) in checks.items():
+            r = explain(cur, sql, params)
+            parts = [p for p in r["relations"] if p.startswith(f"{TABLE}_y")]
+            r["partitions_scanned"] = f"{len(parts)}/{n_parts}" if partitioned else None
+            # seq scans are fine on tiny partitions; flag them only on the big table
+            r["ok"] = bool(r["index_scans"]) and (
+                not partitioned or len(parts) < max(n_parts, 2)
+            )
+            report[name] = r
+    conn.rollback()
+    return report
+
+
+# ---------- main ----------
+def _parse_month(value: str) -> datetime:
+    return _month_start(
+        datetime.fromisoformat(value if value.count("-") > 1 else f"{value}-01")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Neon schema migrations and maintenance."
+    )
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate")
+    m.add_argument("--target", type=int, help="stop after this version")
+    m.add_argument(
+        "--keep-unpartitioned",
+        action="store_true",
+        help="keep the pre-partitioning table as sensor_data_unpartitioned",
+    )
+    sub.add_parser("status")
+    p = sub.add_parser("partitions")
+    p.add_argument("--ahead", type=int, default=3, help="future months to create")
+    p.add_argument(
+        "--since",
+        type=_parse_month,
+        help="also create every month from this date, e.g. 2025-01",
+    )
+    r = sub.add_parser("retention")
+    r.add_argument("--keep-months", type=int, required=True)
+    r.add_argument(
+        "--archive-dir", type=Path, help="write dropped months here as csv.gz"
+    )
+    r.add_argument("--dry-run", action="store_true")
+    sub.add_parser("explain")
+    args = parser.parse_args()
+
+    global KEEP_UNPARTITIONED
+    KEEP_UNPARTITIONED = KEEP_UNPARTITIONED or getattr(
+        args, "keep_unpartitioned", False
+    )
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.cmd == "migrate":
+            applied = migrate(conn, args.target)
+            print(
+                f"Applied {applied or 'nothing'}; partitions: {ensure_partitions(conn)}"
+            )
+        elif args.cmd == "status":
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                print(f"[{'x' if version in done else ' '}] {version:04d}_{name}")
+        elif args.cmd == "partitions":
+            print(f"Ensured: {ensure_partitions(conn, args.ahead, since=args.since)}")
+        elif args.cmd == "retention":
+            dropped = apply_retention(
+                conn, args.keep_months, args.archive_dir, args.dry_run
+            )
+            print(
+                f"{'Would drop' if args.dry_run else 'Dropped'}: {dropped or 'nothing'}"
+            )
+        elif args.cmd == "explain":
+            report = explain_check(conn)
+            print(json.dumps(report, indent=2, default=str))
+            if not all(r["ok"] for r in report.values()):
+                sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
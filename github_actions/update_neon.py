@@ -1,6 +1,9 @@
 # update_db.py
+import io
 import os
-import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict
 import requests
@@ -10,12 +13,21 @@ from psycopg2.extras import execute_values
 
 import dotenv
 
+# station_data lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import thingspeak_client  # noqa: E402
+from quantile_sketch import KLLSketch, bin_sketches  # noqa: E402
+from station_data import DEFAULT_FIELDS, configured_channels  # noqa: E402
+
 dotenv.load_dotenv()  # Load environment variables from .env file if present
 
 # CONFIG (read from env)
 DATABASE_URL = os.environ["DATABASE_URL"] or os.getenv("DATABASE_URL")
 THINGSPEAK_URL = os.environ["THINGSPEAK_URL"] or os.getenv("THINGSPEAK_URL")
-STATION_NAME = "VinhLong"
+
+# every channel whose feed URL env var is set (THINGSPEAK_URL,
+# THINGSPEAK_URL_CANGIO, ...)
+CHANNELS = configured_channels(os.getenv)
 
 # ---------- helper timezone funcs ----------
 GMT7 = timezone(timedelta(hours=7))
@@ -24,33 +36,87 @@ GMT7 = timezone(timedelta(hours=7))
 def parse_thingspeak_ts(ts_utc_str: str) -> datetime:
     """ThingSpeak timestamps are like '2025-11-03T12:34:56Z' (UTC). Return tz-aware GMT+7 datetime."""
     # parse as UTC, then convert
-    dt_utc = datetime.strptime(ts_utc_str, "%Y-%m-%dT%H:%M:%SZ").replace(
-        tzinfo=timezone.utc
-    )
+    try:
+        dt_utc = datetime.strptime(ts_utc_str, "%Y-%m-%dT%H:%M:%SZ").replace(
+            tzinfo=timezone.utc
+        )
+    except ValueError:
+        # requests with a `timezone` param come back with an explicit offset
+        dt_utc = datetime.fromisoformat(ts_utc_str)
     return dt_utc.astimezone(GMT7)
 
 
 # ---------- fetch ----------
-def fetch_thingspeak_data(results: int = 400) -> List[Dict]:
+THINGSPEAK_MAX_RESULTS = 8000  # ThingSpeak caps one feed request at 8000 entries
+
+
+def fetch_thingspeak_data(
+    results: int = 400,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    session: requests.Session | None = None,
+    url: str | None = None,
+) -> List[Dict]:
     """
     Pull the latest <results> rows from ThingSpeak.
-    Use THINGSPEAK_URL environment variable (full JSON feed URL).
+    Uses the THINGSPEAK_URL environment variable (full JSON feed URL) unless
+    another channel's `url` is given.
+    With start/end (tz-aware), only entries in that window are returned
+    (still at most <results>, the most recent ones).
     """
-    url = f"{THINGSPEAK_URL}?results={results}"
-    r = requests.get(url, timeout=20)
-    r.raise_for_status()
-    payload = r.json()
+    params = {"results": results}
+    if start is not None or end is not None:
+        params["timezone"] = "Etc/UTC"
+    if start is not None:
+        params["start"] = start.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    if end is not None:
+        params["end"] = end.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    # closed windows never change, so only open-ended requests are revalidated
+    fetch = (
+        thingspeak_client.get_json if end is not None else thingspeak_client.fetch_feeds
+    )
+    payload = fetch(url or THINGSPEAK_URL, params, session=session, timeout=(3.05, 20))
     return payload.get("feeds", [])
 
 
+def fetch_channels(
+    channels: List[Dict],
+    session: requests.Session,
+    results: int = THINGSPEAK_MAX_RESULTS,
+    since: Dict | None = None,
+) -> Dict[str, List[Dict]]:
+    """
+    Fetch all channels concurrently over one keep-alive session.
+    `since` maps station -> cursor timestamp; channels without one get the latest <results>.
+    Returns {station: feeds}.
+    """
+    since = since or {}
+
+    def one(ch):
+        return ch["station"], fetch_thingspeak_data(
+            results=results,
+            start=since.get(ch["station"]),
+            session=session,
+            url=ch["url"],
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, len(channels))) as pool:
+        return dict(pool.map(one, channels))
+
+
 # ---------- process & resample ----------
-def feeds_to_resampled_df(
-    feeds: List[Dict], station: str = "VinhLong", sample_minutes: int = 10
+def feeds_to_df(
+    feeds: List[Dict],
+    station: str = "VinhLong",
+    fields: Dict[str, str] | None = None,
 ) -> pd.DataFrame:
     """
-    Convert ThingSpeak feeds into a DataFrame and resample to `sample_minutes` by taking the last reading in each bin.
-    Returns a DataFrame with columns ['ds','station','ec_us_cm','temperature','ec_gl'] and tz-aware ds.
+    Convert ThingSpeak feeds into a DataFrame, one row per feed entry.
+    `fields` maps ec_us_cm/temperature/ec_mgl to the channel's ThingSpeak fields.
+    Returns a DataFrame with columns ['ds','station','ec_us_cm','temperature','ec_gl','entry_id']
+    and tz-aware GMT+7 ds.
     """
+    fields = fields or DEFAULT_FIELDS
     rows = []
     for f in feeds:
         created = f.get("created_at")
@@ -68,9 +134,10 @@ def feeds_to_resampled_df(
             except Exception:
                 return None
 
-        ec_us_cm = to_float(f.get("field1"))  # example mapping
-        temperature = to_float(f.get("field2"))
-        ec_mgl = to_float(f.get("field3"))
+        ec_us_cm = to_float(f.get(fields["ec_us_cm"]))
+        temperature = to_float(f.get(fields["temperature"]))
+        ec_mgl = to_float(f.get(fields["ec_mgl"]))
+        ec_gl = None
         if ec_mgl is not None:
             ec_gl = ec_mgl / 1000.0  # convert mg/L to g/L as you did earlier
 
@@ -81,15 +148,32 @@ def feeds_to_resampled_df(
                 "ec_us_cm": ec_us_cm,
                 "temperature": temperature,
                 "ec_gl": ec_gl,
+                "entry_id": f.get("entry_id"),
             }
         )
 
     if not rows:
         return pd.DataFrame(
-            columns=["ds", "station", "ec_us_cm", "temperature", "ec_gl"]
+            columns=["ds", "station", "ec_us_cm", "temperature", "ec_gl", "entry_id"]
         )
+    return pd.DataFrame(rows)
+
+
+def feeds_to_resampled_df(
+    feeds: List[Dict],
+    station: str = "VinhLong",
+    sample_minutes: int = 10,
+    fields: Dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    Convert ThingSpeak feeds into a DataFrame and resample to `sample_minutes` by taking the last reading in each bin.
+    `fields` maps ec_us_cm/temperature/ec_mgl to the channel's ThingSpeak fields.
+    Returns a DataFrame with columns ['ds','station','ec_us_cm','temperature','ec_gl'] and tz-aware ds.
+    """
+    df = feeds_to_df(feeds, station=station, fields=fields)
+    if df.empty:
+        return df
 
-    df = pd.DataFrame(rows)
     # set index for resampling (pandas works best when index is tz-aware datetime)
     df = df.set_index("ds").sort_index()
 
@@ -114,28 +198,61 @@ def feeds_to_resampled_df(
 
 
 # ---------- upsert into Postgres ----------
-def upsert_df_to_postgres(conn, df: pd.DataFrame, table_name: str = "water_readings"):
-    """
-    Bulk upsert using psycopg2.execute_values and ON CONFLICT.
-    Updates numeric fields to latest values in case of conflict.
-    """
-    if df.empty:
-        print("No rows to upsert.")
-        return
+UPSERT_COLS = ("ds", "station", "ec_us_cm", "temperature", "ec_gl")
+
+
+def _prepare_upsert_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep the upsert columns and the last row per (ds, station); ON CONFLICT can't touch a row twice."""
+    out = df.loc[:, list(UPSERT_COLS)]
+    return out.drop_duplicates(subset=["ds", "station"], keep="last")
+
+
+def _upsert_copy(cur, df: pd.DataFrame, table_name: str) -> None:
+    """Stream the frame as CSV into a temp staging table, then merge with one INSERT."""
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep="")
+    buf.seek(0)
+
+    cur.execute(
+        """
+        CREATE TEMP TABLE _sensor_stage (
+            ds timestamptz,
+            station text,
+            ec_us_cm double precision,
+            temperature double precision,
+            ec_gl double precision
+        ) ON COMMIT DROP;
+        """
+    )
+    cur.copy_expert(
+        f"COPY _sensor_stage ({', '.join(UPSERT_COLS)}) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+    cur.execute(
+        f"""
+        INSERT INTO {table_name} (ds, station, ec_us_cm, temperature, ec_gl)
+        SELECT ds, station, ec_us_cm, temperature, ec_gl FROM _sensor_stage
+        ON CONFLICT (ds, station) DO UPDATE
+          SET ec_us_cm = EXCLUDED.ec_us_cm,
+              temperature = EXCLUDED.temperature,
+              ec_gl = EXCLUDED.ec_gl;
+        """
+    )
 
+
+def _upsert_values(cur, df: pd.DataFrame, table_name: str) -> None:
     tuples = [
         (
-            row.ds.to_pydatetime(),  # psycopg2 accepts datetime with tzinfo
-            row.station,
-            None if pd.isna(row.ec_us_cm) else float(row.ec_us_cm),
-            None if pd.isna(row.temperature) else float(row.temperature),
-            None if pd.isna(row.ec_gl) else float(row.ec_gl),
+            ds.to_pydatetime(),  # psycopg2 accepts datetime with tzinfo
+            station,
+            None if pd.isna(ec_us_cm) else float(ec_us_cm),
+            None if pd.isna(temperature) else float(temperature),
+            None if pd.isna(ec_gl) else float(ec_gl),
+        )
+        for ds, station, ec_us_cm, temperature, ec_gl in df.itertuples(
+            index=False, name=None
         )
-        for _, row in df.iterrows()
     ]
-
-    cols = ("ds", "station", "ec_us_cm", "temperature", "ec_gl")
-    # build SQL
     insert_sql = f"""
     INSERT INTO {table_name} (ds, station, ec_us_cm, temperature, ec_gl)
     VALUES %s
@@ -144,33 +261,376 @@ def upsert_df_to_postgres(conn, df: pd.DataFrame, table_name: str = "water_readi
           temperature = EXCLUDED.temperature,
           ec_gl = EXCLUDED.ec_gl;
     """
+    execute_values(cur, insert_sql, tuples, template=None, page_size=1000)
+
+
+def upsert_df_to_postgres(
+    conn,
+    df: pd.DataFrame,
+    table_name: str = "water_readings",
+    method: str = "copy",
+    commit: bool = True,
+) -> int:
+    """
+    Bulk upsert with ON CONFLICT; numeric fields are updated to the latest values.
+
+    method="copy" (default) streams the rows with COPY FROM STDIN into a staging
+    table and merges them in one statement, which is what backfills need.
+    method="values" uses execute_values (kept as a fallback).
+    With commit=False the caller owns the transaction.
+    Returns the number of rows sent.
+    """
+    if df.empty:
+        print("No rows to upsert.")
+        return 0
+
+    df = _prepare_upsert_frame(df)
+    start = time.perf_counter()
     with conn.cursor() as cur:
-        execute_values(cur, insert_sql, tuples, template=None, page_size=100)
-    conn.commit()
-    print(f"Upserted {len(tuples)} rows (resampled).")
+        if method == "copy":
+            _upsert_copy(cur, df, table_name)
+        elif method == "values":
+            _upsert_values(cur, df, table_name)
+        else:
+            raise ValueError(f"Unknown upsert method: {method}")
+    if commit:
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    rate = len(df) / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"Upserted {len(df)} rows via {method} in {elapsed:.2f}s ({rate:,.0f} rows/s)."
+    )
+    return len(df)
+
+
+# ---------- quantile sketches per bin ----------
+SKETCH_COLUMNS = ("ec_us_cm", "temperature", "ec_gl")
+
+# first/last_entry_id: the ThingSpeak entries a bin's sketch already holds
+SKETCH_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS sensor_sketches (
+    station text NOT NULL,
+    ds timestamptz NOT NULL,
+    n integer NOT NULL,
+    ec_us_cm bytea,
+    temperature bytea,
+    ec_gl bytea,
+    first_entry_id bigint,
+    last_entry_id bigint,
+    PRIMARY KEY (station, ds)
+);
+ALTER TABLE sensor_sketches
+    ADD COLUMN IF NOT EXISTS first_entry_id bigint,
+    ADD COLUMN IF NOT EXISTS last_entry_id bigint;
+"""
+
+
+def _readings_to_sketch_df(readings: pd.DataFrame, sample_minutes: int) -> pd.DataFrame:
+    sketches = bin_sketches(readings, SKETCH_COLUMNS, minutes=sample_minutes)
+    if sketches.empty:
+        return sketches.assign(first_entry_id=None, last_entry_id=None)
+    ids = (
+        readings.assign(
+            ds=pd.to_datetime(readings["ds"]).dt.floor(f"{sample_minutes}min"),
+            entry_id=pd.to_numeric(readings["entry_id"], errors="coerce"),
+        )
+        .groupby(["ds", "station"], observed=True)["entry_id"]
+        .agg(first_entry_id="min", last_entry_id="max")
+    )
+    return sketches.join(ids, on=["ds", "station"])
 
 
-# ---------- main ----------
-def main():
-    results = int(os.environ.get("THINGSPEAK_PULL", "200"))  # 200 as default (adjust)
-    sample_minutes = int(os.environ.get("SAMPLE_MINUTES", "10"))
+def feeds_to_sketch_df(
+    feeds: List[Dict],
+    station: str = "VinhLong",
+    sample_minutes: int = 10,
+    fields: Dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    KLL sketch of every raw reading per `sample_minutes` bin (the bins of
+    feeds_to_resampled_df): columns ds, station, n, ec_us_cm, temperature, ec_gl (bytes),
+    first_entry_id, last_entry_id.
+    """
+    return _readings_to_sketch_df(
+        feeds_to_df(feeds, station=station, fields=fields), sample_minutes
+    )
 
-    print("Fetching ThingSpeak ...")
-    feeds = fetch_thingspeak_data(results=results)
-    print(f"Fetched {len(feeds)} feeds.")
 
-    df_resampled = feeds_to_resampled_df(
-        feeds, station=STATION_NAME, sample_minutes=sample_minutes
+def _stored_sketches(
+    cur, stations, first: pd.Timestamp, last: pd.Timestamp, blobs: bool = True
+) -> dict:
+    """{(station, ds utc): (n, first_entry_id, last_entry_id, blobs)} of the stored bins in [first, last]."""
+    cols = ["n", "first_entry_id", "last_entry_id", *(SKETCH_COLUMNS if blobs else ())]
+    cur.execute(
+        f"""
+        SELECT station, ds, {', '.join(cols)} FROM sensor_sketches
+        WHERE station = ANY(%s) AND ds >= %s AND ds <= %s
+        """,
+        (list(stations), first.to_pydatetime(), last.to_pydatetime()),
     )
-    print(
-        f"Resampled to {len(df_resampled)} rows at {sample_minutes}-minute frequency."
+    return {
+        (station, pd.Timestamp(ds).tz_convert("UTC")): (n, first, last, tuple(rest))
+        for station, ds, n, first, last, *rest in cur.fetchall()
+    }
+
+
+def _merge_stored_sketches(cur, sketches: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the already stored sketches of the same (station, ds) bins to the
+    batch. Bins stored without entry ids (written before they were tracked)
+    are replaced instead.
+    """
+    stored = _stored_sketches(
+        cur, sketches["station"].unique(), sketches["ds"].min(), sketches["ds"].max()
+    )
+    if not stored:
+        return sketches
+
+    out = sketches.copy()
+    for i, (station, ds) in enumerate(zip(out["station"], out["ds"])):
+        old = stored.get((station, pd.Timestamp(ds).tz_convert("UTC")))
+        if old is None or old[1] is None:
+            continue
+        n, first, last, blobs = old
+        out.iat[i, out.columns.get_loc("n")] += n
+        out.iat[i, out.columns.get_loc("first_entry_id")] = min(
+            first, out.iat[i, out.columns.get_loc("first_entry_id")]
+        )
+        out.iat[i, out.columns.get_loc("last_entry_id")] = max(
+            last, out.iat[i, out.columns.get_loc("last_entry_id")]
+        )
+        for col, blob in zip(SKETCH_COLUMNS, blobs):
+            if blob is None:
+                continue
+            new = out.iat[i, out.columns.get_loc(col)]
+            merged = KLLSketch.from_bytes(blob)
+            if new is not None:
+                merged.merge(KLLSketch.from_bytes(new))
+            out.iat[i, out.columns.get_loc(col)] = merged.to_bytes()
+    return out
+
+
+def upsert_sketches(cur, sketches: pd.DataFrame) -> int:
+    """Write per-bin sketches into `sensor_sketches`, replacing the stored ones of the same bins."""
+    if sketches.empty:
+        return 0
+    cur.execute(SKETCH_SCHEMA_SQL)
+    sketches = sketches.drop_duplicates(subset=["ds", "station"], keep="last")
+    rows = [
+        (
+            station,
+            ds.to_pydatetime(),
+            int(n),
+            *(None if blob is None else psycopg2.Binary(blob) for blob in blobs),
+            None if pd.isna(first) else int(first),
+            None if pd.isna(last) else int(last),
+        )
+        for ds, station, n, *blobs, first, last in sketches[
+            ["ds", "station", "n", *SKETCH_COLUMNS, "first_entry_id", "last_entry_id"]
+        ].itertuples(index=False, name=None)
+    ]
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO sensor_sketches (station, ds, n, {', '.join(SKETCH_COLUMNS)}, first_entry_id, last_entry_id)
+        VALUES %s
+        ON CONFLICT (station, ds) DO UPDATE
+          SET n = EXCLUDED.n,
+              ec_us_cm = EXCLUDED.ec_us_cm,
+              temperature = EXCLUDED.temperature,
+              ec_gl = EXCLUDED.ec_gl,
+              first_entry_id = EXCLUDED.first_entry_id,
+              last_entry_id = EXCLUDED.last_entry_id;
+        """,
+        rows,
+        page_size=1000,
+    )
+    return len(rows)
+
+
+def upsert_feed_sketches(
+    cur,
+    feeds: List[Dict],
+    station: str = "VinhLong",
+    sample_minutes: int = 10,
+    fields: Dict[str, str] | None = None,
+) -> int:
+    """
+    Add ThingSpeak entries to the per-bin sketches in `sensor_sketches`.
+
+    Every stored bin records the entry_id range its sketch holds; entries of
+    the batch inside that range are skipped and the rest merged in, so
+    overlapping fetches, retries and a capped fetch that starts mid-bin never
+    count an entry twice (the entries of a fetch are consecutive, so a bin's
+    entries stay one range). Returns the number of bins written.
+    """
+    readings = feeds_to_df(feeds, station=station, fields=fields)
+    if readings.empty:
+        return 0
+    cur.execute(SKETCH_SCHEMA_SQL)
+    readings = readings.assign(
+        entry_id=pd.to_numeric(readings["entry_id"], errors="coerce")
+    )
+    readings = readings[
+        readings["entry_id"].isna() | ~readings.duplicated("entry_id", keep="last")
+    ]
+
+    bins = (
+        pd.to_datetime(readings["ds"])
+        .dt.floor(f"{sample_minutes}min")
+        .dt.tz_convert("UTC")
     )
+    stored = _stored_sketches(cur, [station], bins.min(), bins.max(), blobs=False)
+    if stored:
+        ids = [stored.get((station, b), (None, None, None))[1:3] for b in bins]
+        first = pd.to_numeric(
+            pd.Series([f for f, _ in ids], index=readings.index), errors="coerce"
+        )
+        last = pd.to_numeric(
+            pd.Series([la for _, la in ids], index=readings.index), errors="coerce"
+        )
+        held = (readings["entry_id"] >= first) & (readings["entry_id"] <= last)
+        readings = readings[~held]
+        if readings.empty:
+            return 0
+    return upsert_sketches(
+        cur,
+        _merge_stored_sketches(cur, _readings_to_sketch_df(readings, sample_minutes)),
+    )
+
+
+# ---------- latest reading per station ----------
+LATEST_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS latest_readings (
+    station text PRIMARY KEY,
+    ds timestamptz NOT NULL,
+    ec_us_cm double precision,
+    temperature double precision,
+    ec_gl double precision,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+
+def update_latest_readings(cur, df: pd.DataFrame) -> int:
+    """
+    Keep `latest_readings` (one row per station, read by the app's map and
+    station table) in step with an upserted batch. Only moves forward in time.
+    """
+    if df.empty:
+        return 0
+    latest = df.sort_values("ds").groupby("station", sort=False).tail(1)
+    rows = [
+        (
+            station,
+            ds.to_pydatetime(),
+            None if pd.isna(ec_us_cm) else float(ec_us_cm),
+            None if pd.isna(temperature) else float(temperature),
+            None if pd.isna(ec_gl) else float(ec_gl),
+        )
+        for ds, station, ec_us_cm, temperature, ec_gl in latest[
+            list(UPSERT_COLS)
+        ].itertuples(index=False, name=None)
+    ]
+    cur.execute(LATEST_SCHEMA_SQL)
+    execute_values(
+        cur,
+        """
+        INSERT INTO latest_readings (station, ds, ec_us_cm, temperature, ec_gl)
+        VALUES %s
+        ON CONFLICT (station) DO UPDATE
+          SET ds = EXCLUDED.ds,
+              ec_us_cm = EXCLUDED.ec_us_cm,
+              temperature = EXCLUDED.temperature,
+              ec_gl = EXCLUDED.ec_gl,
+              updated_at = now()
+          WHERE latest_readings.ds <= EXCLUDED.ds;
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+# ---------- main ----------
+def latest_ds_per_station(
+    conn, stations: List[str], table_name: str = "sensor_data"
+) -> Dict:
+    """{station: max(ds)} for the given stations (each channel's cursor)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT station, max(ds) FROM {table_name} "
+            "WHERE station = ANY(%s) GROUP BY station",
+            (list(stations),),
+        )
+        return {station: ds for station, ds in cur.fetchall() if ds is not None}
+
+
+def main():
+    results = int(os.environ.get("THINGSPEAK_PULL", "200"))  # 200 as default (adjust)
+    sample_minutes = int(os.environ.get("SAMPLE_MINUTES", "10"))
 
-    # connect and upsert
     print("Connecting to Postgres...")
     conn = psycopg2.connect(DATABASE_URL)
     try:
-        upsert_df_to_postgres(conn, df_resampled, table_name="sensor_data")
+        # re-read from the start of the last stored bin so it gets completed
+        cursors = {
+            station: ds - timedelta(minutes=sample_minutes)
+            for station, ds in latest_ds_per_station(
+                conn, [c["station"] for c in CHANNELS]
+            ).items()
+        }
+
+        print(f"Fetching {len(CHANNELS)} ThingSpeak channel(s) ...")
+        with thingspeak_client.make_session(
+            pool_maxsize=max(1, len(CHANNELS))
+        ) as session:
+            feeds_by_station = fetch_channels(
+                CHANNELS,
+                session,
+                results=THINGSPEAK_MAX_RESULTS if cursors else results,
+                since=cursors,
+            )
+
+        frames = []
+        for ch in CHANNELS:
+            feeds = feeds_by_station.get(ch["station"], [])
+            df = feeds_to_resampled_df(
+                feeds,
+                station=ch["station"],
+                sample_minutes=sample_minutes,
+                fields=ch["fields"],
+            )
+            print(
+                f"{ch['station']}: {len(feeds)} feeds -> {len(df)} rows "
+                f"at {sample_minutes}-minute frequency."
+            )
+            if not df.empty:
+                frames.append(df)
+
+        # every channel lands in one transaction
+        df_resampled = (
+            pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        )
+        upsert_df_to_postgres(
+            conn,
+            df_resampled,
+            table_name="sensor_data",
+            method=os.environ.get("UPSERT_METHOD", "copy"),
+            commit=False,
+        )
+        with conn.cursor() as cur:
+            update_latest_readings(cur, df_resampled)
+            # the last stored bin is re-read and a capped fetch may start mid-bin:
+            # add only the entries the stored sketches don't hold yet
+            for ch in CHANNELS:
+                upsert_feed_sketches(
+                    cur,
+                    feeds_by_station.get(ch["station"], []),
+                    station=ch["station"],
+                    sample_minutes=sample_minutes,
+                    fields=ch["fields"],
+                )
+        conn.commit()
     finally:
         conn.close()
 
@@ -1,8 +1,14 @@
+import os
 import time
 from playwright.sync_api import sync_playwright
 
 TARGET_URL = "https://vgu-rangers-monitoring.streamlit.app/"
 BUTTON_TEXT = "back up"
+# Runs warmup.run_warmup() inside the app process (data, models, default charts);
+# the app only honours it when the token matches its WARMUP_TOKEN secret
+WARMUP_TOKEN = os.getenv("WARMUP_TOKEN")
+WARMUP_URL = TARGET_URL + f"?warmup={WARMUP_TOKEN}"
+WARMUP_DONE_TEXT = "Warm-up finished"
 
 def wake_streamlit():
     print("Starting Streamlit wake check")
@@ -35,6 +41,17 @@ def wake_streamlit():
             else:
                 print("App already awake")
 
+            # Sleeping Streamlit Cloud apps can only be woken from a browser;
+            # once up, warm the caches so the first visitor doesn't pay for them
+            if not WARMUP_TOKEN:
+                print("WARMUP_TOKEN not set, skipping cache warm-up")
+                return
+            print("Warming caches...")
+            page.goto(WARMUP_URL, wait_until="domcontentloaded", timeout=60000)
+            page.wait_for_selector(f"text={WARMUP_DONE_TEXT}", timeout=300000)
+            report = page.locator("[data-testid='stJson']").first
+            print(report.inner_text() if report.count() else "Warm-up done")
+
         except Exception as e:
             print("Error during wake check:", e)
 
@@ -1,46 +1,41 @@
 import folium
 from folium.plugins import MarkerCluster, FeatureGroupSubGroup, BeautifyIcon
+from folium.utilities import JsCode
 
+import streamlit as st
 from streamlit_folium import st_folium
 
+import perf
+from config import MAP_MODE
+from warning_levels import color_for, legend_items
 
-def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None):
-    """
-    Add clustered station markers + a legend onto an existing Folium map.
+# Overview when no station is selected
+DEFAULT_CENTER = [10.2, 106.0]
+DEFAULT_ZOOM = 8
 
-    - BASWAP + Other stations share one MarkerCluster, but are toggled separately in LayerControl
-    - Marker color is driven by station_warnings (0..4)
-    - Adds a fixed legend box (top-right) showing the color scale
-    """
-    from folium.plugins import MarkerCluster, FeatureGroupSubGroup, BeautifyIcon
-    import folium
-    from branca.element import MacroElement, Template
+# st_folium state the page uses (clicked_station); everything else stays in the browser
+RETURNED_OBJECTS = [
+    "last_object_clicked_tooltip",
+    "last_object_clicked",
+    "last_clicked",
+]
 
-    station_warnings = station_warnings or {}
+# A click on the map selects the nearest station within this distance
+CLICK_RADIUS_KM = 5.0
 
-    def _color_for(level):
-        # Map warning level -> marker color (with gray fallback)
-        try:
-            lv = int(level)
-        except Exception:
-            lv = None
-        if lv == 0:
-            return "#a5d6a7"
-        if lv == 1:
-            return "#fff59d"   # light yellow
-        if lv == 2:
-            return "#ffeb3b"   # yellow
-        if lv == 3:
-            return "#ff9800"   # orange
-        if lv == 4:
-            return "#f44336"   # red
-        return "#9e9e9e"       # fallback gray
+# geojson mode: colour and tooltip come from each feature's properties, in the browser
+STATION_FEATURE_JS = JsCode(
+    """
+function (feature, layer) {
+    layer.setStyle({fillColor: feature.properties.color});
+    layer.bindTooltip(feature.properties.name);
+}
+"""
+)
 
-    # Small CSS tweaks to center the FontAwesome glyph inside the marker pin
-    NUDGE_X = -1.8  # px to the right
-    NUDGE_Y = 1.8   # px upward
-    INNER_ICON_STYLE = f"margin-left: {NUDGE_X}px; transform: translateY(-{NUDGE_Y}px);"
 
+def _station_groups(m, texts):
+    """Shared clusterer + the BASWAP / Other sub-groups toggled in LayerControl"""
     # Shared clusterer (not shown as a toggle)
     shared_cluster = MarkerCluster(name="All stations (clusterer)", control=False)
     shared_cluster.add_to(m)
@@ -50,6 +45,26 @@ def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None)
     other_sub = FeatureGroupSubGroup(shared_cluster, name=texts["layer_other"], show=True)
     m.add_child(baswap_sub)
     m.add_child(other_sub)
+    return baswap_sub, other_sub
+
+
+@perf.timed("map_handler.add_layers")
+def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None):
+    """
+    Add clustered station markers + a legend onto an existing Folium map.
+
+    - BASWAP + Other stations share one MarkerCluster, but are toggled separately in LayerControl
+    - Marker color is driven by station_warnings (0..4)
+    - Adds a fixed legend box (top-right) showing the color scale
+    """
+    station_warnings = station_warnings or {}
+
+    # Small CSS tweaks to center the FontAwesome glyph inside the marker pin
+    NUDGE_X = -1.8  # px to the right
+    NUDGE_Y = 1.8  # px upward
+    INNER_ICON_STYLE = f"margin-left: {NUDGE_X}px; transform: translateY(-{NUDGE_Y}px);"
+
+    baswap_sub, other_sub = _station_groups(m, texts)
 
     # Add BASWAP markers
     for s in BASWAP_STATIONS:
@@ -60,7 +75,7 @@ def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None)
         except (KeyError, ValueError, TypeError):
             continue
 
-        b_color = _color_for(station_warnings.get(name, 0))
+        b_color = color_for(station_warnings.get(name, 0))
         folium.Marker(
             [lat, lon],
             tooltip=name,
@@ -82,7 +97,7 @@ def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None)
         except (KeyError, ValueError, TypeError):
             continue
 
-        o_color = _color_for(station_warnings.get(name, 0))
+        o_color = color_for(station_warnings.get(name, 0))
         folium.Marker(
             [lat, lon],
             tooltip=name,
@@ -97,19 +112,78 @@ def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None)
 
     # Show exactly two toggles (BASWAP / Other)
     folium.LayerControl(collapsed=False).add_to(m)
+    add_legend(m, texts)
 
-    # Build a small HTML legend and inject it as a MacroElement
-    legend_items = [
-        (0, "<= 0.5 g/l"),
-        (1, "0.5 – 1 g/l"),
-        (2, "1 – 2 g/l"),
-        (3, "2 – 4 g/l"),
-        (4, "> 4 g/l"),
-    ]
 
+def stations_geojson(stations, station_warnings, group):
+    """Stations as one GeoJSON FeatureCollection with their warning level/colour"""
+    features = []
+    for s in stations:
+        try:
+            lat = float(s["lat"])
+            lon = float(s["lon"])
+        except (KeyError, ValueError, TypeError):
+            continue
+        level = station_warnings.get(s["name"], 0)
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {
+                    "name": s["name"],
+                    "group": group,
+                    "level": level,
+                    "color": color_for(level),
+                },
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+@perf.timed("map_handler.add_geojson_layers")
+def add_geojson_layers(
+    m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None
+):
+    """
+    Same layers as add_layers, but each group is a single GeoJSON layer of
+    circle markers (canvas when the map prefers it) styled in the browser.
+    Cost grows with the size of the FeatureCollection, not with the number of
+    folium elements, so it suits networks with thousands of stations.
+    """
+    station_warnings = station_warnings or {}
+    baswap_sub, other_sub = _station_groups(m, texts)
+
+    for stations, sub, group in (
+        (BASWAP_STATIONS, baswap_sub, "baswap"),
+        (OTHER_STATIONS, other_sub, "other"),
+    ):
+        folium.GeoJson(
+            stations_geojson(stations, station_warnings, group),
+            name=f"{group} stations",
+            control=False,
+            marker=folium.CircleMarker(
+                radius=8,
+                weight=2,
+                color="#2c3e50",
+                fill=True,
+                fill_color="#9e9e9e",
+                fill_opacity=0.9,
+            ),
+            on_each_feature=STATION_FEATURE_JS,
+        ).add_to(sub)
+
+    folium.LayerControl(collapsed=False).add_to(m)
+    add_legend(m, texts)
+
+
+def add_legend(m, texts):
+    """Fixed legend box (top-right) showing the warning colour scale"""
+    from branca.element import MacroElement, Template
+
+    # Build a small HTML legend and inject it as a MacroElement
     rows_html = ""
-    for level, label in legend_items:
-        color = _color_for(level)
+    for level, label in legend_items():
+        color = color_for(level)
         rows_html += (
             f'<div style="display:flex;align-items:center;margin-bottom:2px;">'
             f'<span style="display:inline-block;width:12px;height:12px;'
@@ -147,20 +221,123 @@ def add_layers(m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=None)
     m.get_root().add_child(legend)
 
 
-
-def create_map(center, zoom, highlight_location=None, selected_station=None):
-    """Create the Folium map with all layers and markers"""
-    m = folium.Map(location=center, zoom_start=zoom, tiles=None)
+@perf.timed("map_handler.create_map")
+def create_map(
+    center=DEFAULT_CENTER,
+    zoom=DEFAULT_ZOOM,
+    highlight_location=None,
+    selected_station=None,
+    prefer_canvas=False,
+):
+    """Create the Folium map with the basemap (and optionally the highlight)"""
+    m = folium.Map(
+        location=center, zoom_start=zoom, tiles=None, prefer_canvas=prefer_canvas
+    )
     folium.TileLayer("OpenStreetMap", name="Basemap", control=False).add_to(m)
-    
+
     if highlight_location:
-        folium.CircleMarker(
-            location=highlight_location, radius=10, weight=3, fill=True, fill_opacity=0.2,
-            color="#0077ff", tooltip=selected_station,
-        ).add_to(m)
-    
+        highlight_layer(highlight_location, selected_station).add_to(m)
+
+    return m
+
+
+@perf.cached(st.cache_data(max_entries=16), "map_handler.base_map")
+def base_map(
+    lang, warnings_key, _texts, _baswap_stations, _other_stations, mode=MAP_MODE
+):
+    """
+    Tiles, clustered markers, layer control and legend, built once per language
+    and set of warning levels (a tuple of (station, level) pairs).
+
+    cache_data hands every rerun its own unpickled copy: folium maps are not
+    safe to render twice (Marker.render adds another SetIcon each time). The
+    view and the highlight are not part of the map; render_map passes them to
+    st_folium, so the generated map script stays the same between reruns.
+    `mode` is "markers" or "geojson" (see config.MAP_MODE).
+    """
+    if mode == "geojson":
+        m = create_map(prefer_canvas=True)
+        add_geojson_layers(
+            m,
+            _texts,
+            _baswap_stations,
+            _other_stations,
+            station_warnings=dict(warnings_key),
+        )
+    else:
+        m = create_map()
+        add_layers(
+            m,
+            _texts,
+            _baswap_stations,
+            _other_stations,
+            station_warnings=dict(warnings_key),
+        )
     return m
 
-def render_map(m, MAP_HEIGHT, key="baswap_map"):
-    """Render the map in streamlit and return the output"""
-    return st_folium(m, width="100%", height=MAP_HEIGHT, key=key)
+
+def highlight_layer(location, label=None):
+    """Ring around the selected station, as its own layer for st_folium"""
+    fg = folium.FeatureGroup(name="highlight", control=False)
+    folium.CircleMarker(
+        location=location,
+        radius=10,
+        weight=3,
+        fill=True,
+        fill_opacity=0.2,
+        color="#0077ff",
+        tooltip=label,
+    ).add_to(fg)
+    return fg
+
+
+@perf.timed("map_handler.render_map")
+def render_map(m, MAP_HEIGHT, key="baswap_map", center=None, zoom=None, highlight=None):
+    """
+    Render the map in streamlit and return the output.
+
+    Only click state comes back, so panning/zooming (bounds, center, zoom)
+    does not trigger a rerun; the component already debounces events (250 ms).
+    """
+    return st_folium(
+        m,
+        width="100%",
+        height=MAP_HEIGHT,
+        key=key,
+        center=center,
+        zoom=zoom,
+        feature_group_to_add=highlight,
+        returned_objects=RETURNED_OBJECTS,
+    )
+
+
+def clicked_station(map_out, STATION_LOOKUP, previous=None, max_km=CLICK_RADIUS_KM):
+    """
+    Station selected by the latest click, given the previous st_folium output:
+    the clicked object's tooltip label when there is one, otherwise the station
+    nearest to the clicked object or map point (within max_km).
+    """
+    from station_data import station_index
+
+    if not isinstance(map_out, dict):
+        return None
+    previous = previous or {}
+
+    def changed(k):
+        return map_out.get(k) is not None and map_out.get(k) != previous.get(k)
+
+    if changed("last_object_clicked") or changed("last_object_clicked_tooltip"):
+        label = map_out.get("last_object_clicked_tooltip")
+        if label in STATION_LOOKUP:
+            return label
+        point = map_out.get("last_object_clicked")
+    elif changed("last_clicked"):
+        point = map_out.get("last_clicked")
+    else:
+        return None
+    if not point or point.get("lat") is None or point.get("lng") is None:
+        return None
+
+    names, _ = station_index().nearest(point["lat"], point["lng"], max_km=max_km)
+    name = names[0]
+    return name if name in STATION_LOOKUP else None
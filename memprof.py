@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Opt-in memory profiling (MEMPROFILE=1).
+
+When enabled, every `perf.span` also records, via tracemalloc:
+  - peak:     highest allocation above the stage's starting point
+  - retained: memory still allocated when the stage ends
+and DataFrames returned by instrumented functions are accounted with
+`memory_usage(deep=True)`. After each Overview render a tracemalloc snapshot
+is written to MEMPROF_DIR (default `.memprof/`); compare two of them with
+
+    python memprof.py diff .memprof/a.snap .memprof/b.snap --top 20
+
+tracemalloc is process-wide, so profile with a single session open.
+"""
+import argparse
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+ENABLED = os.getenv("MEMPROFILE") == "1"
+SNAPSHOT_DIR = Path(os.getenv("MEMPROF_DIR", ".memprof"))
+FRAMES = 25  # traceback depth kept per allocation
+
+_lock = threading.Lock()
+_records = deque(maxlen=500)
+_local = threading.local()
+
+if ENABLED and not tracemalloc.is_tracing():
+    tracemalloc.start(FRAMES)
+
+
+def enabled() -> bool:
+    return ENABLED and tracemalloc.is_tracing()
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def begin(name: str) -> dict:
+    """Start measuring a stage; nested stages keep the parent's peak intact."""
+    current, peak = tracemalloc.get_traced_memory()
+    stack = _stack()
+    if stack:
+        stack[-1]["peak_abs"] = max(stack[-1]["peak_abs"], peak)
+    tracemalloc.reset_peak()
+    frame = {"stage": name, "start": current, "peak_abs": current, "frames": []}
+    stack.append(frame)
+    return frame
+
+
+def end(frame: dict) -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    stack = _stack()
+    stack.pop()
+    peak_abs = max(frame["peak_abs"], peak)
+    if stack:
+        stack[-1]["peak_abs"] = max(stack[-1]["peak_abs"], peak_abs)
+    record = {
+        "stage": frame["stage"],
+        "time": time.time(),
+        "peak_bytes": peak_abs - frame["start"],
+        "retained_bytes": current - frame["start"],
+        "frame_bytes": sum(b for _, b in frame["frames"]),
+    }
+    with _lock:
+        _records.append(record)
+    return record
+
+
+def account_frame(df, label: str = "") -> int:
+    """Add a DataFrame's deep memory usage to the innermost open stage."""
+    try:
+        nbytes = int(df.memory_usage(deep=True).sum())
+    except AttributeError:
+        return 0
+    stack = _stack()
+    if stack:
+        stack[-1]["frames"].append((label, nbytes))
+    return nbytes
+
+
+def records() -> list:
+    with _lock:
+        return list(_records)
+
+
+def stage_summary() -> dict:
+    """{stage: {'calls', 'max_peak_mib', 'mean_retained_mib', 'max_frame_mib'}}."""
+    out = {}
+    for r in records():
+        s = out.setdefault(
+            r["stage"],
+            {
+                "calls": 0,
+                "max_peak_mib": 0.0,
+                "retained_sum": 0.0,
+                "max_frame_mib": 0.0,
+            },
+        )
+        s["calls"] += 1
+        s["max_peak_mib"] = max(s["max_peak_mib"], r["peak_bytes"] / 2**20)
+        s["retained_sum"] += r["retained_bytes"] / 2**20
+        s["max_frame_mib"] = max(s["max_frame_mib"], r["frame_bytes"] / 2**20)
+    for s in out.values():
+        s["mean_retained_mib"] = round(s.pop("retained_sum") / s["calls"], 3)
+        s["max_peak_mib"] = round(s["max_peak_mib"], 3)
+        s["max_frame_mib"] = round(s["max_frame_mib"], 3)
+    return dict(sorted(out.items()))
+
+
+def take_snapshot(label: str) -> Path | None:
+    """Dump a tracemalloc snapshot to SNAPSHOT_DIR; returns its path."""
+    if not enabled():
+        return None
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    path = SNAPSHOT_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{label}.snap"
+    tracemalloc.take_snapshot().dump(str(path))
+    return path
+
+
+def diff_snapshots(
+    old_path: str, new_path: str, group_by: str = "lineno", top: int = 20
+) -> list:
+    """Largest allocation differences between two dumped snapshots."""
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]
+    old = tracemalloc.Snapshot.load(old_path).filter_traces(ignore)
+    new = tracemalloc.Snapshot.load(new_path).filter_traces(ignore)
+    return new.compare_to(old, group_by)[:top]
+
+
+def render_panel() -> None:
+    """Per-stage memory table for the `?debug=1` panel."""
+    import pandas as pd
+    import streamlit as st
+
+    st.markdown("**Memory per stage (MEMPROFILE)**")
+    st.dataframe(
+        pd.DataFrame.from_dict(stage_summary(), orient="index"),
+        use_container_width=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two tracemalloc snapshots.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("diff")
+    d.add_argument("old")
+    d.add_argument("new")
+    d.add_argument("--top", type=int, default=20)
+    d.add_argument(
+        "--group-by", choices=["lineno", "filename", "traceback"], default="lineno"
+    )
+    args = parser.parse_args()
+
+    stats = diff_snapshots(args.old, args.new, args.group_by, args.top)
+    total = sum(s.size_diff for s in stats)
+    for s in stats:
+        print(
+            f"{s.size_diff / 2**20:+10.3f} MiB  {s.count_diff:+8d} blocks  "
+            f"{s.traceback}"
+        )
+        if args.group_by == "traceback":
+            for line in s.traceback.format()[-6:]:
+                print("      " + line)
+    print(f"{total / 2**20:+10.3f} MiB  total of top {len(stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ torch.classes.__path__ = []
 import torch.nn as nn
 from pytorch_lightning import LightningModule
 from torchmetrics.regression import MeanAbsoluteError, MeanSquaredError, R2Score
-import joblib
+
+from config import MODEL_CONFIG
 
 class LSTMTimeseries(nn.Module):
     def __init__(self, input_size: int, output_size: int, hidden_size: int = 128, dropout: float = 0.5):
@@ -78,23 +79,12 @@ class LITModel(LightningModule):
     def configure_optimizers(self):
         return torch.optim.Adam(self.parameters(), lr=self.lr)
 
-def make_predictions(df, mode=None):
-    # Convert the test data to a NumPy array and reshape it
-    reshaped_df = df.to_numpy().reshape(-1, 1)
-
-    # Transform the test data using the fitted scaler
-    scaler = joblib.load("scalers/scaler_vinhlong.pkl")
-    scaled_df = scaler.transform(reshaped_df)
-    input_seq = torch.tensor(scaled_df, dtype=torch.float32).unsqueeze(0)  # Shape: (1, seq_len, features)
-    if mode == "Max":
-        model = LITModel.load_from_checkpoint("weights/hourly_max.ckpt")
-    model.eval()  # Set model to evaluation mode
-
-    # Make a single prediction
-    with torch.no_grad():
-        prediction = model(input_seq)[:, -1, :]  # Get the last time step prediction
-
-    rescaled_prediction = scaler.inverse_transform(prediction)
-    return [rescaled_prediction.item()]
+def make_predictions(df, mode="Max"):
+    """One-step-ahead forecast from the LSTM trained for *mode* (only "Max" has weights)."""
+    from models.registry import REGISTRY
 
-    
\ No newline at end of file
+    model_id = f"LSTM-{mode}"
+    if model_id not in MODEL_CONFIG:
+        raise ValueError(f"No LSTM weights for mode {mode!r}.")
+    # weights + scaler are loaded once per process by the registry
+    return REGISTRY.predict(model_id, df.to_numpy())
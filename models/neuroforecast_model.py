@@ -1,12 +1,14 @@
 import numpy as np
 import pandas as pd
 import time
-from neuralforecast import NeuralForecast
-from streamlit import cache_data, cache_resource
+from streamlit import cache_data
 from pathlib import Path
 import os
 import streamlit as st
 
+import perf
+from models.registry import REGISTRY
+
 #!/usr/bin/env python3
 import os
 import sys
@@ -43,25 +45,14 @@ def print_table(rows, total, top=None):
     print("-"*80)
     print(f"TOTAL: {total/1024**2:.6f} MiB   ({total} bytes)")
 
-@cache_resource
 def load_models(freq):
-    print(freq)
-    if freq == "Hour":
-        # rows, total = list_files("models/weights/nbeats_24")
-        # print_table(rows, total, top=200)   # change top=None to show everything
-        nf = NeuralForecast.load(path="models/weights/nbeats_1h_24_7")
-    elif freq == "Day":
-        nf = NeuralForecast.load(path="models/weights/nhbeats_1d_30_7")
-    print("model loaded")
-    return nf
+    # loaded once per process and shared with the LSTM path via the registry
+    return REGISTRY.get(freq)
+
 
-@cache_data
+@perf.cached(cache_data, "models.make_predictions")
 def make_predictions(df, freq="Hour"):
-    time_start = time.time()
-    model = load_models(freq)
-    preds = model.predict(df)
-    print("Prediction takes:", time.time() - time_start, "(s)")
-    return preds
+    return REGISTRY.predict(freq, df)
 
 # Create dummy data
 def create_dummy_data(n=48):
@@ -75,4 +66,5 @@ def create_dummy_data(n=48):
 if __name__ == "__main__":
     dummy_df = create_dummy_data()
     for _ in range(5):
-        make_predictions(dummy_df, freq="1h")
+        make_predictions(dummy_df, freq="Hour")
+    print(REGISTRY.stats())
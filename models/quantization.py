@@ -0,0 +1,211 @@
+"""
+Dynamic int8 quantization for CPU inference.
+
+Linear/LSTM weights are stored as int8 and activations are quantized on the fly,
+which shrinks the NHITS MLP stacks and the LSTM and speeds them up on CPU.
+Which models run quantized is controlled by `MODEL_CONFIG[...]["quantize"]`.
+
+Run `python -m models.quantization Hour --csv held_out.csv` (or `Day`, `LSTM-Max`)
+to check accuracy, latency and memory of the quantized model against fp32 on a
+held-out window.
+"""
+
+import argparse
+import copy
+import io
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.ao.quantization import quantize_dynamic
+
+QUANTIZABLE_LAYERS = {nn.Linear, nn.LSTM}
+
+
+def quantize_module(module: nn.Module) -> nn.Module:
+    """Return a copy of *module* with Linear/LSTM layers dynamically quantized to int8."""
+    module = copy.deepcopy(module).cpu().eval()
+    return quantize_dynamic(module, QUANTIZABLE_LAYERS, dtype=torch.qint8)
+
+
+def quantize_neuralforecast(nf):
+    """Quantize every model inside a loaded NeuralForecast object (in place)."""
+    quantized = []
+    for model in nf.models:
+        q = quantize_module(model)
+        # quantized kernels only exist on CPU
+        trainer_kwargs = dict(getattr(q, "trainer_kwargs", {}) or {})
+        trainer_kwargs.update(accelerator="cpu", devices=1)
+        q.trainer_kwargs = trainer_kwargs
+        quantized.append(q)
+    nf.models = quantized
+    return nf
+
+
+def weight_bytes(obj) -> int:
+    """Serialized size of all weights (a module, or every model inside a NeuralForecast)."""
+    modules = getattr(obj, "models", None) or [obj]
+    total = 0
+    for m in modules:
+        buf = io.BytesIO()
+        torch.save(m.state_dict(), buf)
+        total += buf.getbuffer().nbytes
+    return total
+
+
+def _forecast_column(preds: pd.DataFrame) -> str:
+    """Pick the point-forecast column (median if the model has prediction intervals)."""
+    for c in preds.columns:
+        if str(c).endswith("-median"):
+            return c
+    skip = {"unique_id", "ds"}
+    cols = [
+        c
+        for c in preds.columns
+        if c not in skip and "-lo-" not in c and "-hi-" not in c
+    ]
+    if not cols:
+        raise ValueError("No forecast column in predictions.")
+    return cols[0]
+
+
+def _timed(fn, repeats: int):
+    """Run fn `repeats` times; return (last result, median latency in seconds)."""
+    times = []
+    out = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return out, float(np.median(times))
+
+
+def evaluate_neuralforecast(
+    path: str, series: pd.DataFrame, repeats: int = 5, tolerance: float = 0.05
+) -> dict:
+    """
+    Compare fp32 vs int8 NeuralForecast models on a held-out window.
+
+    *series* has columns ['ds','y'] (and optionally 'unique_id'); the last `h` rows
+    are held out as ground truth. The check passes when the int8 MAE is at most
+    `tolerance` (relative) worse than fp32.
+    """
+    from neuralforecast import NeuralForecast
+
+    nf32 = NeuralForecast.load(path=path)
+    nf8 = quantize_neuralforecast(NeuralForecast.load(path=path))
+
+    h = nf32.models[0].h
+    df = series.copy()
+    if "unique_id" not in df.columns:
+        df["unique_id"] = "Baswap station"
+    df = df[["unique_id", "ds", "y"]].sort_values("ds").reset_index(drop=True)
+    if len(df) <= h:
+        raise ValueError(f"Need more than {h} rows to hold out a window.")
+    history, actual = df.iloc[:-h], df["y"].iloc[-h:].to_numpy()
+
+    p32, t32 = _timed(lambda: nf32.predict(history), repeats)
+    p8, t8 = _timed(lambda: nf8.predict(history), repeats)
+    y32 = p32[_forecast_column(p32)].to_numpy()[:h]
+    y8 = p8[_forecast_column(p8)].to_numpy()[:h]
+
+    return _report(
+        actual, y32, y8, t32, t8, weight_bytes(nf32), weight_bytes(nf8), tolerance
+    )
+
+
+def evaluate_lstm(
+    ckpt_path: str,
+    scaler_path: str,
+    series: pd.DataFrame,
+    window: int = 24,
+    holdout: int = 24,
+    repeats: int = 5,
+    tolerance: float = 0.05,
+) -> dict:
+    """
+    Compare fp32 vs int8 LSTM one-step-ahead forecasts over the last `holdout` rows.
+
+    Each held-out value is predicted from the `window` readings right before it.
+    """
+    import joblib
+    from models.lstm_model import LITModel
+
+    scaler = joblib.load(scaler_path)
+    m32 = LITModel.load_from_checkpoint(ckpt_path, map_location="cpu").eval()
+    m8 = quantize_module(m32)
+
+    y = series.sort_values("ds")["y"].to_numpy(dtype=float)
+    if len(y) < window + holdout:
+        raise ValueError(f"Need at least {window + holdout} rows.")
+    scaled = scaler.transform(y.reshape(-1, 1)).astype(np.float32)
+    starts = range(len(y) - holdout - window, len(y) - window)
+    batch = torch.from_numpy(np.stack([scaled[s : s + window] for s in starts]))
+    actual = y[-holdout:]
+
+    def _predict(model):
+        with torch.no_grad():
+            out = model(batch)[:, -1, :].numpy()
+        return scaler.inverse_transform(out).ravel()
+
+    y32, t32 = _timed(lambda: _predict(m32), repeats)
+    y8, t8 = _timed(lambda: _predict(m8), repeats)
+    return _report(
+        actual, y32, y8, t32, t8, weight_bytes(m32), weight_bytes(m8), tolerance
+    )
+
+
+def _report(actual, y32, y8, t32, t8, b32, b8, tolerance) -> dict:
+    mae32 = float(np.mean(np.abs(y32 - actual)))
+    mae8 = float(np.mean(np.abs(y8 - actual)))
+    return {
+        "mae_fp32": mae32,
+        "mae_int8": mae8,
+        "max_abs_drift": float(np.max(np.abs(y32 - y8))),
+        "latency_fp32_s": t32,
+        "latency_int8_s": t8,
+        "latency_delta_pct": 100.0 * (t8 - t32) / t32 if t32 else None,
+        "weights_fp32_bytes": b32,
+        "weights_int8_bytes": b8,
+        "memory_delta_pct": 100.0 * (b8 - b32) / b32 if b32 else None,
+        "passed": mae8 <= mae32 * (1.0 + tolerance) + 1e-12,
+    }
+
+
+def main():
+    from config import MODEL_CONFIG
+
+    parser = argparse.ArgumentParser(
+        description="Check int8 vs fp32 forecast accuracy and cost."
+    )
+    parser.add_argument("model", choices=list(MODEL_CONFIG))
+    parser.add_argument(
+        "--csv", required=True, help="held-out series with columns ds,y"
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    series = pd.read_csv(args.csv, parse_dates=["ds"])
+    cfg = MODEL_CONFIG[args.model]
+    if "scaler" in cfg:
+        report = evaluate_lstm(
+            cfg["path"],
+            cfg["scaler"],
+            series,
+            repeats=args.repeats,
+            tolerance=args.tolerance,
+        )
+    else:
+        report = evaluate_neuralforecast(
+            cfg["path"], series, args.repeats, args.tolerance
+        )
+    for k, v in report.items():
+        print(f"{k:>20}: {v}")
+    raise SystemExit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
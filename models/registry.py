@@ -0,0 +1,212 @@
+"""
+Process-wide model registry.
+
+Every forecast model (NeuralForecast Hour/Day, LSTM) is registered once with a
+loader and a predictor. Models are loaded lazily on first use, kept for the
+lifetime of the process, and the least recently used ones are evicted when
+more than `max_loaded` are resident or when idle for longer than `idle_ttl`.
+The LSTM weights are memory-mapped; the NeuralForecast checkpoints are not
+(see _load_neuralforecast).
+
+    from models.registry import REGISTRY
+    preds = REGISTRY.predict("Hour", nf_input)
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+import perf
+from config import MODEL_CONFIG
+
+logger = logging.getLogger("baswap.models")
+
+
+class ModelRegistry:
+    def __init__(self, max_loaded: int = 3, idle_ttl: float | None = 6 * 3600):
+        self.max_loaded = max_loaded
+        self.idle_ttl = idle_ttl
+        self._specs = {}  # model_id -> (loader, predictor)
+        self._models = OrderedDict()  # model_id -> loaded model, in LRU order
+        self._last_used = {}
+        self._load_locks = {}
+        self._lock = threading.RLock()
+        self._stats = {}
+
+    def register(self, model_id: str, loader, predictor) -> None:
+        """Register `loader() -> model` and `predictor(model, series) -> output`."""
+        with self._lock:
+            self._specs[model_id] = (loader, predictor)
+            self._load_locks[model_id] = threading.Lock()
+            self._stats[model_id] = {
+                "loads": 0,
+                "load_s": 0.0,
+                "calls": 0,
+                "latency_s": deque(maxlen=200),
+            }
+
+    def get(self, model_id: str):
+        """Return the loaded model, loading it on first use."""
+        if model_id not in self._specs:
+            raise KeyError(f"Unknown model: {model_id}")
+
+        with self._lock:
+            if model_id in self._models:
+                self._models.move_to_end(model_id)
+                self._last_used[model_id] = time.monotonic()
+                return self._models[model_id]
+
+        # load outside the registry lock so other models stay usable meanwhile;
+        # the per-model lock keeps concurrent sessions from loading it twice
+        with self._load_locks[model_id]:
+            with self._lock:
+                if model_id in self._models:
+                    return self._models[model_id]
+            loader, _ = self._specs[model_id]
+            start = time.perf_counter()
+            with perf.span(f"models.load.{model_id}"):
+                model = loader()
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._models[model_id] = model
+                self._last_used[model_id] = time.monotonic()
+                self._stats[model_id]["loads"] += 1
+                self._stats[model_id]["load_s"] += elapsed
+                self._evict_locked(keep=model_id)
+            logger.info("Loaded model %s in %.2fs", model_id, elapsed)
+            return model
+
+    def predict(self, model_id: str, series):
+        """Run the registered predictor for *model_id* on *series*."""
+        model = self.get(model_id)
+        _, predictor = self._specs[model_id]
+        start = time.perf_counter()
+        with perf.span(f"models.predict.{model_id}"):
+            out = predictor(model, series)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats[model_id]["calls"] += 1
+            self._stats[model_id]["latency_s"].append(elapsed)
+        return out
+
+    def evict(self, model_id: str | None = None) -> None:
+        """Drop one model (or all of them) from memory."""
+        with self._lock:
+            ids = [model_id] if model_id else list(self._models)
+            for mid in ids:
+                self._models.pop(mid, None)
+                self._last_used.pop(mid, None)
+
+    def _evict_locked(self, keep: str) -> None:
+        now = time.monotonic()
+        if self.idle_ttl is not None:
+            for mid in list(self._models):
+                if mid != keep and now - self._last_used[mid] > self.idle_ttl:
+                    self._models.pop(mid)
+        while len(self._models) > self.max_loaded:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self._models.pop(oldest)
+
+    def loaded(self) -> list:
+        with self._lock:
+            return list(self._models)
+
+    def stats(self) -> dict:
+        """Per-model load count/time, call count and p50/p95 prediction latency."""
+        with self._lock:
+            out = {}
+            for mid, s in self._stats.items():
+                lat = np.asarray(s["latency_s"], dtype=float)
+                out[mid] = {
+                    "loaded": mid in self._models,
+                    "loads": s["loads"],
+                    "load_s": round(s["load_s"], 4),
+                    "calls": s["calls"],
+                    "p50_s": (
+                        round(float(np.percentile(lat, 50)), 4) if lat.size else None
+                    ),
+                    "p95_s": (
+                        round(float(np.percentile(lat, 95)), 4) if lat.size else None
+                    ),
+                }
+            return out
+
+
+# ------------------------------
+# Loaders / predictors
+# ------------------------------
+def _load_neuralforecast(model_id: str):
+    """
+    NeuralForecast.load reads each checkpoint through an fsspec file object,
+    and torch.load can only memory-map a path, so unlike the LSTM these
+    checkpoints are read fully into memory (under 1 MB each today).
+    """
+    from neuralforecast import NeuralForecast
+
+    cfg = MODEL_CONFIG[model_id]
+    nf = NeuralForecast.load(path=cfg["path"])
+    if cfg.get("quantize"):
+        from models.quantization import quantize_neuralforecast
+
+        nf = quantize_neuralforecast(nf)
+    return nf
+
+
+def _predict_neuralforecast(nf, series):
+    return nf.predict(series)
+
+
+def _load_lstm(model_id: str):
+    import joblib
+    import torch
+    from models.lstm_model import LITModel
+
+    cfg = MODEL_CONFIG[model_id]
+    try:
+        # memory-map the weights instead of reading the whole file into RAM
+        ckpt = torch.load(
+            cfg["path"], map_location="cpu", mmap=True, weights_only=False
+        )
+        model = LITModel(**ckpt.get("hyper_parameters", {}))
+        model.load_state_dict(ckpt["state_dict"])
+    except RuntimeError:
+        # legacy (non-zipfile) checkpoints cannot be memory-mapped
+        model = LITModel.load_from_checkpoint(cfg["path"], map_location="cpu")
+    model.eval()
+    if cfg.get("quantize"):
+        from models.quantization import quantize_module
+
+        model = quantize_module(model)
+    scaler = joblib.load(cfg["scaler"])
+    return model, scaler
+
+
+def _predict_lstm(model_and_scaler, series):
+    import torch
+
+    model, scaler = model_and_scaler
+    reshaped = np.asarray(series, dtype=float).reshape(-1, 1)
+    scaled = scaler.transform(reshaped)
+    # (1, seq_len, features)
+    input_seq = torch.tensor(scaled, dtype=torch.float32).unsqueeze(0)
+    with torch.no_grad():
+        prediction = model(input_seq)[:, -1, :]  # last time step
+    return [scaler.inverse_transform(prediction).item()]
+
+
+REGISTRY = ModelRegistry()
+for _model_id, _cfg in MODEL_CONFIG.items():
+    if "scaler" in _cfg:
+        REGISTRY.register(_model_id, lambda m=_model_id: _load_lstm(m), _predict_lstm)
+    else:
+        REGISTRY.register(
+            _model_id,
+            lambda m=_model_id: _load_neuralforecast(m),
+            _predict_neuralforecast,
+        )
@@ -5,11 +5,13 @@ import base64
 import mimetypes
 from pathlib import Path
 
-from station_data import norm_name_capitalize
+from station_data import DEFAULT_STATION, STATION_NAMES
 from config import get_about_html
 from aggregation import filter_data, apply_aggregation
-from plotting import plot_line_chart, display_statistics
-from config import METRIC_CONFIG, TITLE_TO_COLUMN
+from config import METRIC_CONFIG, QUANTILE_MODE, TITLE_TO_COLUMN
+
+# Date window shown before the user picks one (days back from the last reading)
+DEFAULT_RANGE_DAYS = 7
 
 
 def settings_panel(side_texts, first_date, last_date, COL_NAMES):
@@ -60,7 +62,9 @@ def settings_panel(side_texts, first_date, last_date, COL_NAMES):
         or st.session_state.date_from is None
         or st.session_state.date_from < first_date
     ):
-        st.session_state.date_from = max(first_date, last_date - timedelta(days=7))
+        st.session_state.date_from = max(
+            first_date, last_date - timedelta(days=DEFAULT_RANGE_DAYS)
+        )
 
     if (
         "date_to" not in st.session_state
@@ -107,37 +111,29 @@ def overview_page(
     TABLE_HEIGHT,
     lang,
 ):
-    from station_data import norm_name, resolve_cols
-    from map_handler import add_layers, create_map, render_map
+    # heavy UI deps (folium, altair) are only needed on this page
+    from data import latest_from_frame, latest_readings
+    from map_handler import (
+        DEFAULT_CENTER,
+        DEFAULT_ZOOM,
+        RETURNED_OBJECTS,
+        base_map,
+        clicked_station,
+        highlight_layer,
+        render_map,
+    )
+    from plotting import plot_line_chart, display_statistics
+    from stats_index import level_index, sketch_index, stats_index
+    from warning_levels import NO_LEVEL, classify, color_for, legend_items
     import pandas as pd
     import streamlit as st
 
-    # Map an EC reading to a warning bucket (0..4)
-    def _calc_warning(v):
-        if v is None or pd.isna(v):
-            return None
-        try:
-            x = float(v)
-        except Exception:
-            return None
-        if x <= 0.5:
-            return 0
-        elif x <= 1:
-            return 1
-        elif x <= 2:
-            return 2
-        elif x <= 4:
-            return 3
-        else:
-            return 4
-
     col_left, col_right = st.columns([7, 3], gap="small")
 
     BASWAP_NAMES = [s["name"] for s in BASWAP_STATIONS]
     OTHER_NAMES = [s["name"] for s in OTHER_STATIONS]
 
     # Default selection on first load
-    DEFAULT_STATION = "Vĩnh Long"
     if "selected_station" not in st.session_state:
         if DEFAULT_STATION in BASWAP_NAMES or DEFAULT_STATION in OTHER_NAMES:
             st.session_state.selected_station = DEFAULT_STATION
@@ -166,32 +162,31 @@ def overview_page(
             None if picked_label == texts["picker_none"] else picked_label
         )
 
-        # Latest EC value per station (used for the table + map coloring)
-        latest_values = {}
+        # Latest EC value per station (used for the table + map coloring);
+        # O(stations) rows from Neon, the loaded dataset only if that fails
         try:
-            stn_col, time_col, ec_col = resolve_cols(df.columns)
-            d = df.copy()
-            d[time_col] = pd.to_datetime(d[time_col], errors="coerce")
-            d = d.dropna(subset=[time_col])
-            idx = d.groupby(stn_col)[time_col].idxmax()
-            latest = d.loc[idx, [stn_col, ec_col]].copy()
-            latest["key"] = latest[stn_col].map(norm_name)
-            latest["val"] = pd.to_numeric(latest[ec_col], errors="coerce")
-            latest_values = dict(zip(latest["key"], latest["val"]))
+            latest = latest_readings()
         except Exception:
-            latest_values = {}
+            latest = latest_from_frame(df)
+        latest_values = dict(
+            zip(
+                latest["station"].map(STATION_NAMES.key_of),
+                pd.to_numeric(latest["ec_gl"], errors="coerce"),
+            )
+        )
 
         # Build the right-side table and the warning dict for map markers
         station_names = BASWAP_NAMES + OTHER_NAMES
+        values = [
+            latest_values.get(STATION_NAMES.key_of(name)) for name in station_names
+        ]
+        levels = classify(values)
         rows = []
         station_warnings = {}
-        for name in station_names:
-            key = norm_name(name)
-            val = latest_values.get(key)
-            warn = _calc_warning(val)
-            station_warnings[name] = 0 if warn is None else warn
+        for name, val, warn in zip(station_names, values, levels.tolist()):
+            station_warnings[name] = 0 if warn == NO_LEVEL else warn
             display_val = "-" if val is None or pd.isna(val) else f"{val:.1f}"
-            display_warn = "-" if warn is None else str(warn)
+            display_warn = "-" if warn == NO_LEVEL else str(warn)
             rows.append(
                 {
                     texts["table_station"]: name,
@@ -210,43 +205,65 @@ def overview_page(
             unsafe_allow_html=True,
         )
 
-        # Map view follows the selected station (fallback is a wide overview)
-        center = [10.2, 106.0]
-        zoom = 8
-        highlight_location = None
-
-        sel = st.session_state.get("selected_station")
-        if sel and sel in STATION_LOOKUP:
-            lat, lon = STATION_LOOKUP[sel]
-            center = [lat, lon]
-            zoom = 12
-            highlight_location = (lat, lon)
-
-        m = create_map(center, zoom, highlight_location, sel)
-        add_layers(
-            m, texts, BASWAP_STATIONS, OTHER_STATIONS, station_warnings=station_warnings
-        )
-        map_out = render_map(m, MAP_HEIGHT)
+        # Markers/legend are cached per language + colours; only the view
+        # and the highlight change between reruns
+        warnings_key = tuple(sorted(station_warnings.items()))
+
+        # Map clicks rerun only this fragment; the data/stats/forecast part of
+        # the page reruns only when a click actually selects another station
+        @st.fragment
+        def _station_map():
+            # Map view follows the selected station (fallback is a wide overview)
+            center = DEFAULT_CENTER
+            zoom = DEFAULT_ZOOM
+            highlight = None
+
+            sel = st.session_state.get("selected_station")
+            if sel and sel in STATION_LOOKUP:
+                lat, lon = STATION_LOOKUP[sel]
+                center = [lat, lon]
+                zoom = 12
+                highlight = highlight_layer((lat, lon), sel)
+
+            m = base_map(
+                lang,
+                warnings_key,
+                _texts=texts,
+                _baswap_stations=BASWAP_STATIONS,
+                _other_stations=OTHER_STATIONS,
+            )
+            map_out = render_map(
+                m, MAP_HEIGHT, center=center, zoom=zoom, highlight=highlight
+            )
 
-    # Clicking a marker updates the selected station
-    clicked_label = (
-        map_out.get("last_object_clicked_tooltip")
-        if isinstance(map_out, dict)
-        else None
-    )
-    if (
-        clicked_label
-        and clicked_label in STATION_LOOKUP
-        and st.session_state.get("selected_station") != clicked_label
-    ):
-        st.session_state.selected_station = clicked_label
-        st.rerun()
+            # st_folium keeps returning the last click; act on each click once so
+            # a stale click does not override the picker
+            click = (
+                {k: map_out.get(k) for k in RETURNED_OBJECTS}
+                if isinstance(map_out, dict)
+                else {}
+            )
+            previous = st.session_state.get("_last_map_click")
+            if click == previous:
+                return
+            st.session_state._last_map_click = click
+
+            # Clicking a marker (or near one) updates the selected station
+            clicked_label = clicked_station(click, STATION_LOOKUP, previous)
+            if (
+                clicked_label
+                and st.session_state.get("selected_station") != clicked_label
+            ):
+                st.session_state.selected_station = clicked_label
+                st.rerun()
+
+        _station_map()
 
     # Date bounds depend on the selected station (or whole dataset if none)
     station = st.session_state.get("selected_station")
 
     if station is not None:
-        station_name = norm_name_capitalize(station)
+        station_name = STATION_NAMES.code_of(station)
         df_station = df[df["station"] == station_name]
     else:
         df_station = df
@@ -305,13 +322,13 @@ def overview_page(
         for c, lab in zip((c1, c2, c3, c4), (t_max, t_min, t_avg, t_std)):
             c.metric(label=lab, value="-")
     elif selected_station in BASWAP_NAMES or selected_station in OTHER_NAMES:
-        stats_df = filter_data(
-            df,
-            st.session_state.get("selected_station"),
+        # answered from per-station prefix sums; no filtered copy of df
+        stats = stats_index(df, st.session_state.target_col).stats(
+            STATION_NAMES.code_of(selected_station),
             st.session_state.date_from,
             st.session_state.date_to,
         )
-        display_statistics(stats_df, st.session_state.target_col)
+        display_statistics(stats)
     else:
         raise RuntimeError("Invalid station's name.")
 
@@ -329,6 +346,13 @@ def overview_page(
         df, st.session_state.get("selected_station"), date_from, date_to
     )
 
+    # medians from the merged per-bin sketches (None -> exact groupby)
+    quantiles = None
+    if QUANTILE_MODE == "approx" and not filtered_df.empty:
+        quantiles = sketch_index(df, target_col).series.get(
+            STATION_NAMES.code_of(st.session_state.get("selected_station"))
+        )
+
     cfg = METRIC_CONFIG.get(target_col, {})
     lang_cfg = cfg.get(lang, {})
 
@@ -337,6 +361,12 @@ def overview_page(
     # Charts: 10min + hourly + daily median
     with chart_container:
         st.subheader(f"{metric_title}")
+        # approx and exact medians summarize different readings: say which
+        st.caption(
+            texts["quantiles_approx"]
+            if quantiles is not None
+            else texts["quantiles_exact"]
+        )
 
         tabs = st.tabs(
             [texts["tenmin_view"], texts["hourly_view"], texts["daily_view"]]
@@ -344,25 +374,55 @@ def overview_page(
 
         # 10-minute
         with tabs[0]:
-            tenmin = apply_aggregation(filtered_df, target_col, "10min", ["Median"])
+            tenmin = apply_aggregation(
+                filtered_df, target_col, "10min", ["Median"], quantiles=quantiles
+            )
             if "Aggregation" in tenmin.columns:
                 tenmin = tenmin.loc[tenmin["Aggregation"] == "Median"]
             plot_line_chart(tenmin, target_col, "10min")
 
         # Hourly
         with tabs[1]:
-            hourly = apply_aggregation(filtered_df, target_col, "Hour", ["Median"])
+            hourly = apply_aggregation(
+                filtered_df, target_col, "Hour", ["Median"], quantiles=quantiles
+            )
             if "Aggregation" in hourly.columns:
                 hourly = hourly.loc[hourly["Aggregation"] == "Median"]
             plot_line_chart(hourly, target_col, "Hour")
 
         # Daily
         with tabs[2]:
-            daily = apply_aggregation(filtered_df, target_col, "Day", ["Median"])
+            daily = apply_aggregation(
+                filtered_df, target_col, "Day", ["Median"], quantiles=quantiles
+            )
             if "Aggregation" in daily.columns:
                 daily = daily.loc[daily["Aggregation"] == "Median"]
             plot_line_chart(daily, target_col, "Day")
 
+        # Share of the selected range spent in each EC warning level
+        if "ec_gl" in filtered_df.columns and not filtered_df.empty:
+            # answered from per-station level prefix sums, like the stats above
+            level_summary = level_index(df).summary(
+                STATION_NAMES.code_of(st.session_state.get("selected_station")),
+                date_from,
+                date_to,
+            )
+            if not level_summary.empty:
+                labels = dict(legend_items())
+                chips = " ".join(
+                    '<span style="display:inline-block;width:10px;height:10px;'
+                    f"border-radius:50%;background:{color_for(r.level)};"
+                    'border:1px solid #555;margin:0 4px 0 10px;"></span>'
+                    f"{labels.get(r.level, r.level)}: {r.share:.0%}"
+                    for r in level_summary.itertuples()
+                )
+                st.markdown(
+                    f'<div class="stats-scope"><span class="k">'
+                    f'{texts.get("time_in_level", "Time in warning level")}:</span>'
+                    f"{chips}</div>",
+                    unsafe_allow_html=True,
+                )
+
     st.divider()
 
     # # Raw data table for the selected columns
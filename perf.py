@@ -0,0 +1,244 @@
+"""
+Lightweight timing instrumentation.
+
+    with perf.span("plotting.render_predictions"):
+        ...
+
+    @perf.timed("aggregation.filter_data")
+    def filter_data(...): ...
+
+    @perf.cached(st.cache_data(ttl=600), "data.load_data_neon")
+    def load_data_neon(): ...
+
+Every span feeds a rolling window per stage (p50/p95 over the last `WINDOW`
+calls, shared by all sessions of the process) and the list of spans of the
+current rerun. `cached` also counts cache hits/misses of Streamlit-cached
+functions. Set PERF_LOG=1 to emit one JSON log line per span; `?debug=1`
+shows everything in `render_debug_panel`. With MEMPROFILE=1 spans also
+record memory (see memprof.py).
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+import memprof
+
+WINDOW = 200
+
+logger = logging.getLogger("baswap.perf")
+if os.getenv("PERF_LOG") == "1" and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=WINDOW))
+_cache_counts = defaultdict(lambda: {"hit": 0, "miss": 0})
+_local = threading.local()  # per script-run thread: open spans, spans of this run
+
+
+def _state():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+        _local.run = []
+        _local.cache_frames = []
+    return _local
+
+
+def start_run() -> None:
+    """Forget the spans of the previous rerun (call once at the top of the script)."""
+    _state().run = []
+
+
+def record(name: str, seconds: float, **fields) -> None:
+    with _lock:
+        _durations[name].append(seconds)
+    state = _state()
+    state.run.append({"stage": name, "ms": seconds * 1000.0, "depth": len(state.stack)})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            json.dumps(
+                {
+                    "event": "span",
+                    "stage": name,
+                    "ms": round(seconds * 1000.0, 3),
+                    **fields,
+                }
+            )
+        )
+
+
+def record_cache(name: str, hit: bool) -> None:
+    with _lock:
+        _cache_counts[name]["hit" if hit else "miss"] += 1
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": "cache", "function": name, "hit": hit}))
+
+
+@contextmanager
+def span(name: str, **fields):
+    """Time the enclosed block as stage *name*."""
+    state = _state()
+    state.stack.append(name)
+    mem = memprof.begin(name) if memprof.enabled() else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        state.stack.pop()
+        if mem is not None:
+            m = memprof.end(mem)
+            fields = {
+                **fields,
+                "peak_bytes": m["peak_bytes"],
+                "retained_bytes": m["retained_bytes"],
+            }
+        record(name, elapsed, **fields)
+
+
+def timed(name: str | None = None):
+    """Decorator version of `span` (defaults to module.function)."""
+
+    def deco(fn):
+        stage = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                out = fn(*args, **kwargs)
+                if memprof.enabled():
+                    memprof.account_frame(out, stage)
+                return out
+
+        return wrapper
+
+    return deco
+
+
+def cached(cache_decorator, name: str | None = None):
+    """
+    Apply a Streamlit cache decorator and track its hit/miss rate and latency.
+
+    The wrapped body only runs on a miss, so it flags the current call frame;
+    nested cached calls get their own frames.
+    """
+
+    def deco(fn):
+        stage = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            frames = _state().cache_frames
+            if frames:
+                frames[-1] = True
+            return fn(*args, **kwargs)
+
+        cached_fn = cache_decorator(body)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            frames = _state().cache_frames
+            frames.append(False)
+            try:
+                with span(stage):
+                    out = cached_fn(*args, **kwargs)
+                    if memprof.enabled():
+                        memprof.account_frame(out, stage)
+                    return out
+            finally:
+                missed = frames.pop()
+                record_cache(stage, hit=not missed)
+
+        wrapper.clear = cached_fn.clear
+        return wrapper
+
+    return deco
+
+
+def stage_stats() -> dict:
+    """{stage: {'count', 'p50_ms', 'p95_ms', 'max_ms'}} over the rolling window."""
+    with _lock:
+        items = {k: np.asarray(v, dtype=float) * 1000.0 for k, v in _durations.items()}
+    return {
+        k: {
+            "count": int(v.size),
+            "p50_ms": round(float(np.percentile(v, 50)), 2),
+            "p95_ms": round(float(np.percentile(v, 95)), 2),
+            "max_ms": round(float(v.max()), 2),
+        }
+        for k, v in sorted(items.items())
+        if v.size
+    }
+
+
+def cache_stats() -> dict:
+    """{function: {'hit', 'miss', 'hit_rate'}}."""
+    with _lock:
+        counts = {k: dict(v) for k, v in _cache_counts.items()}
+    for v in counts.values():
+        total = v["hit"] + v["miss"]
+        v["hit_rate"] = round(v["hit"] / total, 3) if total else None
+    return dict(sorted(counts.items()))
+
+
+def current_run() -> list:
+    """Spans recorded in this thread since `start_run()`, in completion order."""
+    return list(_state().run)
+
+
+def reset() -> None:
+    with _lock:
+        _durations.clear()
+        _cache_counts.clear()
+
+
+def render_debug_panel() -> None:
+    """Hidden `?debug=1` panel: this rerun's spans, rolling percentiles, cache hit rates."""
+    import pandas as pd
+    import streamlit as st
+
+    with st.expander("Performance (debug)", expanded=True):
+        st.markdown("**This rerun**")
+        run = pd.DataFrame(current_run())
+        if not run.empty:
+            run["stage"] = ["  " * d + s for s, d in zip(run["stage"], run["depth"])]
+            run["ms"] = run["ms"].round(2)
+            st.dataframe(
+                run[["stage", "ms"]], hide_index=True, use_container_width=True
+            )
+
+        st.markdown(f"**Rolling stats (last {WINDOW} calls per stage)**")
+        st.dataframe(
+            pd.DataFrame.from_dict(stage_stats(), orient="index"),
+            use_container_width=True,
+        )
+
+        st.markdown("**Cache hit/miss**")
+        st.dataframe(
+            pd.DataFrame.from_dict(cache_stats(), orient="index"),
+            use_container_width=True,
+        )
+
+        if memprof.enabled():
+            memprof.render_panel()
+
+        try:
+            from models.registry import REGISTRY
+
+            st.markdown("**Models**")
+            st.dataframe(
+                pd.DataFrame.from_dict(REGISTRY.stats(), orient="index"),
+                use_container_width=True,
+            )
+        except ImportError:
+            pass
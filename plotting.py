@@ -6,8 +6,7 @@ import pandas as pd
 import numpy as np
 from typing import Optional
 
-# from models.lstm_model import make_predictions
-from models.neuroforecast_model import make_predictions
+import perf
 from config import METRIC_CONFIG
 
 COLOR_PI90 = "#fecaca"
@@ -98,6 +97,7 @@ def _coerce_naive_datetime(s: pd.Series) -> pd.Series:
     return s
 
 
+@perf.timed("plotting._inject_nans_for_gaps")
 def _inject_nans_for_gaps(
     df: pd.DataFrame,
     time_col: str,
@@ -145,6 +145,7 @@ def _inject_nans_for_gaps(
     return out
 
 
+@perf.timed("plotting.render_predictions")
 def render_predictions(
     data: pd.DataFrame, col: str, resample_freq: str, include_anchor: bool = True
 ):
@@ -208,7 +209,10 @@ def render_predictions(
     hist["unique_id"] = "Baswap station"
     nf_input = hist[["unique_id", "ds", "y"]]
 
-    # Forecast
+    # Forecast (imported here so torch/neuralforecast only load when one is drawn)
+    # from models.lstm_model import make_predictions
+    from models.neuroforecast_model import make_predictions
+
     try:
         preds = make_predictions(nf_input, resample_freq)
     except Exception:
@@ -314,22 +318,15 @@ def render_predictions(
     return line_df, bands_df
 
 
-def plot_line_chart(df: pd.DataFrame, col: str, resample_freq: str = "None") -> None:
-    # explicit empty guards to avoid "disappearing" charts
-    if df is None or df.empty or col not in df.columns or df[col].dropna().empty:
-        st.info(_t("no_data_range", "No data for this date range."))
-        return
-
-    # ----- Metric configuration -----
-    lang = st.session_state.get("lang", "vi")
-
-    cfg = METRIC_CONFIG.get(col, {})
-    lang_cfg = cfg.get(lang, {})
-
-    axis_y = lang_cfg.get("y_axis", col)
-
-    show_pred = cfg.get("prediction", False)
+@perf.timed("plotting.prepare_chart_frame")
+def prepare_chart_frame(df: pd.DataFrame, resample_freq: str):
+    """
+    Sort and round timestamps for plotting.
 
+    Returns (frame with 'Timestamp (Rounded)' columns, max gap before the line
+    breaks, display format). The frame is also the forecast input used by
+    `render_predictions`.
+    """
     df_filtered = df.copy().sort_values("ds")
     df_filtered["ds"] = _coerce_naive_datetime(df_filtered["ds"])
 
@@ -369,6 +366,28 @@ def plot_line_chart(df: pd.DataFrame, col: str, resample_freq: str = "None") ->
         df_filtered["Timestamp (Rounded)"]
     ).dt.strftime(disp_fmt)
 
+    return df_filtered, gap, disp_fmt
+
+
+@perf.timed("plotting.plot_line_chart")
+def plot_line_chart(df: pd.DataFrame, col: str, resample_freq: str = "None") -> None:
+    # explicit empty guards to avoid "disappearing" charts
+    if df is None or df.empty or col not in df.columns or df[col].dropna().empty:
+        st.info(_t("no_data_range", "No data for this date range."))
+        return
+
+    # ----- Metric configuration -----
+    lang = st.session_state.get("lang", "vi")
+
+    cfg = METRIC_CONFIG.get(col, {})
+    lang_cfg = cfg.get(lang, {})
+
+    axis_y = lang_cfg.get("y_axis", col)
+
+    show_pred = cfg.get("prediction", False)
+
+    df_filtered, gap, disp_fmt = prepare_chart_frame(df, resample_freq)
+
     cat_col = "Aggregation" if "Aggregation" in df_filtered.columns else None
 
     # break the line across long gaps
@@ -484,14 +503,16 @@ def plot_line_chart(df: pd.DataFrame, col: str, resample_freq: str = "None") ->
     st.altair_chart(main_chart, use_container_width=True)
 
 
-def display_statistics(df: pd.DataFrame, target_col: str) -> None:
+@perf.timed("plotting.display_statistics")
+def display_statistics(stats: dict) -> None:
+    """Max/min/mean/std metrics from StatsIndex.stats (sample std, ddof=1)."""
     t_max = _t("stats_max", "Maximum")
     t_min = _t("stats_min", "Minimum")
     t_avg = _t("stats_avg", "Average")
     t_std = _t("stats_std", "Std Dev")
 
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric(label=t_max, value=f"{df[target_col].max():.2f}")
-    col2.metric(label=t_min, value=f"{df[target_col].min():.2f}")
-    col3.metric(label=t_avg, value=f"{df[target_col].mean():.2f}")
-    col4.metric(label=t_std, value=f"{df[target_col].std():.2f}")
+    col1.metric(label=t_max, value=f"{stats['max']:.2f}")
+    col2.metric(label=t_min, value=f"{stats['min']:.2f}")
+    col3.metric(label=t_avg, value=f"{stats['mean']:.2f}")
+    col4.metric(label=t_std, value=f"{stats['std']:.2f}")
@@ -0,0 +1,502 @@
+"""
+Mergeable approximate quantiles (KLL sketch) for binned sensor readings.
+
+Ingestion summarizes every raw reading of a station in a 10-minute bin into
+one KLLSketch per metric (`sensor_sketches` table); the app merges the bins
+of any range or coarser bin and reads medians/percentiles from the merged
+weighted items with one vectorized pass.
+
+The sketches cover every raw reading, while `sensor_data` keeps only the last
+reading of each bin, so their quantiles estimate those of the raw readings,
+not of the stored rows.
+
+A KLL sketch keeps levels of items; an item on level h stands for 2**h
+readings. A level that outgrows its capacity is sorted and every other item
+is promoted, so a sketch holds O(k) items whatever the count and two sketches
+merge by concatenating their levels. With k=200 the rank error stays around
+1% and a bin of a few dozen readings is kept exactly.
+
+    s = KLLSketch(); s.update(values)
+    s.merge(KLLSketch.from_bytes(blob)); s.quantile([0.05, 0.5, 0.95])
+    weighted_quantile(values, weights, 0.5, groups=bin_ids)  # one median per bin
+
+Only numpy/pandas: the ingestion scripts import this module too.
+"""
+
+import struct
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_K = 200
+SKETCH_MINUTES = 10  # width of the stored bins
+
+_MAGIC = b"KLL1"
+_HEADER = struct.Struct("<4sHHqdd")  # magic, k, levels, n, min, max
+
+
+def weighted_quantile(
+    values, weights, q, groups=None, n_groups=None, presorted=False
+) -> np.ndarray:
+    """
+    Quantiles of weighted values, as np.quantile (linear) would return them
+    for the data with every value repeated `weight` times (integer weights).
+
+    `groups` (ints in [0, n_groups)) computes them per group in the same
+    pass. Returns shape (n_groups, len(q)) with groups, else (len(q),); a
+    scalar q drops the last axis. Groups without weight get NaN.
+    `presorted` skips the sort when values are already ordered by (group, value).
+    """
+    v = np.asarray(values, dtype=float)
+    w = np.asarray(weights, dtype=np.int64)
+    qs = np.atleast_1d(np.asarray(q, dtype=float))
+    if groups is None:
+        g, n_groups = np.zeros(len(v), dtype=np.int64), 1
+    else:
+        g = np.asarray(groups, dtype=np.int64)
+        if n_groups is None:
+            n_groups = int(g.max()) + 1 if len(g) else 0
+
+    if not presorted:
+        order = np.lexsort((v, g))
+        v, w, g = v[order], w[order], g[order]
+    cum = np.cumsum(w)
+    start = np.searchsorted(g, np.arange(n_groups), side="left")
+    end = np.searchsorted(g, np.arange(n_groups), side="right")
+    before = np.concatenate([[0], cum])  # weight before each item
+    offset = before[start]
+    total = before[end] - offset
+
+    # position in the expanded sorted data, then the item holding it
+    h = (np.maximum(total, 1) - 1)[:, None] * qs[None, :]
+    lo = np.floor(h).astype(np.int64)
+    frac = h - lo
+    hi = np.minimum(lo + 1, np.maximum(total, 1)[:, None] - 1)
+    last = max(len(v) - 1, 0)
+    i_lo = np.minimum(np.searchsorted(cum, offset[:, None] + lo, side="right"), last)
+    i_hi = np.minimum(np.searchsorted(cum, offset[:, None] + hi, side="right"), last)
+    if len(v):
+        out = v[i_lo] + frac * (v[i_hi] - v[i_lo])
+    else:
+        out = np.full(h.shape, np.nan)
+    out[total == 0] = np.nan
+
+    if groups is None:
+        out = out[0]
+    return out if np.ndim(q) else out[..., 0]
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch of float readings (NaN skipped). Count, min and max
+    are exact. Compaction alternates which half is kept, so rebuilding a bin
+    from the same readings gives the same bytes.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._coin = 0
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        while sum(len(lv) for lv in self.levels) > sum(
+            self._capacity(h) for h in range(len(self.levels))
+        ):
+            h = next(
+                h for h, lv in enumerate(self.levels) if len(lv) >= self._capacity(h)
+            )
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            # an odd item out stays on its level
+            keep, items = (
+                (items[:1], items[1:]) if len(items) % 2 else (items[:0], items)
+            )
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate(
+                [self.levels[h + 1], items[self._coin :: 2]]
+            )
+            self._coin ^= 1
+
+    def update(self, values) -> "KLLSketch":
+        x = np.asarray(values, dtype=float).ravel()
+        x = x[~np.isnan(x)]
+        if len(x):
+            self.n += len(x)
+            self.min = min(self.min, float(x.min()))
+            self.max = max(self.max, float(x.max()))
+            self.levels[0] = np.concatenate([self.levels[0], x])
+            self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if not other.n:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, lv in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], lv])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def items(self) -> tuple:
+        """(values, weights): the readings the sketch stands for, each `weight` times."""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [
+                np.full(len(lv), 1 << h, dtype=np.int64)
+                for h, lv in enumerate(self.levels)
+            ]
+        )
+        return values, weights
+
+    def quantile(self, q):
+        """Approximate quantile(s); q=0 and q=1 give the exact min and max."""
+        if not self.n:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        out = np.clip(weighted_quantile(*self.items(), q), self.min, self.max)
+        out = np.where(
+            np.asarray(q) <= 0, self.min, np.where(np.asarray(q) >= 1, self.max, out)
+        )
+        return out if np.ndim(q) else float(out)
+
+    def to_bytes(self) -> bytes:
+        sizes = np.array([len(lv) for lv in self.levels], dtype="<u4")
+        head = _HEADER.pack(
+            _MAGIC, self.k, len(self.levels), self.n, self.min, self.max
+        )
+        return (
+            head + sizes.tobytes() + np.concatenate(self.levels).astype("<f8").tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, blob) -> "KLLSketch":
+        blob = bytes(blob)
+        magic, k, n_levels, n, lo, hi = _HEADER.unpack_from(blob)
+        if magic != _MAGIC:
+            raise ValueError("not a KLLSketch blob")
+        sizes = np.frombuffer(blob, dtype="<u4", count=n_levels, offset=_HEADER.size)
+        items = np.frombuffer(
+            blob, dtype="<f8", offset=_HEADER.size + 4 * n_levels
+        ).astype(float)
+        sketch = cls(k)
+        sketch.levels = np.split(items, np.cumsum(sizes)[:-1])
+        sketch.n, sketch.min, sketch.max = n, lo, hi
+        return sketch
+
+
+def bin_sketches(
+    df: pd.DataFrame,
+    value_cols,
+    minutes: int = SKETCH_MINUTES,
+    time_col: str = "ds",
+    station_col: str = "station",
+    k: int = DEFAULT_K,
+) -> pd.DataFrame:
+    """
+    One row per (station, bin) of raw readings: ds (bin start, tz kept), station,
+    n (readings) and the serialized sketch of every value column (None if empty).
+    """
+    cols = [time_col, station_col, "n", *value_cols]
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+    d = df.assign(**{time_col: pd.to_datetime(df[time_col]).dt.floor(f"{minutes}min")})
+    rows = []
+    for (ds, station), g in d.groupby(
+        [time_col, station_col], sort=True, observed=True
+    ):
+        row = {time_col: ds, station_col: station, "n": len(g)}
+        for col in value_cols:
+            sketch = KLLSketch(k).update(
+                pd.to_numeric(g[col], errors="coerce").to_numpy(dtype=float)
+            )
+            row[col] = sketch.to_bytes() if sketch.n else None
+        rows.append(row)
+    return pd.DataFrame(rows, columns=cols)
+
+
+class SketchSeries:
+    """
+    One station's binned sketches of one metric, merged on demand: the items
+    of all sketches, ordered by (bin, value), with their weights. A merge is
+    the union of items; quantiles are read from it without re-compacting.
+    """
+
+    def __init__(
+        self,
+        bins: np.ndarray,
+        values: np.ndarray,
+        weights: np.ndarray,
+        minutes: int = SKETCH_MINUTES,
+    ):
+        self.bins = bins  # wall-clock ns of each item's bin start
+        self.values = values
+        self.weights = weights
+        self.width = minutes * 60 * 10**9
+        self._by_width = {self.width: (values, weights)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _items(self, start_ns: int, end_ns: int) -> slice:
+        lo = np.searchsorted(self.bins, start_ns, side="left")
+        hi = np.searchsorted(self.bins, end_ns, side="left")
+        return slice(int(lo), int(hi))
+
+    def _ordered(self, width: int) -> tuple:
+        """
+        (values, weights) ordered by (width bin, value). A range of whole
+        width bins holds the same items at the same positions in either order.
+        """
+        if width not in self._by_width:
+            order = np.lexsort((self.values, self.bins // width))
+            self._by_width[width] = (self.values[order], self.weights[order])
+        return self._by_width[width]
+
+    def range_quantiles(self, start_ns: int, end_ns: int, q) -> np.ndarray:
+        """Quantile(s) of the readings with start <= bin start < end."""
+        sl = self._items(start_ns, end_ns)
+        return weighted_quantile(self.values[sl], self.weights[sl], q)
+
+    def bin_quantiles(
+        self, freq: str, start_ns: int, end_ns: int, q: float
+    ) -> pd.DataFrame:
+        """
+        Quantile q of every `freq` bin (a multiple of the sketch bins, wall
+        clock) from the one holding start to the one holding end - 1: columns
+        ds (bin start) and value, NaN for bins without readings.
+        """
+        width = pd.tseries.frequencies.to_offset(freq).nanos
+        if width % self.width:
+            raise ValueError(
+                f"{freq} bins do not align with "
+                f"{self.width // 60 // 10**9}-minute sketches"
+            )
+        first, last = start_ns // width, (end_ns - 1) // width
+        sl = self._items(first * width, (last + 1) * width)
+        values, weights = self._ordered(width)
+        values = weighted_quantile(
+            values[sl],
+            weights[sl],
+            q,
+            groups=self.bins[sl] // width - first,
+            n_groups=int(last - first + 1),
+            presorted=True,
+        )
+        ds = (np.arange(first, last + 1, dtype=np.int64) * width).view("datetime64[ns]")
+        return pd.DataFrame({"ds": ds, "value": values})
+
+
+class StoredSketches:
+    """
+    Decoded stored sketches of one metric, kept across reloads. update()
+    decodes only the bins that are new or whose reading count changed and
+    drops the ones no longer listed, so a new ingest costs the new bins only.
+    """
+
+    def __init__(self, value_col: str):
+        self.value_col = value_col
+        self.watermark = None  # of the stored table when last updated
+        self.lock = threading.Lock()
+        self._bins = {}  # (station, ds ns UTC) -> (n, values, weights)
+
+    def __len__(self):
+        return len(self._bins)
+
+    @classmethod
+    def from_frame(
+        cls,
+        stored: pd.DataFrame,
+        value_col: str,
+        time_col: str = "ds",
+        station_col: str = "station",
+    ):
+        """All sketches of a frame (columns ds, station, <value_col> as bytes)."""
+        out = cls(value_col)
+        out.update(
+            stored.assign(n=0)[[time_col, station_col, "n"]],
+            stored,
+            time_col=time_col,
+            station_col=station_col,
+        )
+        return out
+
+    @staticmethod
+    def _keys(df: pd.DataFrame, time_col: str, station_col: str) -> list:
+        ds = (
+            pd.to_datetime(df[time_col], utc=True)
+            .to_numpy(dtype="datetime64[ns]")
+            .view("int64")
+        )
+        return list(zip(df[station_col].astype(str), ds.tolist()))
+
+    def stale(
+        self, bins: pd.DataFrame, time_col: str = "ds", station_col: str = "station"
+    ) -> pd.DataFrame:
+        """Rows of `bins` (ds, station, n) whose sketch is not decoded yet or has changed."""
+        keys = self._keys(bins, time_col, station_col)
+        fresh = [
+            key in self._bins and self._bins[key][0] == n
+            for key, n in zip(keys, bins["n"].tolist())
+        ]
+        return bins[~np.array(fresh, dtype=bool)]
+
+    def update(
+        self,
+        bins: pd.DataFrame,
+        blobs: pd.DataFrame | None = None,
+        watermark=None,
+        time_col: str = "ds",
+        station_col: str = "station",
+    ) -> None:
+        """
+        Keep the listed `bins` (ds, station, n) only; of `blobs` (ds, station,
+        <value_col> bytes), decode those listed and not decoded at that count.
+        """
+        listed = dict(zip(self._keys(bins, time_col, station_col), bins["n"].tolist()))
+        kept = {
+            key: item for key, item in self._bins.items() if listed.get(key) == item[0]
+        }
+        if blobs is not None:
+            blobs = blobs[blobs[self.value_col].notna()]
+            for key, blob in zip(
+                self._keys(blobs, time_col, station_col), blobs[self.value_col]
+            ):
+                if key in listed and key not in kept:
+                    kept[key] = (listed[key], *KLLSketch.from_bytes(blob).items())
+        self._bins = kept
+        self.watermark = watermark
+
+    def items(self) -> tuple:
+        """(stations, bin starts [UTC ns], items per bin, values, weights) of every decoded bin."""
+        bins = self._bins
+        if not bins:
+            empty = np.array([], dtype=np.int64)
+            return np.array([], dtype=object), empty, empty, np.array([]), empty
+        stations, ds = (np.array(x) for x in zip(*bins))
+        entries = list(bins.values())
+        sizes = np.array([len(v) for _, v, _ in entries], dtype=np.int64)
+        values = np.concatenate([v for _, v, _ in entries])
+        weights = np.concatenate([w for _, _, w in entries])
+        return stations, ds.astype(np.int64), sizes, values, weights
+
+
+class SketchIndex:
+    """
+    SketchSeries per station of one metric column: stored sketches (all raw
+    readings of a bin) where a bin has one, else the frame's own readings of
+    that bin (weight 1).
+    `stored` is a StoredSketches or a frame of sketches (ds, station, bytes).
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        value_col: str,
+        stored: "StoredSketches | pd.DataFrame | None" = None,
+        time_col: str = "ds",
+        station_col: str = "station",
+        minutes: int = SKETCH_MINUTES,
+    ):
+        width = minutes * 60 * 10**9
+        parts = []
+
+        stored_keys = None
+        if isinstance(stored, pd.DataFrame):
+            stored = (
+                StoredSketches.from_frame(stored, value_col, time_col, station_col)
+                if value_col in stored.columns
+                else None
+            )
+        if stored is not None and len(stored):
+            stations, s_ds, sizes, values, weights = stored.items()
+            s_ds = pd.Series(pd.to_datetime(s_ds, utc=True))
+            frame_tz = getattr(
+                pd.to_datetime(df[time_col], errors="coerce").dt, "tz", None
+            )
+            # same wall clock as the frame (a naive frame is taken as UTC)
+            s_ds = (
+                s_ds.dt.tz_convert(frame_tz)
+                if frame_tz is not None
+                else s_ds.dt.tz_localize(None)
+            )
+            bins = _wall_ns(s_ds) // width * width
+            stored_keys = pd.MultiIndex.from_arrays([stations, bins])
+            parts.append(
+                pd.DataFrame(
+                    {
+                        "station": np.repeat(stations, sizes),
+                        "bin": np.repeat(bins, sizes),
+                        "v": values,
+                        "w": weights,
+                    }
+                )
+            )
+
+        ts = _wall_ns(df[time_col])
+        frame = pd.DataFrame(
+            {
+                "station": df[station_col].astype(str).to_numpy(),
+                "bin": ts // width * width,
+                "v": pd.to_numeric(df[value_col], errors="coerce").to_numpy(
+                    dtype=float
+                ),
+                "w": 1,
+            }
+        )
+        frame = frame[~np.isnan(frame["v"].to_numpy()) & (ts != np.iinfo(np.int64).min)]
+        if stored_keys is not None:
+            frame = frame[
+                ~pd.MultiIndex.from_arrays([frame["station"], frame["bin"]]).isin(
+                    stored_keys
+                )
+            ]
+        parts.append(frame)
+
+        items = pd.concat(parts, ignore_index=True).sort_values(
+            ["station", "bin", "v"], kind="stable"
+        )
+        self.value_col = value_col
+        self.series = {
+            station: SketchSeries(
+                g["bin"].to_numpy(dtype=np.int64),
+                g["v"].to_numpy(dtype=float),
+                g["w"].to_numpy(dtype=np.int64),
+                minutes,
+            )
+            for station, g in items.groupby("station", sort=False)
+        }
+
+    def quantiles(self, station: str, date_from, date_to, q=(0.05, 0.5, 0.95)) -> dict:
+        """{q: value} of `station` over the dates [date_from, date_to] (inclusive)."""
+        series = self.series.get(station)
+        qs = tuple(np.atleast_1d(q))
+        if series is None or date_from is None or date_to is None:
+            return {x: np.nan for x in qs}
+        if date_from > date_to:
+            date_from, date_to = date_to, date_from
+        start = pd.Timestamp(date_from).value
+        end = (pd.Timestamp(date_to) + pd.Timedelta(days=1)).value
+        return dict(zip(qs, series.range_quantiles(start, end, qs).tolist()))
+
+
+def _wall_ns(ds: pd.Series) -> np.ndarray:
+    """Wall-clock ns of a datetime column (tz dropped, as filter_data does); NaT is int64 min."""
+    ts = pd.to_datetime(ds, errors="coerce")
+    if getattr(ts.dt, "tz", None) is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts.to_numpy(dtype="datetime64[ns]").view("int64")
@@ -1,4 +1,10 @@
 # Station definitions and data handling
+import functools
+import re
+import unicodedata
+
+import numpy as np
+
 OTHER_STATIONS = [
     {"name": "An Thuận", "lon": 106.6050222, "lat": 9.976388889},
     {"name": "Trà Kha", "lon": 106.2498341, "lat": 9.623059755},
@@ -44,6 +50,9 @@ OTHER_STATIONS = [
     {"name": "Tám Ngàn", "lon": 104.8420667, "lat": 10.32105},
 ]
 
+# Station selected on first load
+DEFAULT_STATION = "Vĩnh Long"
+
 # BASWAP coordinates
 BASWAP_LATLON = (10.099833, 106.208306)
 
@@ -53,6 +62,37 @@ BASWAP_STATIONS = [
     # {"name":"VGU","lon":106.613894203,"lat":11.108438972}
 ]
 
+# ThingSpeak channel per BASWAP buoy. `station` is the code stored in Neon
+# (norm_name_capitalize of the display name), `url_env` names the secret/env var
+# holding the channel's JSON feed URL (channels without one are skipped), and
+# `fields` maps our columns to ThingSpeak fields (`ec_mgl` is converted to ec_gl).
+DEFAULT_FIELDS = {"ec_us_cm": "field1", "temperature": "field2", "ec_mgl": "field3"}
+
+THINGSPEAK_CHANNELS = [
+    {
+        "station": "VinhLong",
+        "name": "Vĩnh Long",
+        "url_env": "THINGSPEAK_URL",
+        "fields": DEFAULT_FIELDS,
+    },
+    {
+        "station": "CanGio",
+        "name": "Cần Giờ",
+        "url_env": "THINGSPEAK_URL_CANGIO",
+        "fields": DEFAULT_FIELDS,
+    },
+]
+
+
+def configured_channels(get_url) -> list:
+    """Channels whose feed URL is set; `get_url(env_name)` resolves it (os.getenv, get_secret)."""
+    out = []
+    for ch in THINGSPEAK_CHANNELS:
+        url = get_url(ch["url_env"])
+        if url:
+            out.append({**ch, "url": url})
+    return out
+
 
 def get_station_lookup(texts: dict):
     """
@@ -87,27 +127,126 @@ def get_station_lookup(texts: dict):
     return station_lookup
 
 
+# ---------- spatial index ----------
+EARTH_RADIUS_KM = 6371.0088
+
+
+class StationIndex:
+    """
+    Ball tree (haversine) over station coordinates.
+
+    All queries take scalars or arrays of lat/lon in degrees; distances are km.
+    """
+
+    def __init__(self, station_lookup: dict):
+        from sklearn.neighbors import BallTree
+
+        self.names = np.array(list(station_lookup), dtype=object)
+        self.latlon = np.array(list(station_lookup.values()), dtype=float).reshape(
+            -1, 2
+        )
+        self._tree = BallTree(np.radians(self.latlon), metric="haversine")
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _points(lat, lon):
+        return np.radians(np.column_stack([np.ravel(lat), np.ravel(lon)]).astype(float))
+
+    def nearest(self, lat, lon, max_km=None):
+        """
+        (names, distances_km) of the station nearest to each point; names are
+        None where the nearest one is farther than max_km.
+        """
+        dist, idx = self._tree.query(self._points(lat, lon), k=1)
+        dist_km = dist[:, 0] * EARTH_RADIUS_KM
+        names = self.names[idx[:, 0]]
+        if max_km is not None:
+            names = np.where(dist_km <= max_km, names, None)
+        return names, dist_km
+
+    def within_radius(self, lat, lon, radius_km, sort=True) -> list:
+        """For each point, the names of stations within radius_km (nearest first)."""
+        idx, dist = self._tree.query_radius(
+            self._points(lat, lon),
+            r=radius_km / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=sort,
+        )
+        return [list(self.names[i]) for i in idx]
+
+    def within_bbox(self, south, west, north, east) -> np.ndarray:
+        """Names of stations inside the box (e.g. the map viewport)."""
+        lat, lon = self.latlon[:, 0], self.latlon[:, 1]
+        mask = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return self.names[mask]
+
+
+@functools.lru_cache(maxsize=1)
+def station_index() -> StationIndex:
+    """StationIndex over OTHER_STATIONS + BASWAP_STATIONS, built once per process."""
+    return StationIndex(get_station_lookup({}))
+
+
+# ---------- station names ----------
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+@functools.lru_cache(maxsize=4096)
 def norm_name(name: str) -> str:
     """Normalize station name for comparison"""
-    import unicodedata, re
-
     name = name.replace("Đ", "D").replace("đ", "d")
     s = unicodedata.normalize("NFKD", str(name or ""))
     s = "".join(c for c in s if unicodedata.category(c) != "Mn")  # strip accents
-    s = re.sub(r"[\W_]+", "", s)  # remove spaces/punct
+    s = _NON_WORD.sub("", s)  # remove spaces/punct
     return s.lower()
 
 
+@functools.lru_cache(maxsize=4096)
 def norm_name_capitalize(name: str) -> str:
     """Normalize station name for comparison, keeping capitalization"""
-    import unicodedata, re
-
     s = unicodedata.normalize("NFKD", str(name or ""))
     s = "".join(c for c in s if unicodedata.category(c) != "Mn")  # strip accents
-    s = re.sub(r"[\W_]+", "", s)  # remove spaces/punct
+    s = _NON_WORD.sub("", s)  # remove spaces/punct
     return s  # keep original capitalization
 
 
+class StationNames:
+    """
+    Display name <-> DB code (norm_name_capitalize) <-> comparison key
+    (norm_name), precomputed once for the configured stations. Names outside
+    the registry fall back to the (cached) normalizers.
+    """
+
+    def __init__(self, names):
+        self.display = list(dict.fromkeys(names))
+        self.code = {n: norm_name_capitalize(n) for n in self.display}
+        self.key = {n: norm_name(n) for n in self.display}
+        self.by_code = {c: n for n, c in self.code.items()}
+        self.by_key = {k: n for n, k in self.key.items()}
+        self.codes = list(dict.fromkeys(self.code.values()))
+
+    def code_of(self, name: str) -> str:
+        """DB code for a display name (or anything norm_name_capitalize accepts)."""
+        code = self.code.get(name)
+        return code if code is not None else norm_name_capitalize(name)
+
+    def key_of(self, name: str) -> str:
+        """Comparison key for a display name or DB code."""
+        key = self.key.get(name)
+        return key if key is not None else norm_name(name)
+
+    def display_of(self, name: str) -> str:
+        """Display name for a DB code or display name; unknown names are returned as is."""
+        if name in self.code:
+            return name
+        return self.by_code.get(name) or self.by_key.get(norm_name(name), name)
+
+
+STATION_NAMES = StationNames(s["name"] for s in BASWAP_STATIONS + OTHER_STATIONS)
+
+
 def norm_col(col: str) -> str:
     """Normalize column name for comparison"""
     import re
@@ -120,13 +259,14 @@ def resolve_cols(df_cols):
     norm_map = {norm_col(c): c for c in df_cols}
     stn_candidates = ["station_name", "station", "name"]
     time_candidates = ["measdate", "datetime", "timestamp", "time", "date", "ds"]
+    # matches EC(g/l) or EC[g/l]
     ec_candidates = [
         "EC Value (g/l)",
         "EC[g/l]",
         "ec_gl",
         "ec_us_cm",
         "ec_mgl",
-    ]  # matches EC(g/l) or EC[g/l]
+    ]
 
     def pick(cands):
         for k in cands:
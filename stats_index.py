@@ -0,0 +1,332 @@
+"""
+Range statistics without filtering the frame.
+
+Per station and metric, readings are sorted by time and summarized once:
+prefix sums of value, value² and count give sum/mean/std of any time range
+in O(1); min/max (with the position of the extreme reading) come from an
+appendable segment tree in O(log n). A range is resolved with two binary
+searches on the timestamps. New readings can be appended without a rebuild.
+
+    idx = stats_index(df, "ec_gl")
+    idx.stats("VinhLong", date_from, date_to)  # {"max", "min", "mean", "std", "count"}
+
+Medians and percentiles come from sketch_index() (quantile_sketch.SketchIndex),
+the time-in-level summary from level_index() (warning_levels.LevelIndex).
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import perf
+from quantile_sketch import SketchIndex, StoredSketches
+from warning_levels import LevelIndex
+
+
+def _pow2(n: int) -> int:
+    return 1 << max(n - 1, 0).bit_length()
+
+
+class ExtremeTree:
+    """
+    Appendable segment tree of min or max that also returns the position of
+    the extreme (the first one on ties). NaN readings are never the extreme.
+
+    extend() is amortized O(m + log n) for m new values (capacity doubles);
+    query() is O(log n); query_many() answers many [lo, hi) ranges at once.
+    """
+
+    def __init__(self, values=(), kind: str = "min", capacity: int = 16):
+        self.kind = kind
+        self._fill = np.inf if kind == "min" else -np.inf
+        self._better = np.less if kind == "min" else np.greater
+        self.n = 0
+        self._alloc(_pow2(max(capacity, len(values), 1)))
+        self.extend(values)
+
+    def __len__(self):
+        return self.n
+
+    def _alloc(self, size: int) -> None:
+        old = self.vals[: self.n] if self.n else np.empty(0)
+        self.size = size
+        # vals[size] is the sentinel the empty nodes point at
+        self.vals = np.full(size + 1, self._fill)
+        self.vals[: self.n] = old
+        self.tree = np.full(2 * size, size, dtype=np.int64)
+        self.tree[size : size + self.n] = np.arange(self.n)
+        self._rebuild(0, self.n)
+
+    def _pick(self, a, b):
+        va, vb = self.vals[a], self.vals[b]
+        return np.where(self._better(vb, va) | ((vb == va) & (b < a)), b, a)
+
+    def _rebuild(self, lo: int, hi: int) -> None:
+        """Recompute the ancestors of leaves [lo, hi)."""
+        lo, hi = (lo + self.size) >> 1, (hi - 1 + self.size) >> 1
+        while lo >= 1 and hi >= lo:
+            p = np.arange(lo, hi + 1)
+            self.tree[p] = self._pick(self.tree[2 * p], self.tree[2 * p + 1])
+            lo, hi = lo >> 1, hi >> 1
+
+    def extend(self, values) -> None:
+        x = np.asarray(values, dtype=float)
+        if not len(x):
+            return
+        if self.n + len(x) > self.size:
+            self._alloc(_pow2(self.n + len(x)))
+        lo, hi = self.n, self.n + len(x)
+        self.vals[lo:hi] = np.where(np.isnan(x), self._fill, x)
+        self.tree[self.size + lo : self.size + hi] = np.arange(lo, hi)
+        self.n = hi
+        self._rebuild(lo, hi)
+
+    def query_many(self, lo, hi) -> tuple:
+        """(values, positions) of the extreme in each [lo, hi); NaN/-1 if none."""
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        best = np.full(lo.shape, self.size, dtype=np.int64)
+        l, r = lo + self.size, hi + self.size
+        top = 2 * self.size - 1
+        while True:
+            active = l < r
+            if not active.any():
+                break
+            take = active & (l & 1 == 1)
+            best = np.where(take, self._pick(best, self.tree[np.minimum(l, top)]), best)
+            l = l + take
+            take = active & (r & 1 == 1)
+            r = r - take
+            best = np.where(take, self._pick(best, self.tree[np.minimum(r, top)]), best)
+            l, r = l >> 1, r >> 1
+        values = self.vals[best]
+        empty = np.isinf(values)
+        return np.where(empty, np.nan, values), np.where(empty, -1, best)
+
+    def query(self, lo: int, hi: int) -> tuple:
+        values, pos = self.query_many([lo], [hi])
+        return float(values[0]), int(pos[0])
+
+
+class _Buffer:
+    """Growable 1-d array (capacity doubles on append)."""
+
+    def __init__(self, data, dtype):
+        data = np.asarray(data, dtype=dtype)
+        self._a = np.empty(_pow2(max(len(data), 16)), dtype=dtype)
+        self._a[: len(data)] = data
+        self.n = len(data)
+
+    def extend(self, data) -> None:
+        data = np.asarray(data, dtype=self._a.dtype)
+        if self.n + len(data) > len(self._a):
+            grown = np.empty(_pow2(self.n + len(data)), dtype=self._a.dtype)
+            grown[: self.n] = self._a[: self.n]
+            self._a = grown
+        self._a[self.n : self.n + len(data)] = data
+        self.n += len(data)
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._a[: self.n]
+
+
+class SeriesStats:
+    """One station's readings of one metric, indexed for range queries."""
+
+    def __init__(self, times: np.ndarray, values: np.ndarray):
+        valid = ~np.isnan(values)
+        # shift by the mean so the sum of squares does not cancel catastrophically
+        self.shift = float(values[valid].mean()) if valid.any() else 0.0
+        self._times = _Buffer(times, np.int64)
+        self._csum = _Buffer([0.0], float)
+        self._csq = _Buffer([0.0], float)
+        self._ccount = _Buffer([0], np.int64)
+        self.mins = ExtremeTree(kind="min", capacity=len(values))
+        self.maxs = ExtremeTree(kind="max", capacity=len(values))
+        self._add(values)
+
+    def __len__(self):
+        return self._times.n
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times.view
+
+    def _add(self, values: np.ndarray) -> None:
+        valid = ~np.isnan(values)
+        x = np.where(valid, values - self.shift, 0.0)
+        self._csum.extend(self._csum.view[-1] + np.cumsum(x))
+        self._csq.extend(self._csq.view[-1] + np.cumsum(x * x))
+        self._ccount.extend(self._ccount.view[-1] + np.cumsum(valid))
+        self.mins.extend(values)
+        self.maxs.extend(values)
+
+    def append(self, times: np.ndarray, values: np.ndarray) -> None:
+        """Add readings newer than the last indexed one (amortized O(m + log n))."""
+        times = np.asarray(times, dtype=np.int64)
+        if len(times) and len(self) and times[0] < self.times[-1]:
+            raise ValueError(
+                "SeriesStats.append expects readings in time order after the last one"
+            )
+        self._times.extend(times)
+        self._add(np.asarray(values, dtype=float))
+
+    def positions(self, start_ns, end_ns):
+        """Row range [i, j) of readings with start <= t < end (scalars or arrays)."""
+        return (
+            np.searchsorted(self.times, start_ns, side="left"),
+            np.searchsorted(self.times, end_ns, side="left"),
+        )
+
+    def range_stats(self, i: int, j: int, ddof: int = 1) -> dict:
+        i, j = int(i), int(j)
+        csum, csq, ccount = self._csum.view, self._csq.view, self._ccount.view
+        n = int(ccount[j] - ccount[i])
+        if n == 0:
+            return {
+                "max": np.nan,
+                "min": np.nan,
+                "mean": np.nan,
+                "std": np.nan,
+                "count": 0,
+            }
+        s = csum[j] - csum[i]
+        ss = csq[j] - csq[i]
+        mean = s / n
+        var = max(ss - s * mean, 0.0) / (n - ddof) if n > ddof else np.nan
+        return {
+            "max": self.maxs.query(i, j)[0],
+            "min": self.mins.query(i, j)[0],
+            "mean": float(mean + self.shift),
+            "std": float(np.sqrt(var)),
+            "count": n,
+        }
+
+
+class StatsIndex:
+    """SeriesStats per station of one metric column."""
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        value_col: str,
+        time_col: str = "ds",
+        station_col: str = "station",
+    ):
+        ts = pd.to_datetime(df[time_col], errors="coerce")
+        # same wall-clock semantics as filter_data: tz dropped, dates compared locally
+        if getattr(ts.dt, "tz", None) is not None:
+            ts = ts.dt.tz_localize(None)
+        d = pd.DataFrame(
+            {
+                "station": df[station_col].to_numpy(),
+                "t": ts.to_numpy(dtype="datetime64[ns]").view("int64"),
+                "v": pd.to_numeric(df[value_col], errors="coerce").to_numpy(
+                    dtype=float
+                ),
+            }
+        )
+        d = d[ts.notna().to_numpy()].sort_values(["station", "t"], kind="stable")
+        self.value_col = value_col
+        self.series = {
+            station: SeriesStats(g["t"].to_numpy(), g["v"].to_numpy())
+            for station, g in d.groupby("station", sort=False)
+        }
+
+    def stats(self, station: str, date_from, date_to, ddof: int = 1) -> dict:
+        """max/min/mean/std/count of `station` over the dates [date_from, date_to]."""
+        series = self.series.get(station)
+        if series is None or date_from is None or date_to is None:
+            return SeriesStats(np.array([], dtype="int64"), np.array([])).range_stats(
+                0, 0
+            )
+        if date_from > date_to:
+            date_from, date_to = date_to, date_from
+        start = pd.Timestamp(date_from).value
+        end = (pd.Timestamp(date_to) + pd.Timedelta(days=1)).value
+        return series.range_stats(*series.positions(start, end), ddof=ddof)
+
+
+def fingerprint(df: pd.DataFrame, value_col: str) -> tuple:
+    """Cheap identity of a dataset (cache key): size, time span and value sum."""
+    if df.empty:
+        return (0, value_col)
+    return (
+        len(df),
+        str(df["ds"].iloc[0]),
+        str(df["ds"].iloc[-1]),
+        float(
+            np.nansum(
+                pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=float)
+            )
+        ),
+        value_col,
+    )
+
+
+@perf.cached(st.cache_resource(max_entries=8), "stats_index.build")
+def _build(key: tuple, value_col: str, _df: pd.DataFrame) -> StatsIndex:
+    return StatsIndex(_df, value_col)
+
+
+def stats_index(df: pd.DataFrame, value_col: str) -> StatsIndex:
+    """StatsIndex of df[value_col], built once per dataset, shared by sessions."""
+    return _build(fingerprint(df, value_col), value_col, _df=df)
+
+
+@perf.cached(st.cache_resource(max_entries=8), "stats_index.build_levels")
+def _build_levels(key: tuple, value_col: str, _df: pd.DataFrame) -> LevelIndex:
+    return LevelIndex(_df, value_col)
+
+
+def level_index(df: pd.DataFrame, value_col: str = "ec_gl") -> LevelIndex:
+    """LevelIndex of df[value_col], built once per dataset, shared by sessions."""
+    return _build_levels(fingerprint(df, value_col), value_col, _df=df)
+
+
+@st.cache_resource(show_spinner=False)
+def _stored_sketches(value_col: str) -> StoredSketches:
+    return StoredSketches(value_col)
+
+
+def stored_sketches(value_col: str) -> StoredSketches:
+    """
+    The decoded stored sketches of `value_col`, shared across sessions. When
+    the table's watermark moves, only the bins that are new or changed since
+    are read and decoded; bins that left the window are dropped.
+    """
+    from data import load_sketch_bins, load_sketches_neon, sketch_watermark
+
+    stored = _stored_sketches(value_col)
+    watermark = sketch_watermark(value_col)
+    with stored.lock:
+        if stored.watermark != watermark:
+            with perf.span("stats_index.update_sketches"):
+                bins = load_sketch_bins(value_col)
+                stale = stored.stale(bins)
+                blobs = (
+                    load_sketches_neon(value_col, since=stale["ds"].min())
+                    if len(stale)
+                    else None
+                )
+                stored.update(bins, blobs, watermark=watermark)
+    return stored
+
+
+@perf.cached(st.cache_resource(max_entries=8), "stats_index.build_sketches")
+def _build_sketches(
+    key: tuple, value_col: str, _df: pd.DataFrame, _stored: StoredSketches
+) -> SketchIndex:
+    return SketchIndex(_df, value_col, stored=_stored)
+
+
+def sketch_index(df: pd.DataFrame, value_col: str) -> SketchIndex:
+    """SketchIndex of df[value_col] and its stored sketches (rebuilt on change)."""
+    stored = stored_sketches(value_col)
+    return _build_sketches(
+        fingerprint(df, value_col) + (stored.watermark,),
+        value_col,
+        _df=df,
+        _stored=stored,
+    )
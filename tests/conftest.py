@@ -0,0 +1,15 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# the ingestion scripts read these at import time
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/baswap_test")
+os.environ.setdefault(
+    "THINGSPEAK_URL", "https://api.thingspeak.com/channels/0/feeds.json"
+)
+
+for path in (ROOT, ROOT / "github_actions"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
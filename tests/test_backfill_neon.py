@@ -0,0 +1,133 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import backfill_neon  # noqa: E402
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+END = datetime(2026, 1, 1, 6, tzinfo=timezone.utc)
+# 0.8 * 8000 entries at 6000 an hour: one-hour windows
+WINDOWS = backfill_neon.plan_windows(START, END, 6000, 10)
+
+
+class FakeConn:
+    def __init__(self):
+        self.commits = 0
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def close(self):
+        pass
+
+
+def entry(ts: datetime, entry_id: int) -> dict:
+    return {
+        "created_at": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "entry_id": entry_id,
+        "field1": "1500",
+        "field2": "28.5",
+        "field3": "750",
+    }
+
+
+@pytest.fixture
+def backfill(monkeypatch, tmp_path):
+    """main() against stubbed ThingSpeak and Postgres; returns (run, calls, conn)."""
+    calls = {"fetched": [], "connects": 0, "rows": 0, "sketched": 0}
+    conn = FakeConn()
+
+    def fetch(results, start, end, session, url):
+        calls["fetched"].append(start)
+        return [entry(start, int(start.timestamp()))]
+
+    def connect(url):
+        calls["connects"] += 1
+        return conn
+
+    def upsert(conn, df, table_name, commit):
+        calls["rows"] += len(df)
+        return len(df)
+
+    def sketches(cur, feeds, station, sample_minutes, fields):
+        calls["sketched"] += len(feeds)
+        return len(feeds)
+
+    monkeypatch.setattr(backfill_neon, "fetch_thingspeak_data", fetch)
+    monkeypatch.setattr(backfill_neon.psycopg2, "connect", connect)
+    monkeypatch.setattr(backfill_neon, "ensure_partitions", lambda conn, since: [])
+    monkeypatch.setattr(backfill_neon, "upsert_df_to_postgres", upsert)
+    monkeypatch.setattr(backfill_neon, "update_latest_readings", lambda cur, df: 0)
+    monkeypatch.setattr(backfill_neon, "upsert_feed_sketches", sketches)
+    monkeypatch.setattr(
+        backfill_neon.thingspeak_client, "make_session", lambda **kw: FakeSession()
+    )
+    checkpoint = tmp_path / "checkpoint.json"
+
+    def run(*extra):
+        monkeypatch.setattr(
+            "sys.argv",
+            [
+                "backfill_neon.py",
+                f"--start={START.isoformat()}",
+                f"--end={END.isoformat()}",
+                "--entries-per-hour=6000",
+                "--rate=1000",
+                f"--checkpoint={checkpoint}",
+                *extra,
+            ],
+        )
+        backfill_neon.main()
+        if not checkpoint.exists():
+            return set()
+        return set(json.loads(checkpoint.read_text())["done"])
+
+    return run, calls, conn
+
+
+def test_main_checkpoints_every_window(backfill):
+    run, calls, conn = backfill
+    done = run()
+
+    station = backfill_neon.CHANNELS[0]["station"]
+    assert len(WINDOWS) == 6
+    assert done == {backfill_neon.window_key(w, station) for w in WINDOWS}
+    assert sorted(calls["fetched"]) == [start for start, _ in WINDOWS]
+    assert calls["rows"] == calls["sketched"] == len(WINDOWS)
+    assert conn.commits == len(WINDOWS) and conn.closed
+
+    # a rerun finds every window checkpointed and connects to nothing
+    assert run() == done
+    assert len(calls["fetched"]) == len(WINDOWS) and calls["connects"] == 1
+
+
+def test_main_resumes_from_checkpoint(backfill, tmp_path):
+    run, calls, _ = backfill
+    station = backfill_neon.CHANNELS[0]["station"]
+    first = WINDOWS[:3]
+    backfill_neon.save_checkpoint(
+        tmp_path / "checkpoint.json",
+        {backfill_neon.window_key(w, station) for w in first},
+    )
+
+    done = run()
+    assert len(done) == len(WINDOWS)
+    assert sorted(calls["fetched"]) == [start for start, _ in WINDOWS[3:]]
@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import ingest_daemon  # noqa: E402
+
+UTC = timezone.utc
+
+
+class FakeConn:
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class Clock(datetime):
+    """datetime whose now() is set by the test."""
+
+    current = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def entry(ts: datetime, entry_id: int) -> dict:
+    return {
+        "created_at": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "entry_id": entry_id,
+        "field1": "1500",
+        "field2": "28.5",
+        "field3": "750",
+    }
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    """An Ingestor with stubbed writes; returns it and the ensure_partitions calls."""
+    ensured = []
+    cursor_ds = datetime(2026, 1, 31, 23, 40, tzinfo=UTC)
+    monkeypatch.setattr(Clock, "current", datetime(2026, 1, 31, 23, 50, tzinfo=UTC))
+    monkeypatch.setattr(ingest_daemon, "datetime", Clock)
+    monkeypatch.setattr(
+        ingest_daemon,
+        "ensure_partitions",
+        lambda conn, since=None: ensured.append(since) or [],
+    )
+    monkeypatch.setattr(ingest_daemon, "load_cursor", lambda conn, st: (7, cursor_ds))
+    monkeypatch.setattr(ingest_daemon, "save_cursor", lambda *a: None)
+    monkeypatch.setattr(ingest_daemon, "upsert_df_to_postgres", lambda *a, **kw: 0)
+    monkeypatch.setattr(ingest_daemon, "update_latest_readings", lambda *a: 0)
+    monkeypatch.setattr(ingest_daemon, "upsert_feed_sketches", lambda *a, **kw: 0)
+    monkeypatch.setattr(
+        ingest_daemon.thingspeak_client, "make_session", lambda **kw: None
+    )
+    channels = ingest_daemon.CHANNELS[:1]
+    ingestor = ingest_daemon.Ingestor(FakeConn(), ingest_daemon.Metrics(), channels)
+    return ingestor, ensured
+
+
+def flush(ingestor, *entries):
+    ingestor.buffers[ingestor.channels[0]["station"]] = list(entries)
+    ingestor.flush()
+
+
+def test_partitions_are_ensured_at_startup_and_each_new_month(daemon):
+    ingestor, ensured = daemon
+    # at startup, from the oldest cursor on
+    assert ensured == [datetime(2026, 1, 31, 23, 40, tzinfo=UTC)]
+
+    flush(ingestor, entry(datetime(2026, 1, 31, 23, 45), 8))
+    assert len(ensured) == 1  # same month: nothing to create
+
+    # the first flush of February creates its partitions, from the batch on
+    Clock.current = datetime(2026, 2, 1, 0, 5, tzinfo=UTC)
+    flush(ingestor, entry(datetime(2026, 1, 31, 23, 55), 9))
+    assert ensured[1:] == [datetime(2026, 1, 31, 23, 50, tzinfo=UTC)]
+
+    flush(ingestor, entry(datetime(2026, 2, 1, 0, 1), 10))
+    assert len(ensured) == 2
@@ -0,0 +1,141 @@
+"""
+sensor_sketches upserts against a real Postgres: re-read entries must never
+be counted twice. Set TEST_DATABASE_URL to a scratch database (its tables
+are dropped) to run them.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set"
+)
+
+import ingest_daemon  # noqa: E402
+import migrate_neon  # noqa: E402
+from benchmarks.synthetic import make_feeds  # noqa: E402
+from quantile_sketch import KLLSketch  # noqa: E402
+from station_data import DEFAULT_FIELDS  # noqa: E402
+from update_neon import (  # noqa: E402
+    SKETCH_COLUMNS,
+    feeds_to_resampled_df,
+    upsert_df_to_postgres,
+    upsert_feed_sketches,
+)
+
+STATION = "VinhLong"
+CHANNEL = {
+    "station": STATION,
+    "fields": DEFAULT_FIELDS,
+    "url": "https://thingspeak.invalid/feeds.json",
+}
+TABLES = (
+    "sensor_data",
+    "sensor_data_unpartitioned",
+    "latest_readings",
+    "sensor_sketches",
+    "ingest_state",
+    "sensor_data_hourly",
+    "schema_migrations",
+)
+
+
+@pytest.fixture
+def conn():
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    with conn.cursor() as cur:
+        for table in TABLES:
+            cur.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+    conn.commit()
+    migrate_neon.migrate(conn)
+    migrate_neon.ensure_partitions(
+        conn, since=datetime(2026, 1, 1, tzinfo=timezone.utc)
+    )
+    yield conn
+    conn.close()
+
+
+def stored_bins(conn) -> pd.DataFrame:
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT ds, n, first_entry_id, last_entry_id, {', '.join(SKETCH_COLUMNS)} "
+            "FROM sensor_sketches WHERE station = %s ORDER BY ds",
+            (STATION,),
+        )
+        rows = cur.fetchall()
+    out = pd.DataFrame(rows, columns=["ds", "n", "first", "last", *SKETCH_COLUMNS])
+    out["sketch_n"] = [KLLSketch.from_bytes(bytes(b)).n for b in out["ec_gl"]]
+    return out
+
+
+def run_update_neon(conn, feeds) -> None:
+    """What update_neon.main writes for one channel's fetch."""
+    upsert_df_to_postgres(
+        conn,
+        feeds_to_resampled_df(feeds, station=STATION),
+        table_name="sensor_data",
+        commit=False,
+    )
+    with conn.cursor() as cur:
+        upsert_feed_sketches(cur, feeds, station=STATION)
+    conn.commit()
+
+
+def test_daemon_first_poll_after_update_neon_keeps_counts(conn, monkeypatch):
+    # one entry a minute from 00:01: bins of 9, 10, ..., 10, 1
+    thingspeak = make_feeds(60)
+    run_update_neon(conn, thingspeak[:45])  # the last bin (00:40) holds 40..45 so far
+    before = stored_bins(conn)
+
+    def fetch_channels(channels, session, results, since):
+        start = pd.Timestamp(since[STATION])
+        return {
+            STATION: [f for f in thingspeak if pd.Timestamp(f["created_at"]) >= start]
+        }
+
+    monkeypatch.setattr(ingest_daemon, "fetch_channels", fetch_channels)
+    ingest_daemon.ensure_schema(conn)
+    ingestor = ingest_daemon.Ingestor(conn, ingest_daemon.Metrics(), channels=[CHANNEL])
+    assert ingestor.poll() == 15
+    ingestor.flush()
+
+    after = stored_bins(conn)
+    pd.testing.assert_frame_equal(after.iloc[:4, :4], before.iloc[:4, :4])
+    assert after["n"].tolist() == [9, 10, 10, 10, 10, 10, 1]
+    assert (after["sketch_n"] == after["n"]).all()
+    assert after["last"].iloc[-1] == 60
+
+
+def test_reread_and_capped_fetches_count_each_entry_once(conn):
+    feeds = make_feeds(40)
+    run_update_neon(conn, feeds[25:])  # capped fetch: starts mid-bin (entries 26..)
+    run_update_neon(conn, feeds[25:])  # retry of the same batch
+    run_update_neon(conn, feeds[:30])  # backfill of the older entries, overlapping
+
+    bins = stored_bins(conn)
+    assert bins["n"].tolist() == [9, 10, 10, 10, 1]
+    assert (bins["sketch_n"] == bins["n"]).all()
+    assert bins["first"].tolist() == [1, 10, 20, 30, 40]
+    assert bins["last"].tolist() == [9, 19, 29, 39, 40]
+
+
+def test_bins_without_entry_ids_are_replaced(conn):
+    feeds = make_feeds(19)
+    run_update_neon(conn, feeds)
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE sensor_sketches "
+            "SET n = 99, first_entry_id = NULL, last_entry_id = NULL"
+        )
+    conn.commit()
+
+    run_update_neon(conn, feeds)
+    bins = stored_bins(conn)
+    assert bins["n"].tolist() == [9, 10]
+    assert bins["first"].tolist() == [1, 10]
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from models import registry
+from models.registry import ModelRegistry
+
+
+class Loader:
+    """Stub loader: returns a fresh object per load and counts the loads."""
+
+    def __init__(self, name):
+        self.name = name
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        return {"name": self.name, "load": self.loads}
+
+
+def predictor(model, series):
+    return [model["name"], series]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(registry.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_registry(names, **kwargs):
+    reg = ModelRegistry(**kwargs)
+    loaders = {name: Loader(name) for name in names}
+    for name, loader in loaders.items():
+        reg.register(name, loader, predictor)
+    return reg, loaders
+
+
+def test_get_loads_once_and_then_hits():
+    reg, loaders = make_registry(["Hour"])
+    first = reg.get("Hour")
+    assert reg.get("Hour") is first
+    assert reg.predict("Hour", 3) == ["Hour", 3]
+    assert loaders["Hour"].loads == 1
+
+    stats = reg.stats()["Hour"]
+    assert stats["loaded"] and stats["loads"] == 1 and stats["calls"] == 1
+    assert stats["p50_s"] is not None
+
+    with pytest.raises(KeyError):
+        reg.get("Week")
+
+
+def test_least_recently_used_is_evicted_at_capacity():
+    reg, loaders = make_registry(["a", "b", "c"], max_loaded=2, idle_ttl=None)
+    reg.get("a")
+    reg.get("b")
+    reg.get("a")  # b is now the least recently used
+    reg.get("c")
+    assert reg.loaded() == ["a", "c"]
+
+    reg.get("b")  # reloaded, evicting a
+    assert reg.loaded() == ["c", "b"]
+    assert [loaders[n].loads for n in "abc"] == [1, 2, 1]
+
+
+def test_idle_models_are_evicted_on_the_next_load(clock):
+    reg, loaders = make_registry(["a", "b", "c"], max_loaded=3, idle_ttl=60)
+    reg.get("a")
+    clock[0] += 30
+    reg.get("b")
+    clock[0] += 45  # a idle for 75s, b for 45s
+    reg.get("c")
+    assert reg.loaded() == ["b", "c"]
+
+    clock[0] += 61
+    reg.get("b")  # a hit does not evict
+    assert reg.loaded() == ["c", "b"]
+    reg.get("a")  # a load does: c has been idle too long
+    assert reg.loaded() == ["b", "a"]
+
+
+def test_evict_and_concurrent_first_use():
+    reg, loaders = make_registry(["a", "b"])
+    gate = threading.Event()
+    slow = loaders["a"]
+
+    def load():
+        gate.wait(1)
+        return slow()
+
+    reg.register("a", load, predictor)
+    threads = [threading.Thread(target=reg.get, args=("a",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+    assert slow.loads == 1
+
+    reg.get("b")
+    reg.evict("a")
+    assert reg.loaded() == ["b"]
+    reg.evict()
+    assert reg.loaded() == []
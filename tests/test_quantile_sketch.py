@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import (
+    KLLSketch,
+    SketchIndex,
+    StoredSketches,
+    bin_sketches,
+    weighted_quantile,
+)
+
+QS = [0.0, 0.05, 0.25, 0.5, 0.9, 0.95, 1.0]
+
+
+def test_weighted_quantile_matches_np_quantile():
+    rng = np.random.default_rng(0)
+    for n in (1, 2, 7, 100):
+        x = np.round(rng.normal(size=n), 2)
+        np.testing.assert_allclose(
+            weighted_quantile(x, np.ones(n), QS), np.quantile(x, QS)
+        )
+        w = rng.integers(1, 5, n)
+        np.testing.assert_allclose(
+            weighted_quantile(x, w, QS), np.quantile(np.repeat(x, w), QS)
+        )
+    assert weighted_quantile(np.array([3.0, 1.0, 2.0]), np.ones(3), 0.5) == 2.0
+
+
+def test_grouped_weighted_quantile_matches_per_group_np_quantile():
+    rng = np.random.default_rng(1)
+    n_groups = 12
+    g = rng.integers(0, n_groups, 500)
+    g = g[(g != 3) & (g != 11)]  # empty groups, one of them last
+    x = rng.normal(size=len(g))
+    w = rng.integers(1, 4, len(g))
+
+    out = weighted_quantile(x, w, QS, groups=g, n_groups=n_groups)
+    assert out.shape == (n_groups, len(QS))
+    for k in range(n_groups):
+        if k in (3, 11):
+            assert np.isnan(out[k]).all()
+        else:
+            ref = np.quantile(np.repeat(x[g == k], w[g == k]), QS)
+            np.testing.assert_allclose(out[k], ref)
+
+    order = np.lexsort((x, g))
+    presorted = weighted_quantile(
+        x[order], w[order], QS, groups=g[order], n_groups=n_groups, presorted=True
+    )
+    np.testing.assert_array_equal(presorted, out)
+
+
+def test_small_sketch_is_exact():
+    x = np.random.default_rng(2).normal(size=150)
+    sketch = KLLSketch(k=200).update(x)
+    values, weights = sketch.items()
+    assert (weights == 1).all() and sorted(values) == sorted(x)
+    np.testing.assert_allclose(sketch.quantile(QS), np.quantile(x, QS))
+
+
+def test_compaction_keeps_count_and_rank_error():
+    rng = np.random.default_rng(3)
+    x = rng.lognormal(size=100_000)
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(x, 37):
+        sketch.update(np.append(chunk, np.nan))  # NaN is skipped
+
+    values, weights = sketch.items()
+    assert sketch.n == len(x) and weights.sum() == len(x)
+    assert len(values) < 1000  # O(k) items, not O(n)
+    assert (sketch.min, sketch.max) == (x.min(), x.max())
+    assert sketch.quantile([0.0, 1.0]).tolist() == [x.min(), x.max()]
+
+    ranks = np.searchsorted(np.sort(x), sketch.quantile(QS[1:-1])) / len(x)
+    np.testing.assert_allclose(ranks, QS[1:-1], atol=0.02)
+
+
+def test_merge_adds_counts():
+    rng = np.random.default_rng(4)
+    a, b = rng.normal(size=5000), rng.normal(3, 1, size=3000)
+    merged = KLLSketch().update(a).merge(KLLSketch().update(b))
+    both = np.concatenate([a, b])
+    assert merged.n == len(both) and merged.items()[1].sum() == len(both)
+    ranks = np.searchsorted(np.sort(both), merged.quantile([0.1, 0.5, 0.9])) / len(both)
+    np.testing.assert_allclose(ranks, [0.1, 0.5, 0.9], atol=0.02)
+
+
+def test_serialization_round_trip():
+    sketch = KLLSketch(k=50).update(np.random.default_rng(5).normal(size=2000))
+    blob = sketch.to_bytes()
+    back = KLLSketch.from_bytes(memoryview(blob))
+    assert (back.k, back.n, back.min, back.max) == (
+        sketch.k,
+        sketch.n,
+        sketch.min,
+        sketch.max,
+    )
+    assert [len(lv) for lv in back.levels] == [len(lv) for lv in sketch.levels]
+    for got, ref in zip(back.items(), sketch.items()):
+        np.testing.assert_array_equal(got, ref)
+    assert back.to_bytes() == blob
+    # same readings, same bytes
+    assert (
+        KLLSketch(k=50).update(np.random.default_rng(5).normal(size=2000)).to_bytes()
+        == blob
+    )
+    with pytest.raises(ValueError):
+        KLLSketch.from_bytes(b"XXXX" + blob[4:])
+
+
+def frame(times, values, station="VinhLong"):
+    return pd.DataFrame(
+        {
+            "ds": pd.to_datetime(times).tz_localize("Asia/Bangkok"),
+            "station": station,
+            "ec_gl": values,
+        }
+    )
+
+
+def test_sketch_index_prefers_stored_bins_over_frame_readings():
+    df = frame(
+        [
+            "2026-01-01 00:01",
+            "2026-01-01 00:05",
+            "2026-01-01 00:12",
+            "2026-01-01 00:15",
+        ],
+        [1.0, 2.0, 3.0, 4.0],
+    )
+    # the stored sketch of the 00:00 bin holds readings the frame doesn't have
+    stored = bin_sketches(
+        frame(["2026-01-01 00:02"] * 3, [7.0, 8.0, 9.0]), ["ec_gl"]
+    ).drop(columns="n")
+    stored["ds"] = stored["ds"].dt.tz_convert("UTC")
+
+    series = SketchIndex(df, "ec_gl", stored=stored).series["VinhLong"]
+    start = pd.Timestamp("2026-01-01").value
+    assert series.values.tolist() == [7.0, 8.0, 9.0, 3.0, 4.0]
+    assert series.bins.tolist() == [start] * 3 + [start + 600 * 10**9] * 2
+    medians = series.bin_quantiles("10min", start, start + 1200 * 10**9, 0.5)["value"]
+    assert medians.tolist() == [8.0, 3.5]
+    # no stored sketches: the frame's readings, weight 1
+    assert SketchIndex(df, "ec_gl").series["VinhLong"].values.tolist() == [
+        1.0,
+        2.0,
+        3.0,
+        4.0,
+    ]
+
+
+def test_stored_sketches_decode_only_new_or_changed_bins(monkeypatch):
+    blobs = bin_sketches(
+        frame(
+            ["2026-01-01 00:01", "2026-01-01 00:11", "2026-01-01 00:21"],
+            [1.0, 2.0, 3.0],
+        ),
+        ["ec_gl"],
+    )
+    bins = blobs[["ds", "station", "n"]]
+    stored = StoredSketches("ec_gl")
+    decoded = []
+    from_bytes = KLLSketch.from_bytes.__func__
+    monkeypatch.setattr(
+        KLLSketch,
+        "from_bytes",
+        classmethod(lambda cls, b: decoded.append(b) or from_bytes(cls, b)),
+    )
+
+    stored.update(bins.iloc[:2], blobs, watermark=1)
+    assert (len(stored), len(decoded), stored.watermark) == (2, 2, 1)
+    assert stored.stale(bins).index.tolist() == [2]
+
+    # the first bin leaves the window, the second grows, the third is new
+    changed = bins.iloc[1:].assign(n=[5, 1])
+    newer = blobs.iloc[1:].assign(
+        ec_gl=[KLLSketch().update([2.0, 2.5]).to_bytes(), blobs["ec_gl"].iloc[2]]
+    )
+    decoded.clear()
+    stored.update(changed, newer, watermark=2)
+    assert len(decoded) == 2
+    stations, ds, sizes, values, _ = stored.items()
+    assert sizes.tolist() == [2, 1] and values.tolist() == [2.0, 2.5, 3.0]
+
+    decoded.clear()
+    stored.update(changed, newer, watermark=3)
+    assert decoded == [] and len(stored) == 2
@@ -0,0 +1,93 @@
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+torch = pytest.importorskip("torch")
+nn = torch.nn
+
+from models.quantization import (  # noqa: E402
+    _forecast_column,
+    _report,
+    quantize_module,
+    quantize_neuralforecast,
+    weight_bytes,
+)
+
+
+class TinyLSTM(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.lstm = nn.LSTM(1, 32, batch_first=True)
+        self.head = nn.Linear(32, 1)
+
+    def forward(self, x):
+        out, _ = self.lstm(x)
+        return self.head(out)
+
+
+@pytest.fixture
+def mlp():
+    torch.manual_seed(0)
+    return nn.Sequential(nn.Linear(64, 256), nn.ReLU(), nn.Linear(256, 12))
+
+
+def test_quantized_mlp_is_close_and_smaller(mlp):
+    q = quantize_module(mlp)
+    x = torch.randn(32, 64)
+    with torch.no_grad():
+        ref, out = mlp(x), q(x)
+    assert torch.allclose(out, ref, atol=0.05 * ref.abs().max().item())
+    assert weight_bytes(q) < 0.5 * weight_bytes(mlp)
+    # the original is untouched
+    assert isinstance(mlp[0], nn.Linear) and mlp[0].weight.dtype == torch.float32
+
+
+def test_quantized_lstm_is_close():
+    torch.manual_seed(1)
+    model = TinyLSTM().eval()
+    q = quantize_module(model)
+    x = torch.randn(8, 24, 1)
+    with torch.no_grad():
+        ref, out = model(x), q(x)
+    assert torch.allclose(out, ref, atol=0.05 * ref.abs().max().item() + 1e-3)
+    assert type(q.lstm) is not nn.LSTM
+
+
+def test_quantize_neuralforecast_moves_models_to_cpu(mlp):
+    mlp.trainer_kwargs = {"accelerator": "gpu", "devices": 2, "max_steps": 10}
+    nf = types.SimpleNamespace(models=[mlp])
+    quantize_neuralforecast(nf)
+    (q,) = nf.models
+    assert q is not mlp
+    assert q.trainer_kwargs == {"accelerator": "cpu", "devices": 1, "max_steps": 10}
+    assert mlp.trainer_kwargs["accelerator"] == "gpu"
+
+
+def test_forecast_column_prefers_median():
+    cols = ["unique_id", "ds", "NHITS-lo-90", "NHITS", "NHITS-median", "NHITS-hi-90"]
+    assert _forecast_column(pd.DataFrame(columns=cols)) == "NHITS-median"
+    assert (
+        _forecast_column(
+            pd.DataFrame(columns=["unique_id", "ds", "NHITS-lo-90", "NHITS"])
+        )
+        == "NHITS"
+    )
+    with pytest.raises(ValueError):
+        _forecast_column(pd.DataFrame(columns=["unique_id", "ds"]))
+
+
+def test_report_passes_within_tolerance():
+    actual = np.zeros(4)
+    y32 = np.full(4, 1.0)
+    ok = _report(actual, y32, np.full(4, 1.04), 2.0, 1.0, 100, 30, tolerance=0.05)
+    assert (
+        ok["passed"]
+        and ok["latency_delta_pct"] == -50.0
+        and ok["memory_delta_pct"] == -70.0
+    )
+    assert ok["max_abs_drift"] == pytest.approx(0.04)
+    assert not _report(
+        actual, y32, np.full(4, 1.06), 2.0, 1.0, 100, 30, tolerance=0.05
+    )["passed"]
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from stats_index import ExtremeTree, SeriesStats
+
+
+def brute_extreme(x, lo, hi, kind):
+    """(value, position) of the first min/max of x[lo:hi] ignoring NaN; (nan, -1) if none."""
+    window = x[lo:hi]
+    if not len(window) or np.isnan(window).all():
+        return np.nan, -1
+    pos = lo + int(np.nanargmin(window) if kind == "min" else np.nanargmax(window))
+    return x[pos], pos
+
+
+def random_series(rng, n):
+    # rounded values for ties, and runs of NaN
+    x = np.round(rng.normal(size=n), 1)
+    x[rng.random(n) < 0.15] = np.nan
+    x[10:20] = np.nan
+    return x
+
+
+@pytest.mark.parametrize("kind", ["min", "max"])
+def test_query_many_matches_nanarg(kind):
+    rng = np.random.default_rng(0)
+    x = random_series(rng, 1000)
+    tree = ExtremeTree(x, kind=kind)
+
+    lo = rng.integers(0, len(x), 2000)
+    hi = np.minimum(lo + rng.integers(0, 300, 2000), len(x))
+    values, pos = tree.query_many(lo, hi)
+
+    for a, b, v, p in zip(lo, hi, values, pos):
+        ref_v, ref_p = brute_extreme(x, a, b, kind)
+        assert p == ref_p
+        np.testing.assert_equal(v, ref_v)
+
+
+@pytest.mark.parametrize("kind", ["min", "max"])
+def test_extend_keeps_answers(kind):
+    rng = np.random.default_rng(1)
+    x = random_series(rng, 700)
+    tree = ExtremeTree(kind=kind, capacity=4)
+    # grows past several capacities
+    for chunk in np.array_split(x, [1, 5, 100, 101, 513]):
+        tree.extend(chunk)
+    assert len(tree) == len(x)
+
+    for _ in range(500):
+        a, b = sorted(rng.integers(0, len(x) + 1, 2))
+        assert tree.query(a, b)[1] == brute_extreme(x, a, b, kind)[1]
+
+
+def test_empty_and_all_nan_ranges():
+    tree = ExtremeTree([np.nan, np.nan, 1.0], kind="max")
+    values, pos = tree.query_many([0, 1, 2], [2, 1, 3])
+    np.testing.assert_equal(values, [np.nan, np.nan, 1.0])
+    assert pos.tolist() == [-1, -1, 2]
+
+
+def brute_stats(x, lo, hi):
+    window = x[lo:hi]
+    window = window[~np.isnan(window)]
+    if not len(window):
+        return None
+    return {
+        "max": window.max(),
+        "min": window.min(),
+        "mean": window.mean(),
+        "std": window.std(ddof=1) if len(window) > 1 else np.nan,
+        "count": len(window),
+    }
+
+
+def test_range_stats_matches_numpy_with_a_large_offset():
+    # sum-of-squares variance would lose every digit at this offset without the shift
+    rng = np.random.default_rng(2)
+    x = 1e8 + rng.normal(scale=0.01, size=2000)
+    x[rng.random(len(x)) < 0.1] = np.nan
+    times = np.arange(len(x), dtype=np.int64)
+    series = SeriesStats(times[:1500], x[:1500])
+    series.append(times[1500:], x[1500:])
+
+    for _ in range(500):
+        a, b = sorted(rng.integers(0, len(x) + 1, 2))
+        got, ref = series.range_stats(a, b), brute_stats(x, a, b)
+        if ref is None:
+            assert got["count"] == 0
+            continue
+        assert got["count"] == ref["count"]
+        assert got["max"] == ref["max"] and got["min"] == ref["min"]
+        assert got["mean"] == pytest.approx(ref["mean"], rel=1e-12)
+        if ref["count"] > 1:
+            assert got["std"] == pytest.approx(ref["std"], rel=1e-6)
+        else:
+            assert np.isnan(got["std"])
+
+
+def test_append_rejects_older_readings():
+    series = SeriesStats(np.array([10, 20], dtype=np.int64), np.array([1.0, 2.0]))
+    with pytest.raises(ValueError):
+        series.append(np.array([15], dtype=np.int64), np.array([3.0]))
@@ -0,0 +1,141 @@
+import json
+
+import pytest
+import requests
+
+import thingspeak_client
+from thingspeak_client import CircuitBreaker, CircuitOpenError
+
+FEED_URL = "https://api.thingspeak.com/channels/1/feeds.json"
+LAST_URL = "https://api.thingspeak.com/channels/1/feeds/last.json"
+
+
+def response(status=200, payload=None, headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r._content = json.dumps(payload).encode() if payload is not None else b""
+    r.headers.update(headers or {})
+    r.url = FEED_URL
+    return r
+
+
+class FakeSession:
+    """Replays queued responses per URL and records the requests made."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls.append((url, dict(headers or {})))
+        return self.responses[url].pop(0)
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    thingspeak_client.reset()
+    yield
+    thingspeak_client.reset()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(thingspeak_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_cooldown(clock):
+    cb = CircuitBreaker(threshold=3, cooldown=60)
+    for _ in range(2):
+        cb.failure()
+        cb.check("h")  # still closed
+    cb.failure()
+    with pytest.raises(CircuitOpenError):
+        cb.check("h")
+
+    clock[0] += 61
+    cb.check("h")  # half-open: one call goes through
+    cb.failure()  # and a single failure re-opens
+    with pytest.raises(CircuitOpenError):
+        cb.check("h")
+
+    clock[0] += 61
+    cb.check("h")
+    cb.success()
+    cb.failure()
+    cb.check("h")  # closed again: the count restarted
+
+
+def test_get_json_counts_outages_but_not_client_errors(clock):
+    session = FakeSession({FEED_URL: [response(404)] * 5 + [response(503)] * 3})
+    for _ in range(5):
+        with pytest.raises(requests.HTTPError):
+            thingspeak_client.get_json(FEED_URL, session=session)
+    for _ in range(3):
+        with pytest.raises(requests.HTTPError):
+            thingspeak_client.get_json(FEED_URL, session=session)
+    with pytest.raises(CircuitOpenError):
+        thingspeak_client.get_json(FEED_URL, session=session)
+    assert len(session.calls) == 8  # the open breaker made no request
+
+
+def test_fetch_feeds_revalidates_with_etag():
+    payload = {"channel": {"last_entry_id": 5}, "feeds": [{"entry_id": 5}]}
+    session = FakeSession(
+        {
+            FEED_URL: [
+                response(
+                    200,
+                    payload,
+                    {"ETag": '"v1"', "Last-Modified": "Mon, 19 Oct 2026 00:00:00 GMT"},
+                ),
+                response(304),
+            ]
+        }
+    )
+    assert (
+        thingspeak_client.fetch_feeds(FEED_URL, {"results": 10}, session=session)
+        == payload
+    )
+    assert (
+        thingspeak_client.fetch_feeds(FEED_URL, {"results": 10}, session=session)
+        == payload
+    )
+
+    (_, first), (_, second) = session.calls
+    assert "If-None-Match" not in first
+    assert second["If-None-Match"] == '"v1"'
+    assert second["If-Modified-Since"] == "Mon, 19 Oct 2026 00:00:00 GMT"
+
+
+def test_fetch_feeds_probes_last_entry_without_validators():
+    old = {"channel": {"last_entry_id": 5}, "feeds": [{"entry_id": 5}]}
+    new = {"channel": {"last_entry_id": 6}, "feeds": [{"entry_id": 6}]}
+    session = FakeSession(
+        {
+            FEED_URL: [response(200, old), response(200, new)],
+            LAST_URL: [response(200, {"entry_id": 5}), response(200, {"entry_id": 6})],
+        }
+    )
+    assert thingspeak_client.fetch_feeds(FEED_URL, session=session) == old
+    # the probe matched: no feed request
+    assert thingspeak_client.fetch_feeds(FEED_URL, session=session) == old
+    assert thingspeak_client.fetch_feeds(FEED_URL, session=session) == new
+    assert [url for url, _ in session.calls] == [FEED_URL, LAST_URL, LAST_URL, FEED_URL]
+
+
+def test_validators_are_per_request():
+    a = {"channel": {}, "feeds": [{"entry_id": 1}]}
+    b = {"channel": {}, "feeds": [{"entry_id": 2}]}
+    session = FakeSession(
+        {
+            FEED_URL: [
+                response(200, a, {"ETag": '"a"'}),
+                response(200, b, {"ETag": '"b"'}),
+            ]
+        }
+    )
+    thingspeak_client.fetch_feeds(FEED_URL, {"results": 1}, session=session)
+    assert thingspeak_client.fetch_feeds(FEED_URL, {"results": 2}, session=session) == b
+    assert "If-None-Match" not in session.calls[1][1]
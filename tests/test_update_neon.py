@@ -0,0 +1,280 @@
+"""
+update_neon's ingestion paths against a recording cursor: the SQL they issue
+and what they send, without a database.
+"""
+
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import update_neon  # noqa: E402
+from quantile_sketch import KLLSketch  # noqa: E402
+
+STATION = "VinhLong"
+
+
+class FakeCursor:
+    """Records execute/copy_expert calls; fetchall() pops the queued results."""
+
+    def __init__(self, results=()):
+        self.executed = []
+        self.copied = []
+        self.results = list(results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((" ".join(sql.split()), params))
+
+    def copy_expert(self, sql, buf):
+        self.copied.append((sql, buf.read()))
+
+    def fetchall(self):
+        return self.results.pop(0) if self.results else []
+
+
+class FakeConn:
+    def __init__(self, cur):
+        self.cur = cur
+        self.commits = 0
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+
+def readings(*rows) -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            {
+                "ds": pd.Timestamp(ds, tz="UTC"),
+                "station": STATION,
+                "ec_us_cm": ec,
+                "temperature": 28.5,
+                "ec_gl": None,
+                "entry_id": i,
+            }
+            for i, (ds, ec) in enumerate(rows, start=1)
+        ]
+    )
+
+
+def test_copy_upsert_stages_rows_then_merges_once():
+    cur = FakeCursor()
+    conn = FakeConn(cur)
+    df = readings(
+        ("2026-01-01 00:00", 1500.0),
+        ("2026-01-01 00:10", 1510.0),
+        ("2026-01-01 00:10", 1520.0),
+    )
+
+    assert update_neon.upsert_df_to_postgres(conn, df, "sensor_data") == 2
+    assert conn.commits == 1
+
+    create, insert = (sql for sql, _ in cur.executed)
+    assert create.startswith("CREATE TEMP TABLE _sensor_stage")
+    assert "ON COMMIT DROP" in create
+    assert insert.startswith(
+        "INSERT INTO sensor_data (ds, station, ec_us_cm, temperature, ec_gl)"
+        " SELECT ds, station, ec_us_cm, temperature, ec_gl FROM _sensor_stage"
+    )
+    assert "ON CONFLICT (ds, station) DO UPDATE" in insert
+
+    [(copy_sql, csv)] = cur.copied
+    assert copy_sql == (
+        "COPY _sensor_stage (ds, station, ec_us_cm, temperature, ec_gl)"
+        " FROM STDIN WITH (FORMAT csv)"
+    )
+    # one row per (ds, station), the last one wins; NaN goes out as empty
+    assert csv.splitlines() == [
+        f"2026-01-01 00:00:00+00:00,{STATION},1500.0,28.5,",
+        f"2026-01-01 00:10:00+00:00,{STATION},1520.0,28.5,",
+    ]
+
+
+def test_copy_upsert_leaves_the_transaction_to_the_caller():
+    cur = FakeCursor()
+    conn = FakeConn(cur)
+
+    update_neon.upsert_df_to_postgres(
+        conn, readings(("2026-01-01 00:00", 1500.0)), commit=False
+    )
+
+    assert conn.commits == 0
+    assert "INSERT INTO water_readings" in cur.executed[-1][0]
+
+
+def test_upsert_of_an_empty_frame_issues_nothing():
+    cur = FakeCursor()
+
+    assert update_neon.upsert_df_to_postgres(FakeConn(cur), readings()) == 0
+    assert cur.executed == [] and cur.copied == []
+
+
+def test_fetch_channels_starts_each_channel_at_its_own_cursor(monkeypatch):
+    calls = {}
+
+    def fetch(results, start, session, url):
+        calls[url] = (results, start, session)
+        return [{"url": url}]
+
+    monkeypatch.setattr(update_neon, "fetch_thingspeak_data", fetch)
+    session = object()
+    cursor = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    channels = [
+        {"station": "VinhLong", "url": "https://ts.invalid/1"},
+        {"station": "CanGio", "url": "https://ts.invalid/2"},
+    ]
+
+    feeds = update_neon.fetch_channels(
+        channels, session, results=500, since={"VinhLong": cursor}
+    )
+
+    assert feeds == {
+        "VinhLong": [{"url": "https://ts.invalid/1"}],
+        "CanGio": [{"url": "https://ts.invalid/2"}],
+    }
+    # a channel without a cursor gets the latest <results> entries
+    assert calls == {
+        "https://ts.invalid/1": (500, cursor, session),
+        "https://ts.invalid/2": (500, None, session),
+    }
+
+
+@pytest.fixture
+def values(monkeypatch):
+    """Records update_neon's execute_values calls as (sql, rows)."""
+    calls = []
+
+    def execute_values(cur, sql, rows, **kwargs):
+        calls.append((" ".join(sql.split()), list(rows)))
+
+    monkeypatch.setattr(update_neon, "execute_values", execute_values)
+    return calls
+
+
+def test_latest_readings_keep_the_newest_row_per_station(values):
+    cur = FakeCursor()
+    df = pd.concat(
+        [
+            readings(("2026-01-01 00:10", 1510.0), ("2026-01-01 00:00", 1500.0)),
+            readings(("2026-01-01 00:05", 900.0)).assign(station="CanGio"),
+        ]
+    )
+
+    assert update_neon.update_latest_readings(cur, df) == 2
+
+    assert "CREATE TABLE IF NOT EXISTS latest_readings" in cur.executed[0][0]
+    [(sql, rows)] = values
+    assert "ON CONFLICT (station) DO UPDATE" in sql
+    # an older batch must not move a station back in time
+    assert sql.endswith("WHERE latest_readings.ds <= EXCLUDED.ds;")
+    assert sorted(rows) == [
+        ("CanGio", datetime(2026, 1, 1, 0, 5, tzinfo=timezone.utc), 900.0, 28.5, None),
+        (
+            STATION,
+            datetime(2026, 1, 1, 0, 10, tzinfo=timezone.utc),
+            1510.0,
+            28.5,
+            None,
+        ),
+    ]
+
+
+def feed(minute: int, entry_id: int, ec: float) -> dict:
+    return {
+        "created_at": f"2026-01-01T00:{minute:02d}:00Z",
+        "entry_id": entry_id,
+        "field1": str(ec),
+        "field2": "28.5",
+        "field3": "750",
+    }
+
+
+def stored_bin(minute, n, first, last, *blobs):
+    return (
+        STATION,
+        datetime(2026, 1, 1, 0, minute, tzinfo=timezone.utc),
+        n,
+        first,
+        last,
+        *blobs,
+    )
+
+
+def sketch_rows(values) -> dict:
+    """{bin minute: (n, first_entry_id, last_entry_id, ec_us_cm sketch)} of the written rows."""
+    [(sql, rows)] = values
+    assert sql.startswith("INSERT INTO sensor_sketches")
+    assert "ON CONFLICT (station, ds) DO UPDATE" in sql
+    return {
+        ds.minute: (n, first, last, KLLSketch.from_bytes(ec.adapted))
+        for station, ds, n, ec, temperature, ec_gl, first, last in rows
+    }
+
+
+def test_feed_sketches_skip_entries_the_stored_bin_holds(values):
+    stored = KLLSketch().update([1500.0, 1510.0, 1520.0])
+    cur = FakeCursor(
+        [
+            [stored_bin(0, 3, 1, 3)],
+            [stored_bin(0, 3, 1, 3, stored.to_bytes(), None, None)],
+        ]
+    )
+    # entries 2 and 3 were already sketched by the previous (overlapping) fetch
+    feeds = [
+        feed(1, 2, 1510.0),
+        feed(2, 3, 1520.0),
+        feed(3, 4, 1530.0),
+        feed(12, 5, 1600.0),
+    ]
+
+    assert update_neon.upsert_feed_sketches(cur, feeds, station=STATION) == 2
+
+    selects = [
+        (sql, params) for sql, params in cur.executed if sql.startswith("SELECT")
+    ]
+    assert [params[0] for _, params in selects] == [[STATION], [STATION]]
+    # the range lookup reads only the ids, the merge reads the blobs
+    assert "ec_us_cm" not in selects[0][0] and "ec_us_cm" in selects[1][0]
+
+    rows = sketch_rows(values)
+    n, first, last, ec = rows[0]
+    assert (n, first, last) == (4, 1, 4)
+    assert (ec.n, ec.min, ec.max) == (4, 1500.0, 1530.0)
+    n, first, last, ec = rows[10]
+    assert (n, first, last, ec.n) == (1, 5, 5, 1)
+
+
+def test_feed_sketches_of_held_entries_write_nothing(values):
+    cur = FakeCursor([[stored_bin(0, 3, 1, 3)]])
+
+    feeds = [feed(1, 2, 1510.0), feed(2, 3, 1520.0), feed(2, 3, 1520.0)]
+    assert update_neon.upsert_feed_sketches(cur, feeds, station=STATION) == 0
+    assert values == []
+
+
+def test_feed_sketches_replace_bins_stored_without_entry_ids(values):
+    legacy = KLLSketch().update([1.0] * 5)
+    cur = FakeCursor(
+        [
+            [stored_bin(0, 5, None, None)],
+            [stored_bin(0, 5, None, None, legacy.to_bytes(), None, None)],
+        ]
+    )
+
+    feeds = [feed(1, 7, 1510.0), feed(2, 8, 1520.0)]
+    assert update_neon.upsert_feed_sketches(cur, feeds, station=STATION) == 1
+
+    n, first, last, ec = sketch_rows(values)[0]
+    assert (n, first, last) == (2, 7, 8)
+    assert (ec.n, ec.min, ec.max) == (2, 1510.0, 1520.0)
@@ -0,0 +1,132 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from warning_levels import (
+    NO_LEVEL,
+    LevelIndex,
+    classify,
+    color_for,
+    legend_items,
+    level_of,
+)
+
+
+def baseline_level(v):
+    """The per-value rules the map used before classify().
+
+    Each bound belongs to the lower level.
+    """
+    if v is None or pd.isna(v):
+        return None
+    if v <= 0.5:
+        return 0
+    if v <= 1:
+        return 1
+    if v <= 2:
+        return 2
+    if v <= 4:
+        return 3
+    return 4
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        0.0,
+        0.49,
+        0.5,
+        0.500001,
+        0.99,
+        1,
+        1.000001,
+        2,
+        2.0001,
+        3.99,
+        4,
+        4.0001,
+        12.0,
+        -1.0,
+    ],
+)
+def test_classify_boundaries_match_baseline_rules(value):
+    assert classify([value])[0] == baseline_level(value)
+    assert level_of(value) == baseline_level(value)
+
+
+def test_classify_missing_and_text_values():
+    levels = classify(pd.Series([None, np.nan, "0.7", "n/a", 5]))
+    assert levels.tolist() == [NO_LEVEL, NO_LEVEL, 1, NO_LEVEL, 4]
+    assert level_of(None) is None
+    assert color_for(NO_LEVEL) == color_for(None) == color_for("x")
+
+
+def test_legend_labels_follow_thresholds():
+    assert [label for _, label in legend_items()] == [
+        "<= 0.5 g/l",
+        "0.5 – 1 g/l",
+        "1 – 2 g/l",
+        "2 – 4 g/l",
+        "> 4 g/l",
+    ]
+
+
+def brute_summary(window, max_gap=pd.Timedelta("1h")):
+    """{level: (duration, share)}; each reading counts until the next, <= max_gap."""
+    rows = window.dropna(subset=["ec_gl"]).sort_values("ds")
+    spent = {}
+    ds, values = rows["ds"].tolist(), rows["ec_gl"].tolist()
+    for k, v in enumerate(values):
+        step = min(ds[k + 1] - ds[k], max_gap) if k + 1 < len(ds) else pd.Timedelta(0)
+        level = baseline_level(v)
+        spent[level] = spent.get(level, pd.Timedelta(0)) + step
+    total = sum(spent.values(), pd.Timedelta(0))
+    return {lv: (d, d / total if total else 0.0) for lv, d in sorted(spent.items())}
+
+
+def test_level_index_matches_brute_force():
+    rng = np.random.default_rng(0)
+    ds = pd.date_range("2026-01-01", periods=3000, freq="10min", tz="Asia/Bangkok")
+    df = pd.DataFrame(
+        {
+            "ds": np.concatenate([ds, ds]),
+            "station": ["VinhLong"] * len(ds) + ["CanGio"] * len(ds),
+            "ec_gl": np.clip(np.cumsum(rng.normal(0, 0.1, 2 * len(ds))) % 6, 0, None),
+        }
+    )
+    df.loc[rng.random(len(df)) < 0.05, "ec_gl"] = np.nan
+    df = df[rng.random(len(df)) > 0.03]  # gaps longer than max_gap too
+    index = LevelIndex(df)
+
+    days = pd.Series(ds.date).unique()
+    for _ in range(50):
+        station = rng.choice(["VinhLong", "CanGio"])
+        date_from, date_to = rng.choice(days, 2)
+        lo, hi = min(date_from, date_to), max(date_from, date_to)
+        wall = df["ds"].dt.tz_localize(None).dt.date
+        window = df[(df["station"] == station) & (wall >= lo) & (wall <= hi)]
+
+        ref = brute_summary(window)
+        got = index.summary(station, date_from, date_to)
+        assert got["level"].tolist() == list(ref)
+        assert got["duration"].tolist() == [d for d, _ in ref.values()]
+        np.testing.assert_allclose(
+            got["share"].astype(float), [s for _, s in ref.values()]
+        )
+
+
+def test_level_index_empty_ranges():
+    df = pd.DataFrame(
+        {
+            "ds": pd.to_datetime(["2026-01-01 10:00"]),
+            "station": ["VinhLong"],
+            "ec_gl": [0.7],
+        }
+    )
+    index = LevelIndex(df)
+    assert index.summary("CanGio", dt.date(2026, 1, 1), dt.date(2026, 1, 1)).empty
+    assert index.summary("VinhLong", dt.date(2026, 1, 2), dt.date(2026, 1, 3)).empty
+    one = index.summary("VinhLong", dt.date(2026, 1, 1), dt.date(2026, 1, 1))
+    assert one["level"].tolist() == [1] and one["share"].tolist() == [0.0]
@@ -0,0 +1,217 @@
+"""
+Shared ThingSpeak HTTP client.
+
+One pooled keep-alive `requests.Session` per process (gzip, retry with
+backoff on 429/5xx), plus:
+  - conditional requests: ETag / Last-Modified of the previous identical
+    request are sent back, and a 304 reuses the cached payload;
+  - last_entry_id short-circuit: when the server gives no validators, a tiny
+    `feeds/last.json` probe tells whether the cached payload is still current;
+  - a circuit breaker per host: after `FAILURE_THRESHOLD` consecutive failures
+    calls fail fast with `CircuitOpenError` for `COOLDOWN_S` seconds, so an
+    outage does not cost every caller a full timeout.
+
+Used by the app (data.py) and the scripts in github_actions/.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TIMEOUT = (3.05, 10)  # (connect, read) seconds
+FAILURE_THRESHOLD = 3
+COOLDOWN_S = 60.0
+MAX_CACHED = 64  # payloads kept for revalidation
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without a network call while the host's breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self, threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN_S
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def check(self, host: str) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError(
+                    f"ThingSpeak circuit open for {host}; retrying after cooldown"
+                )
+            # half-open: let this call through, one more failure re-opens
+            self.opened_at = None
+            self.failures = self.threshold - 1
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_session = None
+_breakers = {}
+_validators = {}  # request key -> {"etag", "last_modified", "payload"}
+
+
+def make_session(pool_maxsize: int = 10, retries: int = 3) -> requests.Session:
+    """A keep-alive session with gzip and retry/backoff on transient errors."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(
+        {"Accept-Encoding": "gzip, deflate", "Accept": "application/json"}
+    )
+    return session
+
+
+def get_session() -> requests.Session:
+    """The process-wide session (created on first use)."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def breaker(host: str) -> CircuitBreaker:
+    with _lock:
+        return _breakers.setdefault(host, CircuitBreaker())
+
+
+def _last_entry_url(feed_url: str) -> str | None:
+    if feed_url.endswith("/feeds.json"):
+        return feed_url[: -len("/feeds.json")] + "/feeds/last.json"
+    return None
+
+
+def _latest_entry_id(payload: dict):
+    last = (payload.get("channel") or {}).get("last_entry_id")
+    if last is None:
+        feeds = payload.get("feeds") or []
+        last = feeds[-1].get("entry_id") if feeds else None
+    return last
+
+
+def _is_outage(exc: Exception) -> bool:
+    """Connection problems and 5xx/429 count towards the breaker; other 4xx don't."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return True
+
+
+def get_json(
+    url: str, params: dict | None = None, session=None, timeout=TIMEOUT
+) -> dict:
+    """GET a ThingSpeak JSON endpoint through the breaker (no conditional caching)."""
+    host = urlsplit(url).netloc
+    cb = breaker(host)
+    cb.check(host)
+    try:
+        r = (session or get_session()).get(url, params=params, timeout=timeout)
+        r.raise_for_status()
+        payload = r.json()
+    except (requests.RequestException, ValueError) as exc:
+        if _is_outage(exc):
+            cb.failure()
+        raise
+    cb.success()
+    return payload
+
+
+def fetch_feeds(
+    url: str, params: dict | None = None, session=None, timeout=TIMEOUT
+) -> dict:
+    """
+    GET a channel feed, revalidating against the previous identical request.
+
+    Returns the JSON payload ({"channel": ..., "feeds": [...]}); raises
+    requests.RequestException (incl. CircuitOpenError) on failure.
+    """
+    params = dict(params or {})
+    key = (url, tuple(sorted(params.items())))
+    host = urlsplit(url).netloc
+    cb = breaker(host)
+    cb.check(host)
+    session = session or get_session()
+    with _lock:
+        cached = _validators.get(key)
+
+    try:
+        # no validators from the server last time: probe the newest entry first
+        probe_url = _last_entry_url(url)
+        if (
+            cached
+            and not (cached["etag"] or cached["last_modified"])
+            and probe_url
+            and "end" not in params
+        ):
+            last = session.get(probe_url, timeout=timeout)
+            last.raise_for_status()
+            if last.json().get("entry_id") == _latest_entry_id(cached["payload"]):
+                cb.success()
+                return cached["payload"]
+
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+        r = session.get(url, params=params, headers=headers, timeout=timeout)
+        if r.status_code == 304 and cached:
+            cb.success()
+            return cached["payload"]
+        r.raise_for_status()
+        payload = r.json()
+    except (requests.RequestException, ValueError) as exc:
+        if _is_outage(exc):
+            cb.failure()
+        raise
+
+    cb.success()
+    with _lock:
+        _validators.pop(key, None)
+        if len(_validators) >= MAX_CACHED:
+            _validators.pop(next(iter(_validators)))
+        _validators[key] = {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "payload": payload,
+        }
+    return payload
+
+
+def reset() -> None:
+    """Forget validators and breaker state (tests, cache clears)."""
+    with _lock:
+        _validators.clear()
+        _breakers.clear()
@@ -0,0 +1,165 @@
+"""
+Cache warm-up: pay the cold-start costs before the first real visitor does.
+
+Stages (timed individually):
+  1. dataset   - Neon + ThingSpeak merged dataset (`combined_data_retrieve`)
+  2. models    - load the Hour/Day forecast models into the model registry
+  3. inference - one dummy prediction per model (allocates/JITs kernels)
+  4. overview  - default Overview computations (filter, aggregations and the
+                 Hour/Day forecasts the first chart render will ask for)
+
+Entry points:
+  - `python warmup.py` runs every stage in a fresh process and prints timings
+    (useful at container start to fault in weights and check Neon/ThingSpeak).
+  - Inside the Streamlit server, `?warmup=<WARMUP_TOKEN>` runs every stage
+    synchronously and shows the report, which is what the scheduled wake job
+    opens. With WARMUP_ON_START=1, `start_background_warmup()` also loads and
+    primes the forecast models once per process (only the registry: the
+    st-cached stages need a script run context).
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+FORECAST_MODELS = ("Hour", "Day")
+
+STAGES = ("dataset", "models", "inference", "overview")
+
+# Stages that touch no st.cache_* function and so can run outside a script thread
+BACKGROUND_STAGES = ("models", "inference")
+
+
+def _dummy_series(freq: str) -> pd.DataFrame:
+    n = 24 * 14 if freq == "Hour" else 90
+    return pd.DataFrame(
+        {
+            "unique_id": ["Baswap station"] * n,
+            "ds": pd.date_range(
+                end=pd.Timestamp.today().floor("D"),
+                periods=n,
+                freq="h" if freq == "Hour" else "D",
+            ),
+            "y": 1000.0 + np.random.randn(n),
+        }
+    )
+
+
+def _warm_dataset():
+    from data import combined_data_retrieve
+
+    return len(combined_data_retrieve())
+
+
+def _warm_models():
+    from models.registry import REGISTRY
+
+    for model_id in FORECAST_MODELS:
+        REGISTRY.get(model_id)
+    return REGISTRY.loaded()
+
+
+def _warm_inference():
+    from models.registry import REGISTRY
+
+    for model_id in FORECAST_MODELS:
+        REGISTRY.predict(model_id, _dummy_series(model_id))
+    return list(FORECAST_MODELS)
+
+
+def _warm_overview():
+    """Reproduce the first Overview render (default station, column and date window)."""
+    from aggregation import apply_aggregation, filter_data
+    from config import COL_NAMES, METRIC_CONFIG, QUANTILE_MODE
+    from data import combined_data_retrieve
+    from pages import DEFAULT_RANGE_DAYS
+    from plotting import prepare_chart_frame, render_predictions
+    from station_data import DEFAULT_STATION, STATION_NAMES
+    from stats_index import sketch_index
+
+    df = combined_data_retrieve()
+    df_station = df[df["station"] == STATION_NAMES.code_of(DEFAULT_STATION)]
+    if df_station.empty:
+        return "no data for default station"
+
+    first_date = df_station["ds"].min().date()
+    last_date = df_station["ds"].max().date()
+    date_from = max(first_date, last_date - timedelta(days=DEFAULT_RANGE_DAYS))
+    target_col = COL_NAMES[0]
+
+    filtered = filter_data(df, DEFAULT_STATION, date_from, last_date)
+    quantiles = None
+    if QUANTILE_MODE == "approx":
+        quantiles = sketch_index(df, target_col).series.get(
+            STATION_NAMES.code_of(DEFAULT_STATION)
+        )
+    forecasts = 0
+    for freq in ("10min", "Hour", "Day"):
+        agg = apply_aggregation(
+            filtered, target_col, freq, ["Median"], quantiles=quantiles
+        )
+        if "Aggregation" in agg.columns:
+            agg = agg.loc[agg["Aggregation"] == "Median"]
+        if freq in FORECAST_MODELS and METRIC_CONFIG[target_col].get("prediction"):
+            prepared, _, _ = prepare_chart_frame(agg, freq)
+            line_df, _ = render_predictions(prepared, target_col, freq)
+            forecasts += line_df is not None
+    return f"{len(filtered)} rows, {forecasts} forecasts cached"
+
+
+_STAGE_FUNCS = {
+    "dataset": _warm_dataset,
+    "models": _warm_models,
+    "inference": _warm_inference,
+    "overview": _warm_overview,
+}
+
+
+def run_warmup(stages=STAGES) -> dict:
+    """Run the given stages in order; return {stage: {'seconds', 'ok', 'detail'}}."""
+    report = {}
+    for name in stages:
+        start = time.perf_counter()
+        try:
+            detail = _STAGE_FUNCS[name]()
+            ok = True
+        except Exception as exc:  # keep warming the remaining stages
+            detail = f"{type(exc).__name__}: {exc}"
+            ok = False
+        report[name] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "ok": ok,
+            "detail": detail,
+        }
+    return report
+
+
+def print_report(report: dict) -> None:
+    total = sum(r["seconds"] for r in report.values())
+    for name, r in report.items():
+        status = "ok " if r["ok"] else "ERR"
+        print(f"{status} {name:<10} {r['seconds']:8.3f}s  {r['detail']}")
+    print(f"    {'total':<10} {total:8.3f}s")
+
+
+@st.cache_resource(show_spinner=False)
+def start_background_warmup():
+    """Warm the model registry in a daemon thread, once per server process."""
+    state = {"report": None}
+
+    def _run():
+        state["report"] = run_warmup(BACKGROUND_STAGES)
+        print_report(state["report"])
+
+    threading.Thread(target=_run, name="baswap-warmup", daemon=True).start()
+    return state
+
+
+if __name__ == "__main__":
+    result = run_warmup()
+    print_report(result)
+    raise SystemExit(0 if all(r["ok"] for r in result.values()) else 1)
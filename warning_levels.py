@@ -0,0 +1,141 @@
+"""
+EC warning levels: thresholds, colours and vectorized classification.
+
+Level i covers (EC_THRESHOLDS[i-1], EC_THRESHOLDS[i]] g/l, so level 0 is
+<= 0.5 g/l and level 4 is > 4 g/l. Missing readings get NO_LEVEL.
+Used by the map (marker colours, legend) and the station table; LevelIndex
+answers the time-in-level summary of any station and date range without
+classifying the readings again.
+"""
+
+import numpy as np
+import pandas as pd
+
+EC_THRESHOLDS = (0.5, 1, 2, 4)  # g/l, upper bound of each level but the last
+LEVEL_COLORS = ("#a5d6a7", "#fff59d", "#ffeb3b", "#ff9800", "#f44336")
+NO_DATA_COLOR = "#9e9e9e"
+NO_LEVEL = -1
+LEVELS = tuple(range(len(EC_THRESHOLDS) + 1))
+
+
+def classify(values) -> np.ndarray:
+    """Warning level (int8) of every value; NO_LEVEL where it is missing."""
+    x = pd.to_numeric(pd.Series(values, copy=False), errors="coerce").to_numpy(
+        dtype=float
+    )
+    levels = np.digitize(x, EC_THRESHOLDS, right=True).astype(np.int8)
+    levels[np.isnan(x)] = NO_LEVEL
+    return levels
+
+
+def level_of(value):
+    """Warning level of one reading, or None when it is missing."""
+    level = int(classify([value])[0])
+    return None if level == NO_LEVEL else level
+
+
+def color_for(level) -> str:
+    """Marker colour of a level (gray when unknown)."""
+    try:
+        lv = int(level)
+    except (TypeError, ValueError):
+        return NO_DATA_COLOR
+    return LEVEL_COLORS[lv] if 0 <= lv < len(LEVEL_COLORS) else NO_DATA_COLOR
+
+
+def legend_items(unit: str = "g/l") -> list:
+    """[(level, label)] for the map legend, e.g. (0, "<= 0.5 g/l")."""
+    bounds = [f"{t:g}" for t in EC_THRESHOLDS]
+    items = [(0, f"<= {bounds[0]} {unit}")]
+    items += [
+        (i, f"{lo} – {hi} {unit}")
+        for i, (lo, hi) in enumerate(zip(bounds, bounds[1:]), 1)
+    ]
+    items.append((len(bounds), f"> {bounds[-1]} {unit}"))
+    return items
+
+
+class LevelIndex:
+    """
+    Time-in-level summary of any station and date range.
+
+    Each reading counts until the next one of its station, at most `max_gap`;
+    rows without a value are skipped. Per station the valid readings are
+    classified once, sorted by time, and prefix sums kept of the time each
+    spent in its level and of the readings per level, so a range is two
+    binary searches and two row differences.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        value_col: str = "ec_gl",
+        time_col: str = "ds",
+        station_col: str = "station",
+        max_gap="1h",
+    ):
+        ts = pd.to_datetime(df[time_col], errors="coerce")
+        # same wall-clock semantics as filter_data: tz dropped, dates compared locally
+        if getattr(ts.dt, "tz", None) is not None:
+            ts = ts.dt.tz_localize(None)
+        values = pd.to_numeric(df[value_col], errors="coerce")
+        d = pd.DataFrame(
+            {
+                "station": df[station_col].to_numpy(),
+                "t": ts.to_numpy(dtype="datetime64[ns]").view("int64"),
+                "v": values.to_numpy(dtype=float),
+            }
+        )
+        d = d[(ts.notna() & values.notna()).to_numpy()].sort_values(
+            ["station", "t"], kind="stable"
+        )
+        gap = pd.Timedelta(max_gap).value
+        self.station_col = station_col
+        self.series = {}
+        for station, g in d.groupby("station", sort=False):
+            t = g["t"].to_numpy()
+            levels = classify(g["v"].to_numpy())
+            rows = np.arange(len(t))
+            spent = np.zeros((len(t) + 1, len(LEVELS)), dtype=np.int64)
+            spent[rows[:-1] + 1, levels[:-1]] = np.minimum(np.diff(t), gap)
+            count = np.zeros((len(t) + 1, len(LEVELS)), dtype=np.int64)
+            count[rows + 1, levels] = 1
+            self.series[station] = (
+                t,
+                np.cumsum(spent, axis=0),
+                np.cumsum(count, axis=0),
+            )
+
+    def summary(self, station: str, date_from, date_to) -> pd.DataFrame:
+        """station, level, duration, share of `station` over [date_from, date_to].
+
+        Both dates are inclusive.
+        """
+        empty = pd.DataFrame(columns=[self.station_col, "level", "duration", "share"])
+        series = self.series.get(station)
+        if series is None or date_from is None or date_to is None:
+            return empty
+        if date_from > date_to:
+            date_from, date_to = date_to, date_from
+        t, spent, count = series
+        i, j = np.searchsorted(
+            t,
+            [
+                pd.Timestamp(date_from).value,
+                (pd.Timestamp(date_to) + pd.Timedelta(days=1)).value,
+            ],
+        )
+        if j <= i:
+            return empty
+        # the last reading of the range has no next one inside it: it counts 0
+        duration = spent[j - 1] - spent[i]
+        seen = (count[j] - count[i]) > 0
+        total = duration.sum()
+        return pd.DataFrame(
+            {
+                self.station_col: station,
+                "level": np.array(LEVELS, dtype=np.int8)[seen],
+                "duration": pd.to_timedelta(duration[seen], unit="ns"),
+                "share": duration[seen] / total if total else 0.0,
+            }
+        )